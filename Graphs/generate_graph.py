@@ -1,27 +1,78 @@
-import random
-
-# Генерация узлов
-nodes = []
-for i in range(1, 41):
-    x = random.randint(50, 1450)
-    y = random.randint(50, 1450)
-    nodes.append((i, x, y))
-
-# Генерация рёбер (около 80% плотности)
-edges = []
-for i in range(1, 41):
-    for j in range(1, 41):
-        if i != j and random.random() < 0.85:  # 85% вероятность связи
-            weight = random.randint(1, 100)
-            edges.append((i, j, weight))
-
-# Запись в файл
-with open("graph_40_nodes_dense.txt", "w") as f:
-    f.write("# Nodes\n")
-    for node in nodes:
-        f.write(f"{node[0]},{node[1]},{node[2]}\n")
-    f.write("# Edges\n")
-    for edge in edges:
-        f.write(f"{edge[0]},{edge[1]},{edge[2]}\n")
-
-print(f"Создан граф с {len(nodes)} узлами и {len(edges)} рёбрами")
\ No newline at end of file
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_io import GraphData, write_graph_binary, write_graph_text  # noqa: E402
+
+# Выше этого числа пар рёбра выбираются по узлам, без полной матрицы n x n
+DENSE_PAIR_LIMIT = 4_000_000
+
+
+def _edge_pairs(rng, nodes, density, symmetric):
+    if nodes * nodes <= DENSE_PAIR_LIMIT:
+        mask = rng.random((nodes, nodes)) < density
+        np.fill_diagonal(mask, False)
+        if symmetric:
+            mask = np.triu(mask)
+        return np.nonzero(mask)
+
+    degree = rng.binomial(nodes - 1, density, size=nodes)
+    if symmetric:
+        degree = np.maximum(degree // 2, 1)
+    sources = np.repeat(np.arange(nodes), degree)
+    # Сдвиг 1..n-1 исключает петли; повторы внутри строки убираются ниже
+    targets = (sources + rng.integers(1, nodes, size=len(sources))) % nodes
+    pairs = np.unique(np.stack([sources, targets], axis=1) if not symmetric else
+                      np.sort(np.stack([sources, targets], axis=1), axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _weights(rng, count, distribution, sources, targets, xs, ys):
+    if distribution == "uniform":
+        return rng.integers(1, 101, size=count)
+    if distribution == "normal":
+        return np.clip(np.rint(rng.normal(50, 15, size=count)), 1, None).astype(np.int64)
+    # euclidean: расстояние между узлами, округлённое вверх
+    return np.maximum(np.ceil(np.hypot(xs[sources] - xs[targets], ys[sources] - ys[targets])), 1).astype(np.int64)
+
+
+def generate_graph(nodes=40, density=0.85, weights="uniform", symmetric=False, seed=None, extent=1450):
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, nodes + 1, dtype=np.int64)
+    xs = rng.integers(50, extent + 1, size=nodes)
+    ys = rng.integers(50, extent + 1, size=nodes)
+
+    sources, targets = _edge_pairs(rng, nodes, density, symmetric)
+    edge_weights = _weights(rng, len(sources), weights, sources, targets, xs, ys)
+    if symmetric:
+        sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+        edge_weights = np.concatenate([edge_weights, edge_weights])
+    order = np.lexsort((targets, sources))
+    return GraphData(ids, xs, ys, sources[order], targets[order], edge_weights[order])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация случайного графа в формате # Nodes / # Edges")
+    parser.add_argument("--nodes", type=int, default=40)
+    parser.add_argument("--density", type=float, default=0.85, help="вероятность связи между парой узлов")
+    parser.add_argument("--weights", choices=("uniform", "normal", "euclidean"), default="uniform")
+    parser.add_argument("--symmetric", action="store_true", help="рёбра в обе стороны с одинаковым весом")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="*.txt или *.tspg")
+    args = parser.parse_args()
+
+    graph = generate_graph(args.nodes, args.density, args.weights, args.symmetric, args.seed)
+    output = args.output or f"graph_{args.nodes}_nodes_dense.txt"
+    if output.endswith(".tspg"):
+        write_graph_binary(graph, output)
+    else:
+        write_graph_text(graph, output)
+    print(f"Создан граф с {graph.node_count} узлами и {graph.edge_count} рёбрами")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Сравнение движков перебора всех стартов: python -m benchmarks.bench_engines
+import argparse
+import time
+
+import numpy as np
+
+from tsp_solver import ENGINES
+
+
+def random_cost(n, density, rng):
+    cost = np.where(rng.random((n, n)) < density, rng.integers(1, 101, (n, n)), np.inf)
+    np.fill_diagonal(cost, np.inf)
+    return cost
+
+
+def measure(engine, cost):
+    start_time = time.perf_counter()
+    ENGINES[engine](cost, range(len(cost)))
+    return (time.perf_counter() - start_time) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Точка перехода между движками scalar и batch")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320, 640])
+    parser.add_argument("--density", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    crossover = None
+    print(f"{'n':>6} {'scalar, мс':>12} {'batch, мс':>12} {'ускорение':>10}")
+    for n in args.sizes:
+        cost = random_cost(n, args.density, rng)
+        scalar_time = measure("scalar", cost)
+        batch_time = measure("batch", cost)
+        if crossover is None and batch_time < scalar_time:
+            crossover = n
+        print(f"{n:>6} {scalar_time:>12.2f} {batch_time:>12.2f} {scalar_time / batch_time:>10.2f}")
+    print(f"batch быстрее начиная с n = {crossover}" if crossover else "batch не обогнал scalar")
+
+
+if __name__ == "__main__":
+    main()
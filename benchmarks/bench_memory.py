@@ -0,0 +1,50 @@
+# Пиковая память разреженного решателя на ребро графа: python -m benchmarks.bench_memory
+import argparse
+import tracemalloc
+
+from Graphs.generate_graph import generate_graph
+from tsp_sparse import SparseGraph, solve_sparse
+
+# (узлов, плотность): около миллиона рёбер на самом крупном графе
+SIZES = [(20000, 0.0005), (50000, 0.0002), (100000, 0.0001)]
+# Допустимый пик на ребро сверх самого CSR (12 байт на ребро): проверка графа и один обход
+DEFAULT_LIMIT = 32
+
+
+def measure(graph, check):
+    # Граф строится до замера: в пик входит только то, что решатель выделяет сам
+    sparse = SparseGraph.from_arrays(graph.ids, graph.sources, graph.targets, graph.weights)
+    tracemalloc.start()
+    try:
+        result = solve_sparse(sparse, check=check, collect_stats=False)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return sparse, result, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пиковая память solve_sparse в байтах на ребро")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=float, default=DEFAULT_LIMIT,
+                        help="байт на ребро; выше — регрессия и код выхода 1")
+    args = parser.parse_args()
+
+    problems = []
+    print(f"{'узлов':>8} {'рёбер':>9} {'CSR, МБ':>8} {'обход, Б/р':>11} {'с проверкой, Б/р':>17}")
+    for nodes, density in SIZES:
+        graph = generate_graph(nodes, density, seed=args.seed)
+        sparse, _, walk_peak = measure(graph, False)
+        _, _, checked_peak = measure(graph, True)
+        edges = len(sparse.targets)
+        print(f"{nodes:>8} {edges:>9} {sparse.nbytes / 2**20:>8.1f} {walk_peak / edges:>11.1f} "
+              f"{checked_peak / edges:>17.1f}")
+        if checked_peak / edges > args.limit:
+            problems.append(f"n={nodes}: {checked_peak / edges:.1f} байт на ребро при пороге {args.limit}")
+    for problem in problems:
+        print(f"РЕГРЕССИЯ {problem}")
+    raise SystemExit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Отсечение по нижней оценке против полного перебора sorted: python -m benchmarks.bench_pruning
+# Результаты на эталонной машине лежат в benchmarks/pruning_results.txt
+import argparse
+import time
+
+from Graphs.generate_graph import generate_graph
+from tsp_solver import CostMatrix, solve
+
+WEIGHTS = ("uniform", "normal", "euclidean")
+
+
+def measure(matrix, engine, repeat):
+    # Лучшее из repeat прогонов; индекс соседей строится один раз и в замер не входит
+    matrix.neighbors()
+    best_time, result = None, None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = solve(matrix, engine=engine, check=False)
+        elapsed = (time.perf_counter() - start_time) * 1000
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    return best_time, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сколько шагов перебора всех стартов срезает движок pruned")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 200, 400, 800])
+    parser.add_argument("--density", type=float, default=0.85)
+    parser.add_argument("--weights", nargs="+", choices=WEIGHTS, default=list(WEIGHTS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'веса':>10} {'n':>5} {'sorted, мс':>11} {'pruned, мс':>11} {'ускорение':>10} "
+          f"{'отсечено стартов':>17} {'срезано шагов':>14}")
+    for weights in args.weights:
+        for n in args.sizes:
+            graph = generate_graph(n, args.density, weights, seed=args.seed)
+            matrix = CostMatrix.from_arrays(graph.ids, graph.sources, graph.targets, graph.weights)
+            sorted_time, full = measure(matrix, "sorted", args.repeat)
+            pruned_time, pruned = measure(matrix, "pruned", args.repeat)
+            if (full.route, full.total_cost) != (pruned.route, pruned.total_cost):
+                raise SystemExit(f"pruned разошёлся с sorted: {weights}, n = {n}")
+            stats = pruned.stats
+            walked = stats["steps"] + stats.get("pruned_steps", 0)
+            print(f"{weights:>10} {n:>5} {sorted_time:>11.1f} {pruned_time:>11.1f} "
+                  f"{sorted_time / pruned_time:>10.2f} {stats.get('pruned_starts', 0):>11} из {n:<4} "
+                  f"{stats.get('pruned_steps', 0) / walked:>14.1%}")
+
+
+if __name__ == "__main__":
+    main()
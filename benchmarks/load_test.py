@@ -0,0 +1,86 @@
+# Нагрузочный тест сервиса решателя: python -m benchmarks.load_test --port 8765
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+
+def random_graph(n, density, rng):
+    nodes = [[i, int(rng.integers(0, 1000)), int(rng.integers(0, 1000))] for i in range(n)]
+    mask = rng.random((n, n)) < density
+    np.fill_diagonal(mask, False)
+    sources, targets = np.nonzero(mask)
+    weights = rng.integers(1, 101, len(sources))
+    edges = [[int(u), int(v), int(w)] for u, v, w in zip(sources, targets, weights)]
+    return {"nodes": nodes, "edges": edges}
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, graphs, count, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for k in range(count):
+            started = time.perf_counter()
+            status, _ = await request(reader, writer, "POST", "/solve", graphs[k % len(graphs)])
+            if status == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(args):
+    rng = np.random.default_rng(args.seed)
+    graphs = [random_graph(args.nodes, args.density, rng) for _ in range(args.distinct)]
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(client(args.host, args.port, graphs[c::args.clients] or graphs, args.requests,
+                                  latencies, errors) for c in range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, stats = await request(reader, writer, "GET", "/stats")
+    writer.close()
+
+    values = np.array(latencies) if latencies else np.zeros(1)
+    print(f"Запросов: {len(latencies)}, ошибок: {len(errors)}, за {elapsed:.2f} с "
+          f"({len(latencies) / elapsed:.1f} в секунду)")
+    print("Задержка клиента, мс: p50 {:.2f}, p90 {:.2f}, p99 {:.2f}, max {:.2f}".format(
+        *np.percentile(values, [50, 90, 99]), values.max()))
+    print(f"Сервер: {json.dumps(stats, ensure_ascii=False)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузка на сервис решателя с локальной машины")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=32, help="одновременных соединений")
+    parser.add_argument("--requests", type=int, default=50, help="запросов на соединение")
+    parser.add_argument("--nodes", type=int, default=30)
+    parser.add_argument("--density", type=float, default=0.8)
+    parser.add_argument("--distinct", type=int, default=64, help="разных графов в потоке запросов")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Воспроизводимый набор замеров: python -m benchmarks.run_benchmarks --suite small --output bench.json
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+from Graphs.generate_graph import generate_graph
+from tsp_solver import CostMatrix, solve
+from tsp_sparse import SparseGraph, solve_sparse
+
+# Размер, плотность и режимы для каждого экземпляра; плотная матрица n x n не строится для огромных графов
+SUITES = {
+    "small": [(20, 0.85), (40, 0.85), (100, 0.5)],
+    "medium": [(500, 0.2), (1000, 0.1), (2000, 0.05)],
+    "large": [(5000, 0.01), (20000, 0.001)],
+    "huge": [(100000, 0.0001)],
+}
+DENSE_LIMIT = 5000
+ALL_STARTS_LIMIT = 2000
+
+
+def instance_modes(nodes):
+    modes = []
+    if nodes <= DENSE_LIMIT:
+        modes.append(("dense", False, "scalar"))
+    if nodes <= ALL_STARTS_LIMIT:
+        modes += [("dense", True, "scalar"), ("dense", True, "batch"), ("dense", True, "sorted"),
+                  ("dense", True, "pruned")]
+    modes.append(("sparse", False, None))
+    return modes
+
+
+def _solve_mode(graph, representation, use_modification, engine):
+    if representation == "dense":
+        matrix = CostMatrix.from_arrays(graph.ids, graph.sources, graph.targets, graph.weights)
+        return solve(matrix, use_modification, engine=engine)
+    sparse = SparseGraph.from_arrays(graph.ids, graph.sources, graph.targets, graph.weights)
+    return solve_sparse(sparse, use_modification)
+
+
+def run_mode(graph, representation, use_modification, engine):
+    # tracemalloc замедляет каждое выделение памяти, поэтому время снимается без него
+    start_time = time.perf_counter()
+    result = _solve_mode(graph, representation, use_modification, engine)
+    wall_time = (time.perf_counter() - start_time) * 1000
+    return {
+        "wall_time_ms": round(wall_time, 3),
+        "solve_time_ms": round(result.execution_time, 3),
+        "tour_cost": result.total_cost,
+        "found": result.found,
+        "stats": result.stats,
+    }
+
+
+def peak_memory(graph, representation, use_modification, engine):
+    # Отдельный проход под tracemalloc: пик памяти от повтора к повтору не меняется
+    tracemalloc.start()
+    try:
+        _solve_mode(graph, representation, use_modification, engine)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_suite(suite, seed, weights, symmetric, repeat):
+    records = []
+    for nodes, density in SUITES[suite]:
+        graph = generate_graph(nodes, density, weights, symmetric, seed)
+        for representation, use_modification, engine in instance_modes(nodes):
+            runs = [run_mode(graph, representation, use_modification, engine) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run["wall_time_ms"])
+            best["peak_memory_bytes"] = peak_memory(graph, representation, use_modification, engine)
+            record = {
+                "suite": suite, "nodes": nodes, "edges": graph.edge_count, "density": density,
+                "weights": weights, "symmetric": symmetric, "seed": seed,
+                "mode": f"{representation}/{'all' if use_modification else 'single'}"
+                        + (f"/{engine}" if engine else ""),
+                **best,
+            }
+            records.append(record)
+            print(f"{suite:>6} n={nodes:<6} {record['mode']:<20} {record['wall_time_ms']:>10.1f} мс "
+                  f"{record['peak_memory_bytes'] / 2**20:>8.1f} МБ  стоимость {record['tour_cost']}")
+    return records
+
+
+def compare(records, baseline_records, tolerance):
+    baseline = {(r["suite"], r["nodes"], r["mode"]): r for r in baseline_records}
+    problems = []
+    for record in records:
+        old = baseline.get((record["suite"], record["nodes"], record["mode"]))
+        if old is None:
+            continue
+        key = f"{record['suite']} n={record['nodes']} {record['mode']}"
+        if old["tour_cost"] != record["tour_cost"]:
+            problems.append(f"{key}: стоимость {old['tour_cost']} -> {record['tour_cost']}")
+        if record["wall_time_ms"] > old["wall_time_ms"] * (1 + tolerance):
+            problems.append(f"{key}: время {old['wall_time_ms']} -> {record['wall_time_ms']} мс")
+        if record["peak_memory_bytes"] > old["peak_memory_bytes"] * (1 + tolerance):
+            problems.append(f"{key}: память {old['peak_memory_bytes']} -> {record['peak_memory_bytes']} байт")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры времени, памяти и стоимости маршрута по режимам решателя")
+    parser.add_argument("--suite", choices=sorted(SUITES), nargs="+", default=["small"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--weights", choices=("uniform", "normal", "euclidean"), default="uniform")
+    parser.add_argument("--symmetric", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3, help="берётся лучший из повторов")
+    parser.add_argument("--output", help="JSON с результатами")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для поиска регрессий")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустимый рост времени и памяти")
+    args = parser.parse_args()
+
+    records = []
+    for suite in args.suite:
+        records += run_suite(suite, args.seed, args.weights, args.symmetric, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w', encoding="utf-8") as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "results": records}, file, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            problems = compare(records, json.load(file)["results"], args.tolerance)
+        for problem in problems:
+            print(f"РЕГРЕССИЯ {problem}")
+        raise SystemExit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import tkinter as tk
+
+import numpy as np
+
+
+class GraphRenderer:
+    # Рисует на холсте только узлы и рёбра в видимой области; при отдалении упрощает картинку
+    MIN_SCALE = 0.05
+    MAX_SCALE = 4.0
+    LABEL_MIN_SCALE = 0.6
+    ARROW_MIN_SCALE = 0.35
+    MAX_EDGES_DRAWN = 4000
+    MAX_NODES_DRAWN = 6000
+    MIN_EXTENT = 1000
+
+    def __init__(self, canvas, node_size, node_color="green", edge_color="black"):
+        self.canvas = canvas
+        self.node_size = node_size
+        self.node_color = node_color
+        self.edge_color = edge_color
+        self.scale = 1.0
+        self.selection = None
+        self._arrays = ([], np.empty(0), np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        self._redraw_pending = False
+
+        canvas.bind("<Configure>", lambda event: self.invalidate())
+        canvas.bind("<Control-MouseWheel>", lambda event: self.zoom(1.25 if event.delta > 0 else 0.8, event.x, event.y))
+        canvas.bind("<Control-Button-4>", lambda event: self.zoom(1.25, event.x, event.y))
+        canvas.bind("<Control-Button-5>", lambda event: self.zoom(0.8, event.x, event.y))
+
+    def set_graph(self, ids, xs, ys, sources, targets):
+        # Массивы используются как есть, без копирования; рёбра заданы индексами узлов
+        self._arrays = (ids, xs, ys, sources, targets)
+        self.invalidate()
+
+    def clear(self):
+        self.selection = None
+        self.set_graph([], np.empty(0), np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    def set_selection(self, node):
+        # node: (ID, x, y) или None
+        self.selection = node
+        self.invalidate()
+
+    def xview(self, *args):
+        self.canvas.xview(*args)
+        self.invalidate()
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.invalidate()
+
+    def to_world(self, x, y):
+        return self.canvas.canvasx(x) / self.scale, self.canvas.canvasy(y) / self.scale
+
+    def zoom(self, factor, x, y):
+        scale = min(self.MAX_SCALE, max(self.MIN_SCALE, self.scale * factor))
+        if scale == self.scale:
+            return
+        world_x, world_y = self.to_world(x, y)
+        self.scale = scale
+        width, height = self._update_scrollregion()
+        # Точка под курсором остаётся на месте
+        self.canvas.xview_moveto(max(0.0, (world_x * scale - x) / width))
+        self.canvas.yview_moveto(max(0.0, (world_y * scale - y) / height))
+        self.invalidate()
+
+    def invalidate(self):
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.canvas.after_idle(self.redraw)
+
+    def _update_scrollregion(self):
+        _, xs, ys, _, _ = self._arrays
+        extent_x = max(self.MIN_EXTENT, xs.max() + self.node_size if len(xs) else 0)
+        extent_y = max(self.MIN_EXTENT, ys.max() + self.node_size if len(ys) else 0)
+        width, height = extent_x * self.scale, extent_y * self.scale
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+        return width, height
+
+    def _visible_world(self):
+        margin = self.node_size
+        left, top = self.to_world(0, 0)
+        right, bottom = self.to_world(self.canvas.winfo_width(), self.canvas.winfo_height())
+        return left - margin, top - margin, right + margin, bottom + margin
+
+    def redraw(self):
+        self._redraw_pending = False
+        self._update_scrollregion()
+        canvas = self.canvas
+        canvas.delete("graph")
+        ids, xs, ys, sources, targets = self._arrays
+        left, top, right, bottom = self._visible_world()
+        scale = self.scale
+        radius = max(1.5, self.node_size * scale)
+
+        if len(sources):
+            x1, y1, x2, y2 = xs[sources], ys[sources], xs[targets], ys[targets]
+            visible = ((np.maximum(x1, x2) >= left) & (np.minimum(x1, x2) <= right)
+                       & (np.maximum(y1, y2) >= top) & (np.minimum(y1, y2) <= bottom))
+            edges = np.flatnonzero(visible)
+            if len(edges) > self.MAX_EDGES_DRAWN:
+                # Крупный план не нужен: рисуется равномерная выборка рёбер
+                edges = edges[::len(edges) // self.MAX_EDGES_DRAWN + 1]
+            dx, dy = x2[edges] - x1[edges], y2[edges] - y1[edges]
+            length = np.hypot(dx, dy)
+            keep = length > 0
+            edges, dx, dy = edges[keep], dx[keep] / length[keep], dy[keep] / length[keep]
+            shrink = self.node_size
+            arrow = tk.LAST if scale >= self.ARROW_MIN_SCALE else tk.NONE
+            width = 2 if scale >= self.ARROW_MIN_SCALE else 1
+            for k, edge in enumerate(edges.tolist()):
+                canvas.create_line((x1[edge] + dx[k] * shrink) * scale, (y1[edge] + dy[k] * shrink) * scale,
+                                   (x2[edge] - dx[k] * shrink) * scale, (y2[edge] - dy[k] * shrink) * scale,
+                                   arrow=arrow, fill=self.edge_color, width=width,
+                                   arrowshape=(8, 8, 4), tags="graph")
+
+        visible_nodes = np.flatnonzero((xs >= left) & (xs <= right) & (ys >= top) & (ys <= bottom))
+        if len(visible_nodes) > self.MAX_NODES_DRAWN:
+            visible_nodes = visible_nodes[::len(visible_nodes) // self.MAX_NODES_DRAWN + 1]
+        show_labels = scale >= self.LABEL_MIN_SCALE
+        for i in visible_nodes.tolist():
+            x, y = xs[i] * scale, ys[i] * scale
+            canvas.create_oval(x - radius, y - radius, x + radius, y + radius,
+                               fill=self.node_color, outline="" if not show_labels else "black", tags="graph")
+            if show_labels:
+                canvas.create_text(x, y, text=str(ids[i]), fill="white", tags="graph")
+
+        if self.selection is not None:
+            node_id, x, y = self.selection
+            canvas.create_text(x * scale, y * scale - 30, text=f"Выбран узел: {node_id}", fill="green", tags="graph")
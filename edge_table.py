@@ -0,0 +1,69 @@
+from tkinter import ttk
+
+
+class EdgeTable:
+    # Таблица рёбер без строки на каждое ребро: в Treeview лежит только видимое окно, которое
+    # при прокрутке заполняется заново из массивов GraphStore. Стоимость загрузки и прокрутки
+    # не зависит от числа рёбер
+    DEFAULT_ROW_HEIGHT = 20
+
+    def __init__(self, parent, store):
+        self.store = store
+        self.first = 0
+        self.rows = 1
+        self.tree = ttk.Treeview(parent, columns=("From", "To", "Cost"), show="headings", height=1)
+        self.tree.heading("From", text="Начало")
+        self.tree.heading("To", text="Конец")
+        self.tree.heading("Cost", text="Вес")
+        for col in ("From", "To", "Cost"):
+            self.tree.column(col, width=30, stretch=True)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        row_height = ttk.Style().lookup("Treeview", "rowheight")
+        self.row_height = int(row_height) if row_height else self.DEFAULT_ROW_HEIGHT
+        self.tree.bind("<Configure>", self._resize)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll_by(-1 if event.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-1, "units"))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(1, "units"))
+
+    def _resize(self, event):
+        # Заголовок занимает примерно одну строку
+        rows = max(1, event.height // self.row_height - 1)
+        if rows != self.rows:
+            self.rows = rows
+            self.refresh()
+
+    def _scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.first = int(float(amount) * self.store.edge_count)
+            self.refresh()
+        else:
+            self.scroll_by(int(amount), unit)
+
+    def scroll_by(self, amount, unit):
+        self.first += amount * (self.rows if unit == "pages" else 3)
+        self.refresh()
+
+    def show_last(self):
+        self.first = self.store.edge_count
+        self.refresh()
+
+    def refresh(self):
+        # Перерисовывает окно после любой правки графа: строк в нём не больше, чем видно на экране
+        store = self.store
+        count = store.edge_count
+        self.first = max(0, min(self.first, count - self.rows))
+        end = min(count, self.first + self.rows)
+        ids = store.ids
+        window = slice(self.first, end)
+        values = zip(ids[store.sources[window]].tolist(), ids[store.targets[window]].tolist(),
+                     store.weights[window].tolist())
+        self.tree.delete(*self.tree.get_children())
+        for row in values:
+            self.tree.insert("", "end", values=row)
+        if count:
+            self.scrollbar.set(self.first / count, end / count)
+        else:
+            self.scrollbar.set(0.0, 1.0)
@@ -0,0 +1,227 @@
+import argparse
+import os
+import struct
+import tempfile
+from array import array
+
+import numpy as np
+
+BINARY_MAGIC = b"TSPG"
+BINARY_VERSION = 1
+# magic, версия, число узлов, число рёбер; 24 байта, массивы за ним выровнены по 8
+BINARY_HEADER = struct.Struct("<4sIQQ")
+
+
+class GraphData:
+    # Узлы и рёбра в плотных массивах; рёбра хранят индексы узлов, а не их ID
+    def __init__(self, ids, xs, ys, sources, targets, weights, skipped=None):
+        self.ids = ids
+        self.xs = xs
+        self.ys = ys
+        self.sources = sources
+        self.targets = targets
+        self.weights = weights
+        self.skipped = skipped if skipped is not None else {}
+        self._index = None
+
+    @property
+    def index(self):
+        # Словарь строится по требованию, чтобы открытие бинарного файла оставалось мгновенным
+        if self._index is None:
+            self._index = {node_id: i for i, node_id in enumerate(self.ids.tolist())}
+        return self._index
+
+    @property
+    def node_count(self):
+        return len(self.ids)
+
+    @property
+    def edge_count(self):
+        return len(self.sources)
+
+    def nodes(self):
+        return [{"id": node_id, "x_coord": x, "y_coord": y}
+                for node_id, x, y in zip(self.ids.tolist(), self.xs.tolist(), self.ys.tolist())]
+
+    def connections(self):
+        ids = self.ids
+        return list(zip(ids[self.sources].tolist(), ids[self.targets].tolist(), self.weights.tolist()))
+
+
+def _skip(skipped, reason):
+    skipped[reason] = skipped.get(reason, 0) + 1
+
+
+def parse_graph_lines(lines):
+    ids, xs, ys = array('q'), array('q'), array('q')
+    sources, targets, weights = array('q'), array('q'), array('q')
+    index = {}
+    skipped = {}
+    section = None
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(b'#'):
+            if line.startswith(b'# Nodes'):
+                section = "nodes"
+            elif line.startswith(b'# Edges'):
+                section = "edges"
+            else:
+                section = None
+            continue
+        if section is None:
+            continue
+
+        parts = line.split(b',')
+        if len(parts) != 3:
+            _skip(skipped, "malformed")
+            continue
+        try:
+            # Разбор через array('q'): значение вне int64 даёт OverflowError и строка считается испорченной,
+            # а не обрывает загрузку на записи в массивы
+            first, second, third = array('q', map(int, parts))
+        except (ValueError, OverflowError):
+            _skip(skipped, "malformed")
+            continue
+
+        if section == "nodes":
+            if first in index:
+                _skip(skipped, "duplicate_nodes")
+                continue
+            index[first] = len(ids)
+            ids.append(first)
+            xs.append(second)
+            ys.append(third)
+        else:
+            from_index = index.get(first)
+            to_index = index.get(second)
+            if from_index is None or to_index is None:
+                _skip(skipped, "unknown_nodes")
+                continue
+            sources.append(from_index)
+            targets.append(to_index)
+            weights.append(third)
+
+    return GraphData(*(np.frombuffer(values, dtype=np.int64) if len(values) else np.empty(0, dtype=np.int64)
+                       for values in (ids, xs, ys, sources, targets, weights)), skipped)
+
+
+def read_graph_text(file_path):
+    # Один проход по файлу построчно, без readlines()
+    with open(file_path, 'rb') as file:
+        return parse_graph_lines(file)
+
+
+def write_graph_text(graph, file_path):
+    ids = graph.ids.tolist()
+    with open(file_path, 'w', encoding="utf-8") as file:
+        file.write("# Nodes\n")
+        for node_id, x, y in zip(ids, graph.xs.tolist(), graph.ys.tolist()):
+            file.write(f"{node_id},{x},{y}\n")
+        file.write("# Edges\n")
+        for source, target, weight in zip(graph.sources.tolist(), graph.targets.tolist(), graph.weights.tolist()):
+            file.write(f"{ids[source]},{ids[target]},{weight}\n")
+
+
+def _binary_layout(node_count, edge_count):
+    layout = []
+    offset = BINARY_HEADER.size
+    for name, dtype, size in (("ids", np.int64, node_count), ("xs", np.int64, node_count),
+                              ("ys", np.int64, node_count), ("sources", np.int32, edge_count),
+                              ("targets", np.int32, edge_count), ("weights", np.int64, edge_count)):
+        layout.append((name, dtype, size, offset))
+        offset += np.dtype(dtype).itemsize * size
+        offset += -offset % 8
+    return layout, offset
+
+
+def write_graph_binary(graph, file_path):
+    layout, total_size = _binary_layout(graph.node_count, graph.edge_count)
+    with open(file_path, 'wb') as file:
+        file.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, graph.node_count, graph.edge_count))
+        for name, dtype, size, offset in layout:
+            file.seek(offset)
+            file.write(np.ascontiguousarray(getattr(graph, name), dtype=dtype).tobytes())
+        file.truncate(total_size)
+
+
+def read_graph_binary(file_path):
+    with open(file_path, 'rb') as file:
+        header = file.read(BINARY_HEADER.size)
+    if len(header) != BINARY_HEADER.size:
+        raise ValueError("Файл слишком короткий для бинарного графа")
+    magic, version, node_count, edge_count = BINARY_HEADER.unpack(header)
+    if magic != BINARY_MAGIC:
+        raise ValueError("Файл не является бинарным графом")
+    if version != BINARY_VERSION:
+        raise ValueError(f"Неподдерживаемая версия бинарного графа: {version}")
+
+    layout, total_size = _binary_layout(node_count, edge_count)
+    if os.path.getsize(file_path) < total_size:
+        raise ValueError("Бинарный граф повреждён: файл короче, чем указано в заголовке")
+    # Страницы отображаются только для чтения и общие для всех процессов
+    arrays = [np.memmap(file_path, dtype=dtype, mode='r', offset=offset, shape=(size,))
+              if size else np.empty(0, dtype=dtype)
+              for _, dtype, size, offset in layout]
+    # Индексы рёбер проверяются сразу: испорченный файл иначе упадёт IndexError далеко от места чтения
+    for name, values in (("sources", arrays[3]), ("targets", arrays[4])):
+        if len(values) and (int(values.min()) < 0 or int(values.max()) >= node_count):
+            raise ValueError(f"Бинарный граф повреждён: {name} ссылается на несуществующий узел")
+    return GraphData(*arrays)
+
+
+def is_graph_binary(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def read_graph(file_path):
+    return read_graph_binary(file_path) if is_graph_binary(file_path) else read_graph_text(file_path)
+
+
+def _same_graph(first, second):
+    return all(np.array_equal(getattr(first, name), getattr(second, name))
+               for name in ("ids", "xs", "ys", "sources", "targets", "weights"))
+
+
+def check_round_trip(file_path):
+    original = read_graph_text(file_path)
+    with tempfile.TemporaryDirectory() as directory:
+        binary_path = os.path.join(directory, "graph.tspg")
+        text_path = os.path.join(directory, "graph.txt")
+        write_graph_binary(original, binary_path)
+        from_binary = read_graph_binary(binary_path)
+        write_graph_text(from_binary, text_path)
+        same = _same_graph(original, from_binary) and _same_graph(original, read_graph_text(text_path))
+        del from_binary
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Преобразование графов между текстовым и бинарным форматом")
+    commands = parser.add_subparsers(dest="command", required=True)
+    to_binary = commands.add_parser("to-binary", help="текст -> бинарный формат")
+    to_binary.add_argument("source")
+    to_binary.add_argument("target")
+    to_text = commands.add_parser("to-text", help="бинарный формат -> текст")
+    to_text.add_argument("source")
+    to_text.add_argument("target")
+    check = commands.add_parser("check", help="проверить обратимость преобразования")
+    check.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "to-binary":
+        write_graph_binary(read_graph_text(args.source), args.target)
+    elif args.command == "to-text":
+        write_graph_text(read_graph_binary(args.source), args.target)
+    else:
+        failed = [file_path for file_path in args.files if not check_round_trip(file_path)]
+        for file_path in args.files:
+            print(f"{'FAIL' if file_path in failed else 'OK'}  {file_path}")
+        raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import numpy as np
+
+from tsp_feasibility import check_feasibility
+
+INITIAL_CAPACITY = 64
+
+
+def _grow(values, size):
+    grown = np.empty(max(size, 2 * len(values)), dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+
+class GraphStore:
+    # Изменяемый граф в типизированных массивах с запасом ёмкости, как GraphData, но с правками.
+    # ids/xs/ys/sources/targets/weights — срезы без копирования; рёбра хранят индексы узлов.
+    # Удаление переставляет на освободившееся место последний элемент, поэтому порядок не сохраняется.
+    # Для правок ведутся словарь рёбер и позиции рёбер каждого узла: удаление узла стоит O(степени),
+    # а не O(E)
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._ids = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._xs = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._ys = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._sources = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._targets = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._weights = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self.node_count = 0
+        self.edge_count = 0
+        self.index = {}
+        self._edge_index = {}
+        self._incidence = []
+        self._feasibility = None
+
+    @property
+    def ids(self):
+        return self._ids[:self.node_count]
+
+    @property
+    def xs(self):
+        return self._xs[:self.node_count]
+
+    @property
+    def ys(self):
+        return self._ys[:self.node_count]
+
+    @property
+    def sources(self):
+        return self._sources[:self.edge_count]
+
+    @property
+    def targets(self):
+        return self._targets[:self.edge_count]
+
+    @property
+    def weights(self):
+        return self._weights[:self.edge_count]
+
+    def __len__(self):
+        return self.node_count
+
+    def __contains__(self, node_id):
+        return node_id in self.index
+
+    def load(self, graph):
+        # Массивы разобранного файла копируются один раз; повторное ребро заменяет прежнее
+        self.clear()
+        n = graph.node_count
+        sources = np.asarray(graph.sources, dtype=np.int64)
+        targets = np.asarray(graph.targets, dtype=np.int64)
+        weights = np.asarray(graph.weights, dtype=np.int64)
+        keys = sources * max(n, 1) + targets
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = np.sort(len(keys) - 1 - last)
+
+        self._ids = np.array(graph.ids, dtype=np.int64)
+        self._xs = np.array(graph.xs, dtype=np.int64)
+        self._ys = np.array(graph.ys, dtype=np.int64)
+        self._sources, self._targets, self._weights = sources[keep], targets[keep], weights[keep]
+        self.node_count = n
+        self.edge_count = len(keep)
+        self.index = {node_id: i for i, node_id in enumerate(self._ids.tolist())}
+        # Словарь рёбер и позиции рёбер узлов строятся при первой правке, загрузка их не требует
+        self._edge_index = None
+        self._incidence = None
+        self._feasibility = None
+
+    def _edges(self):
+        if self._edge_index is None:
+            ids = self.ids
+            self._edge_index = {pair: i for i, pair in enumerate(zip(ids[self.sources].tolist(),
+                                                                     ids[self.targets].tolist()))}
+            # Позиции входящих и исходящих рёбер каждого узла
+            self._incidence = [set() for _ in range(self.node_count)]
+            for i, (source, target) in enumerate(zip(self.sources.tolist(), self.targets.tolist())):
+                self._incidence[source].add(i)
+                self._incidence[target].add(i)
+        return self._edge_index
+
+    def feasibility(self):
+        # Проверка хранится до первой правки, меняющей набор узлов или рёбер; смена веса её не сбрасывает
+        if self._feasibility is None:
+            self._feasibility = check_feasibility(self.ids, self.sources, self.targets)
+        return self._feasibility
+
+    def node(self, node_id):
+        i = self.index[node_id]
+        return int(self._xs[i]), int(self._ys[i])
+
+    def add_node(self, node_id, x, y):
+        i = self.node_count
+        if i == len(self._ids):
+            self._ids, self._xs, self._ys = (_grow(values, i + 1) for values in (self._ids, self._xs, self._ys))
+        self._ids[i], self._xs[i], self._ys[i] = node_id, x, y
+        self.index[node_id] = i
+        if self._incidence is not None:
+            self._incidence.append(set())
+        self.node_count += 1
+        self._feasibility = None
+        return i
+
+    def remove_node(self, node_id):
+        # Рёбра узла удаляются вместе с ним и возвращаются как (начало, конец, вес)
+        self._edges()
+        i = self.index[node_id]
+        # С конца: последнее ребро, переставляемое на место удалённого, уже не принадлежит узлу
+        removed = [self._remove_edge_at(position) for position in sorted(self._incidence[i], reverse=True)]
+        last = self.node_count - 1
+        if i != last:
+            moved_id = int(self._ids[last])
+            self._ids[i], self._xs[i], self._ys[i] = self._ids[last], self._xs[last], self._ys[last]
+            self.index[moved_id] = i
+            for position in self._incidence[last]:
+                if self._sources[position] == last:
+                    self._sources[position] = i
+                if self._targets[position] == last:
+                    self._targets[position] = i
+            self._incidence[i] = self._incidence[last]
+        self._incidence.pop()
+        del self.index[node_id]
+        self.node_count -= 1
+        self._feasibility = None
+        return removed
+
+    def weight(self, from_id, to_id):
+        i = self._edges().get((from_id, to_id))
+        return None if i is None else int(self._weights[i])
+
+    def set_edge(self, from_id, to_id, weight):
+        # Добавляет ребро или меняет вес существующего; возвращает прежний вес или None
+        edges = self._edges()
+        i = edges.get((from_id, to_id))
+        if i is not None:
+            old_weight = int(self._weights[i])
+            self._weights[i] = weight
+            return old_weight
+        i = self.edge_count
+        if i == len(self._sources):
+            self._sources, self._targets, self._weights = (_grow(values, i + 1) for values in
+                                                           (self._sources, self._targets, self._weights))
+        self._sources[i], self._targets[i], self._weights[i] = self.index[from_id], self.index[to_id], weight
+        edges[(from_id, to_id)] = i
+        self._incidence[self._sources[i]].add(i)
+        self._incidence[self._targets[i]].add(i)
+        self.edge_count += 1
+        self._feasibility = None
+        return None
+
+    def remove_edge(self, from_id, to_id):
+        return self._remove_edge_at(self._edges()[(from_id, to_id)])[2]
+
+    def _remove_edge_at(self, i):
+        edges = self._edges()
+        ids = self._ids
+        link = (int(ids[self._sources[i]]), int(ids[self._targets[i]]), int(self._weights[i]))
+        del edges[link[:2]]
+        incidence = self._incidence
+        incidence[self._sources[i]].discard(i)
+        incidence[self._targets[i]].discard(i)
+        last = self.edge_count - 1
+        if i != last:
+            self._sources[i], self._targets[i], self._weights[i] = (self._sources[last], self._targets[last],
+                                                                    self._weights[last])
+            edges[(int(ids[self._sources[i]]), int(ids[self._targets[i]]))] = i
+            for node in (self._sources[i], self._targets[i]):
+                incidence[node].discard(last)
+                incidence[node].add(i)
+        self.edge_count -= 1
+        self._feasibility = None
+        return link
+
+    def links(self):
+        ids = self.ids
+        return zip(ids[self.sources].tolist(), ids[self.targets].tolist(), self.weights.tolist())
@@ -0,0 +1,114 @@
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+PROFILE_MODES = ("cpu", "memory")
+TOP_ENTRIES = 15
+
+# Без зонда фазы не замеряются вовсе: один общий пустой контекст
+_NO_PHASE = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("probe", "name", "started")
+
+    def __init__(self, probe, name):
+        self.probe = probe
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        phases = self.probe.phases
+        phases[self.name] = phases.get(self.name, 0.0) + (time.perf_counter() - self.started) * 1000
+
+
+class Probe:
+    # Замеры одного прогона: время фаз (parse, build, solve, post, render, ...) в мс и счётчики.
+    # profile: None, "cpu" (cProfile) или "memory" (tracemalloc); снимается между start() и stop()
+    def __init__(self, profile=None):
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {profile}")
+        self.profile = profile
+        self.phases = {}
+        self.counters = {}
+        self.capture = None
+        self._profiler = None
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def count(self, key, value=1):
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_stats(self, stats):
+        # Счётчики решателя (starts, steps, scans, dead_ends, ...) складываются в общие
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.count(key, value)
+
+    def start(self):
+        # cProfile видит только поток, в котором вызван start()
+        if self.profile == "cpu":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == "memory":
+            tracemalloc.start()
+
+    def stop(self):
+        if self.profile == "cpu" and self._profiler is not None:
+            self._profiler.disable()
+            self.capture = _cpu_top(self._profiler)
+            self._profiler = None
+        elif self.profile == "memory" and tracemalloc.is_tracing():
+            self.capture = _memory_top()
+            tracemalloc.stop()
+
+    def report(self):
+        report = {
+            "phases_ms": {name: round(value, 3) for name, value in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+        starts = self.counters.get("starts")
+        if starts and "solve" in self.phases:
+            # Движки обрабатывают старты пакетами, поэтому время одного старта — среднее
+            report["per_start_ms"] = round(self.phases["solve"] / starts, 6)
+        if self.capture is not None:
+            report[self.profile] = self.capture
+        return report
+
+
+def phase(probe, name):
+    return _NO_PHASE if probe is None else probe.phase(name)
+
+
+def _cpu_top(profiler):
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_ENTRIES]
+    return [{
+        "function": f"{filename}:{line}({name})",
+        "calls": calls,
+        "own_ms": round(own_time * 1000, 3),
+        "cumulative_ms": round(cumulative_time * 1000, 3),
+    } for (filename, line, name), (_, calls, own_time, cumulative_time, _) in rows]
+
+
+def _memory_top():
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    top = snapshot.statistics("lineno")[:TOP_ENTRIES]
+    return {
+        "peak_bytes": peak,
+        "top": [{"line": str(stat.traceback), "bytes": stat.size, "blocks": stat.count} for stat in top],
+    }
+
+
+def write_log(path, record):
+    # Одна строка JSON на прогон: логи разных запусков удобно сравнивать построчно
+    record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), **record}
+    with open(path, 'a', encoding="utf-8") as file:
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
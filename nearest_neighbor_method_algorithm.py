@@ -1,30 +1,61 @@
+import os
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import math
 from tkinter.simpledialog import askinteger
-import time  
-import random
+
+import numpy as np
+
+from canvas_renderer import GraphRenderer
+from edge_table import EdgeTable
+from graph_io import read_graph
+from graph_store import GraphStore
+from instrumentation import Probe, phase, write_log
+from result_cache import ResultCache, graph_data_key, solve_options
+from spatial_index import GridIndex
+from tsp_incremental import IncrementalSolver
+from tsp_local_search import IMPROVE_TIME_LIMIT
+from tsp_report import format_result_text, route_export, write_result
+from tsp_solver import CostMatrix, SolveResult, solve
+from tsp_sparse import SparseGraph, dense_fits, pick_engine, solve_sparse
 
 class TSPApp:
     NODE_SIZE = 12
     MIN_SPACING = 50
     SELECTION_RADIUS = 17
+    POLL_INTERVAL = 100
 
     def __init__(self, root):
         self.root = root
         self.root.title("Решение задачи маршрута")
         self.root.geometry("1000x750")
 
-        self.nodes = []
-        self.connections = []
+        self.graph = GraphStore()
         self.history = []
         self.deleted_nodes = []
         self.node_id_tracker = 0
         self.active_node = None
-        self.active_label_id = None
         self.use_modification_var = tk.BooleanVar(value=True)
+        self.use_local_search_var = tk.BooleanVar(value=False)
         self.optimal_route = None 
         self.result_text = ""      
+        self.incremental = IncrementalSolver()
+        self.node_grid = GridIndex(self.MIN_SPACING)
+        self.solve_thread = None
+        self.solve_cancel = None
+        self.solve_progress = None
+        self.solve_improve = False
+        self.solve_outcome = None
+        self.solve_started = 0.0
+        self.solve_key = None
+        self.progress_label = None
+        # Каталог дискового кэша задаётся переменной окружения, без неё кэш живёт только в памяти
+        self.result_cache = ResultCache(directory=os.environ.get("TSP_CACHE_DIR"))
+        # Замеры фаз пишутся строками JSON в TSP_INSTRUMENT_LOG; TSP_PROFILE=cpu|memory добавляет профиль
+        self.instrument_log = os.environ.get("TSP_INSTRUMENT_LOG")
+        self.profile_mode = os.environ.get("TSP_PROFILE")
+        self.solve_probe = None
 
         self._setup_ui()
         self._center_window()
@@ -48,8 +79,9 @@ class TSPApp:
         input_frame.pack(fill="both", expand=True)
 
         self.input_area = tk.Canvas(input_frame, bg="lightgray", width=500, height=500, scrollregion=(0, 0, 1000, 1000))
-        h_scrollbar_input = tk.Scrollbar(input_frame, orient="horizontal", command=self.input_area.xview)
-        v_scrollbar_input = tk.Scrollbar(input_frame, orient="vertical", command=self.input_area.yview)
+        self.input_renderer = GraphRenderer(self.input_area, self.NODE_SIZE, "green", "black")
+        h_scrollbar_input = tk.Scrollbar(input_frame, orient="horizontal", command=self.input_renderer.xview)
+        v_scrollbar_input = tk.Scrollbar(input_frame, orient="vertical", command=self.input_renderer.yview)
         self.input_area.configure(xscrollcommand=h_scrollbar_input.set, yscrollcommand=v_scrollbar_input.set)
 
         h_scrollbar_input.pack(side="bottom", fill="x")
@@ -65,8 +97,9 @@ class TSPApp:
         output_frame.pack(fill="both", expand=True)
 
         self.output_area = tk.Canvas(output_frame, bg="lightgray", width=500, height=500, scrollregion=(0, 0, 1000, 1000))
-        h_scrollbar_output = tk.Scrollbar(output_frame, orient="horizontal", command=self.output_area.xview)
-        v_scrollbar_output = tk.Scrollbar(output_frame, orient="vertical", command=self.output_area.yview)
+        self.output_renderer = GraphRenderer(self.output_area, self.NODE_SIZE, "green", "red")
+        h_scrollbar_output = tk.Scrollbar(output_frame, orient="horizontal", command=self.output_renderer.xview)
+        v_scrollbar_output = tk.Scrollbar(output_frame, orient="vertical", command=self.output_renderer.yview)
         self.output_area.configure(xscrollcommand=h_scrollbar_output.set, yscrollcommand=v_scrollbar_output.set)
 
         h_scrollbar_output.pack(side="bottom", fill="x")
@@ -85,18 +118,15 @@ class TSPApp:
 
         edges_section = tk.LabelFrame(panel_right, text="Список рёбер")
         edges_section.grid(row=0, column=0, sticky="nsew")
-        self.edge_table = ttk.Treeview(edges_section, columns=("From", "To", "Cost"), show="headings")
-        self.edge_table.heading("From", text="Начало")
-        self.edge_table.heading("To", text="Конец")
-        self.edge_table.heading("Cost", text="Вес")
-        self.edge_table.pack(fill="both", expand=True)
-        for col in ("From", "To", "Cost"):
-            self.edge_table.column(col, width=30, stretch=True)
+        self.edge_table = EdgeTable(edges_section, self.graph)
 
         control_section = tk.LabelFrame(panel_right, text="Управление")
         control_section.grid(row=1, column=0, sticky="nsew")
         ttk.Checkbutton(control_section, text="Использовать модификацию", variable=self.use_modification_var).pack(fill="x", expand=True)
+        ttk.Checkbutton(control_section, text="Улучшить маршрут (2-opt / Or-opt)", variable=self.use_local_search_var).pack(fill="x", expand=True)
         tk.Button(control_section, text="Найти маршрут", command=self._solve_tsp).pack(fill="x", expand=True)
+        self.cancel_button = tk.Button(control_section, text="Остановить расчёт", command=self._cancel_solve, state="disabled")
+        self.cancel_button.pack(fill="x", expand=True)
         tk.Button(control_section, text="Назад", command=self._revert_last_step).pack(fill="x", expand=True)
         tk.Button(control_section, text="Сбросить", command=self._reset_all).pack(fill="x", expand=True)
         tk.Button(control_section, text="Загрузить граф", command=self._load_graph).pack(fill="x", expand=True)
@@ -116,92 +146,57 @@ class TSPApp:
         self.root.geometry(f"{w}x{h}+{(sw - w) // 2}+{(sh - h) // 2}")
 
     def _load_graph(self):
-        file_path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if self.solve_thread is not None:
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt"), ("Binary graphs", "*.tspg"),
+                                                          ("All files", "*.*")])
         if not file_path:
             return
 
         self._reset_all()  
 
+        probe = self._new_probe()
         try:
-            with open(file_path, 'r') as file:
-                lines = file.readlines()
-                nodes_section = False  
-                node_ids = set()
-
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    if line.startswith('# Nodes'):
-                        nodes_section = True
-                        continue
-                    if line.startswith('# Edges'):
-                        nodes_section = False
-                        continue
-                    if not nodes_section:
-                        continue 
-
-                    parts = line.split(',')
-                    if len(parts) != 3:
-                        continue 
-
-                    try:
-                        node_id, x, y = map(int, parts)
-                        if node_id in node_ids:
-                            raise ValueError(f"Дублирующийся ID узла: {node_id}")
-                        node_ids.add(node_id)
-                        new_node = {"id": node_id, "x_coord": x, "y_coord": y}
-                        self.nodes.append(new_node)
-                        self.input_area.create_oval(x - self.NODE_SIZE, y - self.NODE_SIZE,
-                                                    x + self.NODE_SIZE, y + self.NODE_SIZE, fill="green")
-                        self.input_area.create_text(x, y, text=str(node_id), fill="white")
-                        self.history.append(("node_added", new_node, None, None))
-                        self.node_id_tracker = max(self.node_id_tracker, node_id)
-                    except ValueError:
-                        continue 
-
-                for line in lines:
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    if line.startswith('# Nodes'):
-                        continue  
-
-                    parts = line.split(',')
-                    if len(parts) != 3:
-                        continue
-
-                    try:
-                        from_id, to_id, weight = map(int, parts)
-                        if from_id not in node_ids or to_id not in node_ids:
-                            raise ValueError(f"Узел {from_id} или {to_id} не найден")
-                        start_node = next(n for n in self.nodes if n["id"] == from_id)
-                        end_node = next(n for n in self.nodes if n["id"] == to_id)
-                        link_id = self._render_directed_link(start_node, end_node)
-                        self.connections.append((from_id, to_id, weight, link_id))
-                        self.edge_table.insert("", "end", values=(from_id, to_id, weight))
-                        self.history.append(("link_added", (from_id, to_id, weight, link_id)))
-                    except ValueError:
-                        continue
-
-                if not self.nodes:
-                    raise ValueError("Файл не содержит узлов")
-                
-                max_x = max(node["x_coord"] for node in self.nodes) + self.NODE_SIZE
-                max_y = max(node["y_coord"] for node in self.nodes) + self.NODE_SIZE
-                self.input_area.configure(scrollregion=(0, 0, max_x, max_y))
-                
-                messagebox.showinfo("Успех", "Граф загружен!")
+            with phase(probe, "parse"):
+                graph = read_graph(file_path)
+            if not graph.node_count:
+                raise ValueError("Файл не содержит узлов")
+            with phase(probe, "build"):
+                # Повторное ребро в файле заменяет прежнее, как и в решателе
+                self.graph.load(graph)
+                store = self.graph
+                for node_id, x, y in zip(store.ids.tolist(), store.xs.tolist(), store.ys.tolist()):
+                    self.node_grid.add(node_id, x, y)
+                # Таблица показывает только видимое окно рёбер и читает его прямо из store
+                self.edge_table.refresh()
+                self.node_id_tracker = max(self.node_id_tracker, int(graph.ids.max()))
+                # Загрузка целиком — один шаг истории, «Назад» снимает её полностью
+                self.history.append(("graph_loaded",))
+                self.incremental.dirty = True
+            # Холст рисует только видимую часть графа, элементы не создаются заранее
+            with phase(probe, "render"):
+                self._redraw_input()
+                if probe is not None:
+                    self.input_renderer.canvas.update_idletasks()
+            self._log_probe(probe, "load", file=file_path)
+
+            message = "Граф загружен!"
+            if graph.skipped:
+                message += (f"\nПропущено строк: некорректных {graph.skipped.get('malformed', 0)}, "
+                            f"дубликатов узлов {graph.skipped.get('duplicate_nodes', 0)}, "
+                            f"рёбер с неизвестными узлами {graph.skipped.get('unknown_nodes', 0)}")
+            messagebox.showinfo("Успех", message)
         except Exception as e:
             self._reset_all()
             messagebox.showerror("Ошибка", f"Не удалось загрузить граф: {str(e)}")
     
     def _place_node(self, event):
-        pos_x, pos_y = event.x, event.y
-        for node in self.nodes:
-            dist = math.sqrt((pos_x - node["x_coord"])**2 + (pos_y - node["y_coord"])**2)
-            if dist < self.MIN_SPACING:
-                return
+        if self.solve_thread is not None:
+            return
+        pos_x, pos_y = self.input_renderer.to_world(event.x, event.y)
+        pos_x, pos_y = int(pos_x), int(pos_y)
+        if self.node_grid.nearest(pos_x, pos_y, self.MIN_SPACING) is not None:
+            return
 
         if self.deleted_nodes:
             node_id = min(self.deleted_nodes)
@@ -210,207 +205,250 @@ class TSPApp:
             self.node_id_tracker += 1
             node_id = self.node_id_tracker
 
-        new_node = {"id": node_id, "x_coord": pos_x, "y_coord": pos_y}
-        self.nodes.append(new_node)
-
-        node_shape = self.input_area.create_oval(pos_x - self.NODE_SIZE, pos_y - self.NODE_SIZE, 
-                                                 pos_x + self.NODE_SIZE, pos_y + self.NODE_SIZE, fill="green")
-        label_id = self.input_area.create_text(pos_x, pos_y, text=str(node_id), fill="white")
+        self.graph.add_node(node_id, pos_x, pos_y)
+        self.node_grid.add(node_id, pos_x, pos_y)
+        self._redraw_input()
 
-        self.history.append(("node_added", new_node, node_shape, label_id))
+        self.history.append(("node_added", node_id))
+        self.incremental.add_node(node_id)
 
     def _pick_node_for_link(self, event):
-        pos_x, pos_y = event.x, event.y
-        for node in self.nodes:
-            dist = math.sqrt((pos_x - node["x_coord"])**2 + (pos_y - node["y_coord"])**2)
-            if dist < self.SELECTION_RADIUS:
-                if self.active_node is None:
-                    self.active_node = node
-                    self.active_label_id = self.input_area.create_text(node["x_coord"], node["y_coord"] - 30, 
-                                                                      text=f"Выбран узел: {node['id']}", fill="green")
-                    return
-                else:
-                    if self.active_node != node:
-                        existing_link_idx = -1
-                        for idx, link in enumerate(self.connections):
-                            if link[0] == self.active_node["id"] and link[1] == node["id"]:
-                                existing_link_idx = idx
-                                break
-
-                        if existing_link_idx != -1:
-                            old_weight = self.connections[existing_link_idx][2]
-                            new_weight = askinteger("Вес связи", 
-                                                    f"Связь {self.active_node['id']} -> {node['id']} существует. Вес: {old_weight}\nНовый вес:")
-                            if new_weight is not None:
-                                old_link = self.connections[existing_link_idx]
-                                self.connections[existing_link_idx] = (self.active_node["id"], node["id"], new_weight, old_link[3])
-                                self.edge_table.item(self.edge_table.get_children()[existing_link_idx], 
-                                                     values=(self.active_node["id"], node["id"], new_weight))
-                                self.history.append(("link_updated", old_link, self.connections[existing_link_idx]))
-
-                            self.input_area.delete(self.active_label_id)
-                            self.active_node = None
-                            self.active_label_id = None
-                            return
-
-                        weight = askinteger("Вес связи", f"Укажите вес для связи {self.active_node['id']} -> {node['id']}:")
-                        if weight is None:
-                            return
-
-                        link_id = self._render_directed_link(self.active_node, node)
-                        if link_id:
-                            self.connections.append((self.active_node["id"], node["id"], weight, link_id))
-                            self.edge_table.insert("", "end", values=(self.active_node["id"], node["id"], weight))
-                            self.history.append(("link_added", (self.active_node["id"], node["id"], weight, link_id)))
-
-                        self.input_area.delete(self.active_label_id)
-                        self.active_node = None
-                        self.active_label_id = None
-                    else:
-                        self.input_area.delete(self.active_label_id)
-                        self.active_node = None
-                        self.active_label_id = None
-
-    def _render_directed_link(self, start, end):
-        dx = end["x_coord"] - start["x_coord"]
-        dy = end["y_coord"] - start["y_coord"]
-        length = math.sqrt(dx**2 + dy**2)
-        if length == 0:
-            return None
-        dx /= length
-        dy /= length
-        begin_x = start["x_coord"] + dx * self.NODE_SIZE
-        begin_y = start["y_coord"] + dy * self.NODE_SIZE
-        finish_x = end["x_coord"] - dx * self.NODE_SIZE
-        finish_y = end["y_coord"] - dy * self.NODE_SIZE
-        link_id = self.input_area.create_line(begin_x, begin_y, finish_x, finish_y, 
-                                              arrow=tk.LAST, fill="black", width=2, 
-                                              arrowshape=(8, 8, 4))
-        return link_id
-
-    def _display_optimal_route(self, route, graph_data):
-        self.output_area.delete("all")
-        for node_id in route:
-            node = next(n for n in self.nodes if n["id"] == node_id)
-            self.output_area.create_oval(node["x_coord"] - self.NODE_SIZE, node["y_coord"] - self.NODE_SIZE, 
-                                        node["x_coord"] + self.NODE_SIZE, node["y_coord"] + self.NODE_SIZE, fill="green")
-            self.output_area.create_text(node["x_coord"], node["y_coord"], text=str(node_id), fill="white")
-        for i in range(len(route) - 1):
-            start_node = next(n for n in self.nodes if n["id"] == route[i])
-            end_node = next(n for n in self.nodes if n["id"] == route[i + 1])
-            self._render_link_on_output(start_node, end_node)
-        start_node = next(n for n in self.nodes if n["id"] == route[-1])
-        end_node = next(n for n in self.nodes if n["id"] == route[0])
-        self._render_link_on_output(start_node, end_node)
-        
-        max_x = max(node["x_coord"] for node in self.nodes if node["id"] in route) + self.NODE_SIZE
-        max_y = max(node["y_coord"] for node in self.nodes if node["id"] in route) + self.NODE_SIZE
-        self.output_area.configure(scrollregion=(0, 0, max_x, max_y))
-
-    def _render_link_on_output(self, start, end):
-        dx = end["x_coord"] - start["x_coord"]
-        dy = end["y_coord"] - start["y_coord"]
-        length = math.sqrt(dx**2 + dy**2)
-        if length == 0:
+        if self.solve_thread is not None:
             return
-        dx /= length
-        dy /= length
-        begin_x = start["x_coord"] + dx * self.NODE_SIZE
-        begin_y = start["y_coord"] + dy * self.NODE_SIZE
-        finish_x = end["x_coord"] - dx * self.NODE_SIZE
-        finish_y = end["y_coord"] - dy * self.NODE_SIZE
-        self.output_area.create_line(begin_x, begin_y, finish_x, finish_y, 
-                                     arrow=tk.LAST, fill="red", width=2, 
-                                     arrowshape=(8, 8, 4))
-
-    def _choose_start_node(self, graph_data):
-        min_cost = float('inf')
-        start_node = None
-        for node in self.nodes:
-            if graph_data[node["id"]]:  
-                min_neighbor_cost = min(graph_data[node["id"]].values())
-                if min_neighbor_cost < min_cost:
-                    min_cost = min_neighbor_cost
-                    start_node = node
-        return start_node if start_node else random.choice(self.nodes) 
-    
+        pos_x, pos_y = self.input_renderer.to_world(event.x, event.y)
+        node_id = self.node_grid.nearest(pos_x, pos_y, self.SELECTION_RADIUS)
+        if node_id is None:
+            return
+        if self.active_node is None:
+            self.active_node = node_id
+            self.input_renderer.set_selection((node_id, *self.graph.node(node_id)))
+            return
+
+        if self.active_node != node_id:
+            from_id = self.active_node
+            old_weight = self.graph.weight(from_id, node_id)
+            if old_weight is not None:
+                new_weight = askinteger("Вес связи", 
+                                        f"Связь {from_id} -> {node_id} существует. Вес: {old_weight}\nНовый вес:")
+                if new_weight is not None:
+                    self.graph.set_edge(from_id, node_id, new_weight)
+                    self.edge_table.refresh()
+                    self.history.append(("link_updated", from_id, node_id, old_weight, new_weight))
+                    self.incremental.set_edge(from_id, node_id, new_weight)
+
+                self.input_renderer.set_selection(None)
+                self.active_node = None
+                return
+
+            weight = askinteger("Вес связи", f"Укажите вес для связи {from_id} -> {node_id}:")
+            if weight is None:
+                return
+
+            self._add_link(from_id, node_id, weight)
+            self.history.append(("link_added", from_id, node_id))
+            self.incremental.set_edge(from_id, node_id, weight)
+            self._redraw_input()
+
+        self.input_renderer.set_selection(None)
+        self.active_node = None
+
+    def _add_link(self, from_id, to_id, weight):
+        self.graph.set_edge(from_id, to_id, weight)
+        # Новое ребро встаёт в конец массивов, туда и прокручивается таблица
+        self.edge_table.show_last()
+
+    def _remove_link(self, from_id, to_id):
+        self.graph.remove_edge(from_id, to_id)
+        self.edge_table.refresh()
+
+    def _redraw_input(self):
+        store = self.graph
+        self.input_renderer.set_graph(store.ids, store.xs, store.ys, store.sources, store.targets)
+
+    def _display_optimal_route(self, route):
+        positions = np.array([self.graph.index[node_id] for node_id in route], dtype=np.int64)
+        steps = np.arange(len(route))
+        self.output_renderer.set_graph(route, self.graph.xs[positions], self.graph.ys[positions],
+                                       steps, np.roll(steps, -1))
+
     def _solve_tsp(self):
+        if self.solve_thread is not None:
+            return
         for widget in self.result_container.winfo_children():
             widget.destroy()
-        if len(self.nodes) < 2:
+        if len(self.graph) < 2:
             tk.Label(self.result_container, text="Слишком мало узлов для расчёта").pack(fill="both", expand=True)
-            self.output_area.delete("all")
+            self.output_renderer.clear()
             return
-        
-        graph_data = {node["id"]: {} for node in self.nodes}
-        for link in self.connections:
-            graph_data[link[0]][link[1]] = link[2]
-
-        self.optimal_route = None 
-        min_total_cost = float('inf')
 
         use_modification = self.use_modification_var.get()
-        start_nodes = self.nodes if use_modification else [self._choose_start_node(graph_data)]
-
-        start_time = time.perf_counter()
-
-        for start_node in start_nodes:
-            visited_nodes = {n["id"]: False for n in self.nodes}
-            current_route = [start_node["id"]]
-            total_cost = 0
-            visited_nodes[start_node["id"]] = True
-            current = start_node
-
-            while len(current_route) < len(self.nodes):
-                smallest_cost = float('inf')
-                next_node_id = None
-                for neighbor, cost in graph_data[current["id"]].items():
-                    if not visited_nodes[neighbor] and cost < smallest_cost:
-                        smallest_cost = cost
-                        next_node_id = neighbor
-                if next_node_id is None:
-                    break
-                current_route.append(next_node_id)
-                total_cost += smallest_cost
-                visited_nodes[next_node_id] = True
-                current = next(n for n in self.nodes if n["id"] == next_node_id)
-            if len(current_route) == len(self.nodes) and start_node["id"] in graph_data[current["id"]]:
-                total_cost += graph_data[current["id"]][start_node["id"]]
-                if total_cost < min_total_cost:
-                    min_total_cost = total_cost
-                    self.optimal_route = current_route
-
-        end_time = time.perf_counter()
-        execution_time = (end_time - start_time) * 1000
-        
+        improve = self.use_local_search_var.get()
+        probe = self._new_probe()
+        # Проверка хранится в графе до его правки: повторный расчёт без правок её не повторяет
+        with phase(probe, "check"):
+            report = self.graph.feasibility()
+        if not report.feasible:
+            self._show_result(SolveResult(None, None, report.check_time, feasibility=report), probe=probe)
+            self._log_probe(probe, "solve", all_starts=use_modification, improve=improve, rejected=True)
+            return
+        with phase(probe, "cache"):
+            self.solve_key = self._result_key(use_modification, improve)
+            cached = self.result_cache.get(self.solve_key)
+        if cached is not None:
+            self._show_result(cached, probe=probe)
+            self._log_probe(probe, "solve", all_starts=use_modification, improve=improve, cached=True)
+            return
+
+        store = self.graph
+        # Перебор всех стартов идёт инкрементально по плотной матрице, пока она помещается в память;
+        # один старт на большом или редком графе и перебор на слишком большом решаются по CSR
+        sparse = (pick_engine("auto", len(store), store.edge_count, improve) == "sparse"
+                  and not (use_modification and dense_fits(len(store))))
+        with phase(probe, "build"):
+            if sparse:
+                problem = SparseGraph.from_arrays(store.ids, store.sources, store.targets, store.weights)
+            elif use_modification:
+                problem = None
+            else:
+                problem = CostMatrix.from_arrays(store.ids, store.sources, store.targets, store.weights)
+        self.solve_probe = probe
+        self.solve_cancel = threading.Event()
+        self.solve_progress = (0, len(self.graph) if use_modification else 1, None)
+        self.solve_improve = improve
+        self.solve_outcome = None
+        self.solve_started = time.perf_counter()
+        self.progress_label = tk.Label(self.result_container, text="Расчёт...")
+        self.progress_label.pack(fill="both", expand=True)
+        self.cancel_button.configure(state="normal")
+
+        # Граф не меняется, пока идёт расчёт: правки, загрузка и сброс заблокированы до его конца
+        self.solve_thread = threading.Thread(target=self._run_solve,
+                                             args=(use_modification, improve, problem),
+                                             daemon=True)
+        self.solve_thread.start()
+        self.root.after(self.POLL_INTERVAL, self._poll_solve)
+
+    def _result_key(self, use_modification, improve):
+        return graph_data_key(self.graph, solve_options(use_modification, improve))
+
+    def _new_probe(self):
+        return Probe(self.profile_mode) if self.instrument_log else None
+
+    def _log_probe(self, probe, event, **fields):
+        if probe is None:
+            return
+        try:
+            write_log(self.instrument_log, {"event": event, "nodes": len(self.graph),
+                                            "edges": self.graph.edge_count, **fields, **probe.report()})
+        except OSError:
+            pass
+
+    def _run_solve(self, use_modification, improve, problem):
+        probe = self.solve_probe
+        if probe is not None:
+            # Профиль снимается в потоке расчёта: cProfile видит только свой поток
+            probe.start()
+        total = self.solve_progress[1]
+        try:
+            # Отмена прерывает перебор стартов и улучшение маршрута; после перебора
+            # solve_progress показывает все старты обработанными
+            if isinstance(problem, SparseGraph):
+                with phase(probe, "solve"):
+                    self.solve_outcome = solve_sparse(problem, use_modification, check=False,
+                                                      collect_stats=probe is not None)
+                self._report_progress(total, total, self.solve_outcome.total_cost)
+            elif use_modification:
+                if self.incremental.dirty:
+                    # Полная загрузка строит матрицу и сразу перебирает все старты
+                    with phase(probe, "solve"):
+                        self.incremental.load(self.graph, self._report_progress, self.solve_cancel)
+                with phase(probe, "post"):
+                    self.solve_outcome = self.incremental.solve(improve=improve and not self.solve_cancel.is_set(),
+                                                                time_limit=IMPROVE_TIME_LIMIT,
+                                                                cancel=self.solve_cancel)
+                if not self.incremental.dirty:
+                    self._report_progress(total, total, self.solve_outcome.greedy_cost)
+            else:
+                self.solve_outcome = solve(problem, False, improve=improve, time_limit=IMPROVE_TIME_LIMIT,
+                                           probe=probe, check=False, collect_stats=probe is not None,
+                                           cancel=self.solve_cancel)
+                self._report_progress(total, total, self.solve_outcome.greedy_cost)
+        except Exception as e:
+            self.solve_outcome = e
+        finally:
+            if probe is not None:
+                probe.stop()
+
+    def _report_progress(self, done, total, best_cost):
+        self.solve_progress = (done, total, best_cost)
+
+    def _cancel_solve(self):
+        if self.solve_cancel is not None:
+            self.solve_cancel.set()
+
+    def _poll_solve(self):
+        done, total, best_cost = self.solve_progress
+        if self.solve_thread.is_alive():
+            elapsed = time.perf_counter() - self.solve_started
+            best_text = best_cost if best_cost is not None else "—"
+            self.progress_label.configure(text=f"Расчёт: стартов {done} из {total}\n"
+                                               f"Лучшая стоимость: {best_text}\nПрошло: {elapsed:.1f} с")
+            self.root.after(self.POLL_INTERVAL, self._poll_solve)
+            return
+
+        self.solve_thread = None
+        self.cancel_button.configure(state="disabled")
+        for widget in self.result_container.winfo_children():
+            widget.destroy()
+        result = self.solve_outcome
+        probe, self.solve_probe = self.solve_probe, None
+        if isinstance(result, Exception):
+            self.optimal_route = None
+            self.result_text = f"Маршрут не найден\nОшибка расчёта: {result}"
+            self.output_renderer.clear()
+            tk.Label(self.result_container, text=self.result_text).pack(fill="both", expand=True)
+            return
+
+        # Прогресс перечитывается: поток мог дописать его после первой проверки
+        done, total, _ = self.solve_progress
+        cancelled = self.solve_cancel.is_set()
+        if cancelled and done < total:
+            self._show_result(result, f"\nРасчёт остановлен: обработано стартов {done} из {total}", probe)
+        elif cancelled and self.solve_improve and result.route is not None:
+            self._show_result(result, f"\nСтартов обработано {done} из {total}, улучшение маршрута остановлено", probe)
+        else:
+            # Остановка после конца расчёта ничего не прервала: результат полный
+            cancelled = False
+            self.result_cache.put(self.solve_key, result)
+            self._show_result(result, probe=probe)
+        if probe is not None:
+            probe.add_stats(result.stats)
+            self._log_probe(probe, "solve", all_starts=self.use_modification_var.get(),
+                            improve=self.solve_improve, cancelled=cancelled,
+                            execution_time_ms=round(result.execution_time, 3))
+
+    def _show_result(self, result, note="", probe=None):
+        for widget in self.result_container.winfo_children():
+            widget.destroy()
+        self.optimal_route = result.route
+        self.result_text = format_result_text(result) + note
         if self.optimal_route:
-            route_str = [str(node) for node in self.optimal_route]
-            chunk_size = 7
-            route_lines = []
-            for i in range(0, len(route_str), chunk_size):
-                chunk = route_str[i:i + chunk_size]
-                route_lines.append(" -> ".join(chunk))
-            if route_lines:
-                route_lines[-1] += f" -> {self.optimal_route[0]}" 
-            
-            route_text = route_lines[0]  
-            for line in route_lines[1:]:
-                route_text += f"\n-> {line}"
-            
-            self.result_text = (
-                f"Оптимальный маршрут:\n"
-                f"{route_text}\n"
-                f"Общая стоимость: {min_total_cost}\n"
-                f"Время выполнения: {execution_time:.2f} мс"
-            )
-            self._display_optimal_route(self.optimal_route, graph_data)
+            with phase(probe, "render"):
+                self._display_optimal_route(self.optimal_route)
+                if probe is not None:
+                    self.output_renderer.canvas.update_idletasks()
         else:
-            self.result_text = f"Маршрут не найден\nВремя выполнения: {execution_time:.2f} мс"
-            self.output_area.delete("all")
+            self.output_renderer.clear()
         tk.Label(self.result_container, text=self.result_text).pack(fill="both", expand=True)
 
     def _save_result(self):
-        if not self.optimal_route and "Маршрут не найден" in self.result_text:
+        route, result_text = self.optimal_route, self.result_text
+        # Если текущий граф уже решался с этими настройками, выгружается ответ именно для него
+        cached = self.result_cache.get(self._result_key(self.use_modification_var.get(),
+                                                        self.use_local_search_var.get()))
+        if cached is not None and cached.route != route:
+            route, result_text = cached.route, format_result_text(cached)
+        if not route and "Маршрут не найден" in result_text:
             messagebox.showwarning("Предупреждение", "Нет оптимального маршрута для сохранения!")
             return
 
@@ -421,74 +459,58 @@ class TSPApp:
             return
 
         try:
+            coordinates, weights = route_export(self.graph, route) if route else ({}, {})
             with open(file_path, 'w', encoding="utf-8") as file:
-                file.write("# Nodes\n")
-                if self.optimal_route:
-                    for node_id in self.optimal_route:
-                        node = next(n for n in self.nodes if n["id"] == node_id)
-                        file.write(f"{node['id']},{node['x_coord']},{node['y_coord']}\n")
-                
-                file.write("# Edges\n")
-                if self.optimal_route:
-                    for i in range(len(self.optimal_route) - 1):
-                        start_id = self.optimal_route[i]
-                        end_id = self.optimal_route[i + 1]
-                        weight = next((link[2] for link in self.connections if link[0] == start_id and link[1] == end_id), 0)
-                        file.write(f"{start_id},{end_id},{weight}\n")
-                    start_id = self.optimal_route[-1]
-                    end_id = self.optimal_route[0]
-                    weight = next((link[2] for link in self.connections if link[0] == start_id and link[1] == end_id), 0)
-                    file.write(f"{start_id},{end_id},{weight}\n")
-
-                file.write("# Result Info\n")
-                file.write(self.result_text)
+                write_result(file, route, coordinates, weights, result_text)
 
             messagebox.showinfo("Успех", "Результат успешно сохранён!")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось сохранить результат: {str(e)}")
 
     def _revert_last_step(self):
-        if not self.history:
+        if not self.history or self.solve_thread is not None:
             return
         last_step = self.history.pop()
-        if last_step[0] == "node_added":
-            self.deleted_nodes.append(last_step[1]["id"])
-            self.nodes.remove(last_step[1])
-            self.input_area.delete(last_step[2])
-            self.input_area.delete(last_step[3])
-            if self.active_node == last_step[1]:
-                if self.active_label_id:
-                    self.input_area.delete(self.active_label_id)
+        if last_step[0] == "graph_loaded":
+            # До загрузки граф был пуст: загрузка сбрасывает всё перед чтением файла
+            self._clear_graph()
+        elif last_step[0] == "node_added":
+            node_id = last_step[1]
+            self.deleted_nodes.append(node_id)
+            self.graph.remove_node(node_id)
+            self.node_grid.remove(node_id)
+            self.incremental.remove_node(node_id)
+            if self.active_node == node_id:
+                self.input_renderer.set_selection(None)
                 self.active_node = None
-                self.active_label_id = None
         elif last_step[0] == "link_added":
-            link_to_remove = last_step[1]
-            self.connections = [link for link in self.connections if not (link[0] == link_to_remove[0] and link[1] == link_to_remove[1])]
-            if link_to_remove[3]:
-                self.input_area.delete(link_to_remove[3])
-            for row in self.edge_table.get_children():
-                if self.edge_table.item(row, "values")[:2] == (str(link_to_remove[0]), str(link_to_remove[1])):
-                    self.edge_table.delete(row)
-                    break
+            _, from_id, to_id = last_step
+            if self.graph.weight(from_id, to_id) is not None:
+                self._remove_link(from_id, to_id)
+            self.incremental.set_edge(from_id, to_id, None)
         elif last_step[0] == "link_updated":
-            old_link, new_link = last_step[1], last_step[2]
-            for i, link in enumerate(self.connections):
-                if link[0] == new_link[0] and link[1] == new_link[1]:
-                    self.connections[i] = old_link
-                    self.edge_table.item(self.edge_table.get_children()[i], values=(old_link[0], old_link[1], old_link[2]))
-                    break
-
-    def _reset_all(self):
-        self.edge_table.delete(*self.edge_table.get_children())
-        self.input_area.delete("all")
-        self.output_area.delete("all")
-        self.nodes.clear()
-        self.connections.clear()
+            _, from_id, to_id, old_weight, _ = last_step
+            self.graph.set_edge(from_id, to_id, old_weight)
+            self.incremental.set_edge(from_id, to_id, old_weight)
+            self.edge_table.refresh()
+        self._redraw_input()
+
+    def _clear_graph(self):
+        self.input_renderer.clear()
+        self.graph.clear()
+        self.edge_table.refresh()
+        self.incremental.reset()
+        self.node_grid.clear()
+        self.history.clear()
+        self.deleted_nodes.clear()
         self.node_id_tracker = 0
         self.active_node = None
-        if self.active_label_id:
-            self.input_area.delete(self.active_label_id)
-            self.active_label_id = None
+
+    def _reset_all(self):
+        if self.solve_thread is not None:
+            return
+        self._clear_graph()
+        self.output_renderer.clear()
         self.optimal_route = None
         self.result_text = ""
         for widget in self.result_container.winfo_children():
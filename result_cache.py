@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from tsp_solver import SolveResult
+
+KEY_VERSION = b"tsp-result-v2"
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+
+
+def graph_key(ids, sources, targets, weights, options, xs=None, ys=None):
+    # Ключ не зависит от порядка рёбер в файле, но зависит от порядка узлов: при равных весах
+    # побеждает узел, объявленный раньше, и маршрут может измениться. options — только то, что
+    # меняет ответ (один старт или все, улучшение, разбиение). Координаты (xs, ys в порядке ids)
+    # меняют ответ только при разбиении на кластеры и передаются лишь тогда
+    ids = np.asarray(ids, dtype=np.int64)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    order = np.lexsort((targets, sources))
+    parts = [ids, sources[order], targets[order], np.asarray(weights, dtype=np.float64)[order]]
+    if xs is not None:
+        parts += [np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)]
+    digest = hashlib.sha256(KEY_VERSION)
+    for values in parts:
+        digest.update(len(values).to_bytes(8, "little"))
+        digest.update(np.ascontiguousarray(values).tobytes())
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def graph_data_key(graph, options):
+    # Рёбра графа хранят индексы узлов; в ключ идут их ID
+    ids = np.asarray(graph.ids)
+    if "decompose" in options:
+        return graph_key(ids, ids[graph.sources], ids[graph.targets], graph.weights, options, graph.xs, graph.ys)
+    return graph_key(ids, ids[graph.sources], ids[graph.targets], graph.weights, options)
+
+
+def solve_options(use_modification, improve, decompose=None):
+    # decompose: (метод, размер кластера) для решения с разбиением; без него ключи прежние
+    options = {"all_starts": bool(use_modification), "improve": bool(improve)}
+    if decompose is not None:
+        options["decompose"] = list(decompose)
+    return options
+
+
+class ResultCache:
+    # Память — LRU с вытеснением по суммарному размеру записей; каталог на диске переживает перезапуск
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        start_time = time.perf_counter()
+        entry = self.entries.get(key)
+        if entry is not None:
+            record = entry[0]
+            self.entries.move_to_end(key)
+            self.hits += 1
+        else:
+            record = self._read_disk(key)
+            if record is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, record)
+        lookup_time = (time.perf_counter() - start_time) * 1000
+        stats = dict(record["stats"], cached=True, solve_time_ms=record["execution_time"])
+        return SolveResult(record["route"], record["total_cost"], lookup_time, stats, record["greedy_cost"])
+
+    def put(self, key, result):
+        # Отказ по предварительной проверке дешевле пересчитать, чем хранить
+        if result.rejected:
+            return
+        record = {
+            "route": result.route,
+            "total_cost": result.total_cost,
+            "greedy_cost": result.greedy_cost,
+            "execution_time": result.execution_time,
+            "stats": {name: value for name, value in result.stats.items() if name != "cached"},
+        }
+        self._remember(key, record)
+        if self.directory:
+            path = self._path(key)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding="utf-8") as file:
+                json.dump(record, file)
+            os.replace(temp_path, path)
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _remember(self, key, record):
+        # Размер записи оценивается по её JSON-представлению
+        size = len(json.dumps(record))
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (record, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self.entries),
+            "memory_bytes": self.size,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,48 @@
+import math
+
+
+class GridIndex:
+    # Равномерная сетка: точка попадает в ячейку (x // cell_size, y // cell_size),
+    # поиск в радиусе смотрит только соседние ячейки
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.points = {}
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def add(self, item_id, x, y):
+        self.points[item_id] = (x, y)
+        self.cells.setdefault(self._cell(x, y), []).append(item_id)
+
+    def remove(self, item_id):
+        x, y = self.points.pop(item_id)
+        cell = self._cell(x, y)
+        items = self.cells[cell]
+        items.remove(item_id)
+        if not items:
+            del self.cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.points.clear()
+
+    def __len__(self):
+        return len(self.points)
+
+    def nearest(self, x, y, radius):
+        # Ближайшая точка строго ближе radius, иначе None
+        reach = int(math.ceil(radius / self.cell_size))
+        cell_x, cell_y = self._cell(x, y)
+        best_id = None
+        best_dist = radius
+        for gx in range(cell_x - reach, cell_x + reach + 1):
+            for gy in range(cell_y - reach, cell_y + reach + 1):
+                for item_id in self.cells.get((gx, gy), ()):
+                    px, py = self.points[item_id]
+                    dist = math.sqrt((x - px)**2 + (y - py)**2)
+                    if dist < best_dist:
+                        best_dist = dist
+                        best_id = item_id
+        return best_id
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Модули решателя лежат в корне репозитория, тесты — в tests/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
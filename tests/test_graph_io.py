@@ -0,0 +1,25 @@
+import glob
+import os
+
+import pytest
+
+from conftest import ROOT
+from graph_io import check_round_trip, read_graph_binary, read_graph_text, write_graph_binary
+
+GRAPH_FILES = sorted(glob.glob(os.path.join(ROOT, "Graphs", "*.txt")))
+
+
+@pytest.mark.parametrize("file_path", GRAPH_FILES, ids=os.path.basename)
+def test_round_trip(file_path):
+    assert check_round_trip(file_path)
+
+
+def test_binary_rejects_edge_outside_nodes(tmp_path):
+    graph = read_graph_text(GRAPH_FILES[0])
+    graph.targets = graph.targets.copy()
+    graph.targets[0] = graph.node_count
+    file_path = tmp_path / "graph.tspg"
+    write_graph_binary(graph, file_path)
+    with pytest.raises(ValueError):
+        read_graph_binary(file_path)
+
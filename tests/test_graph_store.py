@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+
+from Graphs.generate_graph import generate_graph
+from graph_store import GraphStore
+
+
+def _edges(store):
+    return {(from_id, to_id): weight for from_id, to_id, weight in store.links()}
+
+
+def _check(store, nodes, edges):
+    assert sorted(store.ids.tolist()) == sorted(nodes)
+    assert all(store.ids[store.index[node_id]] == node_id for node_id in nodes)
+    assert _edges(store) == edges
+    assert all(store.weight(from_id, to_id) == weight for (from_id, to_id), weight in edges.items())
+    # Позиции рёбер узлов совпадают с тем, что лежит в массивах
+    for node in range(len(store)):
+        expected = set(np.flatnonzero((store.sources == node) | (store.targets == node)).tolist())
+        assert store._incidence[node] == expected
+
+
+def test_edits_keep_store_consistent():
+    rng = random.Random(0)
+    graph = generate_graph(30, 0.2, seed=0)
+    store = GraphStore()
+    store.load(graph)
+    nodes = graph.ids.tolist()
+    edges = _edges(store)
+    next_id = max(nodes) + 1
+    for _ in range(400):
+        action = rng.random()
+        if action < 0.15 or len(nodes) < 3:
+            store.add_node(next_id, rng.randint(0, 100), rng.randint(0, 100))
+            nodes.append(next_id)
+            next_id += 1
+        elif action < 0.3:
+            node_id = rng.choice(nodes)
+            removed = store.remove_node(node_id)
+            nodes.remove(node_id)
+            incident = {key: weight for key, weight in edges.items() if node_id in key}
+            assert {(from_id, to_id): weight for from_id, to_id, weight in removed} == incident
+            for key in incident:
+                del edges[key]
+        elif action < 0.5 and edges:
+            from_id, to_id = rng.choice(sorted(edges))
+            assert store.remove_edge(from_id, to_id) == edges.pop((from_id, to_id))
+        else:
+            from_id, to_id = rng.sample(nodes, 2)
+            weight = rng.randint(1, 50)
+            assert store.set_edge(from_id, to_id, weight) == edges.get((from_id, to_id))
+            edges[(from_id, to_id)] = weight
+        _check(store, nodes, edges)
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+from Graphs.generate_graph import GraphData
+from result_cache import ResultCache, graph_data_key, solve_options
+from tsp_decompose import solve_decomposed
+from tsp_solver import CostMatrix, SolveResult, solve
+
+OPTIONS = solve_options(True, False)
+DECOMPOSE = solve_options(True, False, ("grid", 4))
+
+
+def _graph(seed, n=12):
+    # Веса 1..3, поэтому равных рёбер много и порядок узлов влияет на маршрут
+    rng = np.random.default_rng(seed)
+    mask = rng.random((n, n)) < 0.6
+    np.fill_diagonal(mask, False)
+    sources, targets = np.nonzero(mask)
+    return GraphData(np.arange(1, n + 1) * 10, rng.integers(0, 1000, n), rng.integers(0, 1000, n),
+                     sources, targets, rng.integers(1, 4, len(sources)).astype(np.float64))
+
+
+def _reorder(graph, nodes=None, edges=None):
+    # Тот же граф с узлами в порядке nodes и рёбрами в порядке edges
+    nodes = np.arange(len(graph.ids)) if nodes is None else np.asarray(nodes)
+    edges = np.arange(len(graph.sources)) if edges is None else np.asarray(edges)
+    position = np.empty(len(nodes), dtype=np.int64)
+    position[nodes] = np.arange(len(nodes))
+    return GraphData(graph.ids[nodes], graph.xs[nodes], graph.ys[nodes], position[graph.sources[edges]],
+                     position[graph.targets[edges]], graph.weights[edges])
+
+
+def _solve(graph):
+    return solve(CostMatrix.from_arrays(graph.ids, graph.sources, graph.targets, graph.weights), True)
+
+
+def test_key_ignores_edge_order():
+    rng = np.random.default_rng(0)
+    for seed in range(5):
+        graph = _graph(seed)
+        shuffled = _reorder(graph, edges=rng.permutation(len(graph.sources)))
+        assert graph_data_key(shuffled, OPTIONS) == graph_data_key(graph, OPTIONS)
+        assert graph_data_key(shuffled, DECOMPOSE) == graph_data_key(graph, DECOMPOSE)
+
+
+def test_cached_result_matches_fresh_solve():
+    # Переставленные узлы и рёбра, другие координаты: из кэша приходит то же, что дал бы расчёт
+    rng = np.random.default_rng(1)
+    cache = ResultCache()
+    for seed in range(5):
+        graph = _graph(seed)
+        variants = [graph, _reorder(graph, edges=rng.permutation(len(graph.sources)))]
+        variants += [_reorder(graph, nodes=rng.permutation(len(graph.ids))) for _ in range(3)]
+        for variant in variants:
+            fresh = _solve(variant)
+            key = graph_data_key(variant, OPTIONS)
+            cached = cache.get(key)
+            if cached is None:
+                cache.put(key, fresh)
+            else:
+                assert (cached.route, cached.total_cost) == (fresh.route, fresh.total_cost)
+    assert cache.hits
+
+
+def test_node_order_is_part_of_key():
+    # Из узла 1 два ребра веса 1: выбор зависит от того, какой из узлов 2 и 3 объявлен раньше
+    graph = GraphData(np.array([1, 2, 3, 4]), np.zeros(4), np.zeros(4), np.array([0, 0, 2, 1, 3, 1, 2]),
+                      np.array([2, 1, 1, 3, 0, 2, 3]), np.array([1.0, 1, 1, 1, 1, 1, 9]))
+    swapped = _reorder(graph, nodes=[0, 2, 1, 3])
+    assert _solve(swapped).route != _solve(graph).route
+    assert graph_data_key(swapped, OPTIONS) != graph_data_key(graph, OPTIONS)
+
+
+def test_coordinates_change_key_only_with_decompose():
+    graph = _graph(0, n=40)
+    moved = GraphData(graph.ids, graph.ys, graph.xs, graph.sources, graph.targets, graph.weights)
+    assert graph_data_key(moved, OPTIONS) == graph_data_key(graph, OPTIONS)
+    assert graph_data_key(moved, DECOMPOSE) != graph_data_key(graph, DECOMPOSE)
+    # Прежний ключ без координат отдал бы маршрут, собранный по другим кластерам
+    assert (solve_decomposed(moved, "grid", 4, workers=1, compare=False).route
+            != solve_decomposed(graph, "grid", 4, workers=1, compare=False).route)
+
+
+def _result(route):
+    return SolveResult(route, float(len(route)), 1.0, {"starts": len(route)}, float(len(route)))
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResultCache()
+    cache.put("a", _result([1, 2, 3]))
+    cache.max_bytes = cache.size * 2
+    cache.put("b", _result([1, 3, 2]))
+    assert cache.get("a") is not None
+    cache.put("c", _result([2, 1, 3]))
+    assert cache.get("b") is None
+    assert cache.get("a").route == [1, 2, 3]
+    assert cache.get("c").route == [2, 1, 3]
+    assert cache.stats()["evictions"] == 1
+    assert cache.size <= cache.max_bytes
+
+
+def test_disk_tier_round_trip(tmp_path):
+    graph = _graph(2)
+    key = graph_data_key(graph, OPTIONS)
+    result = _solve(graph)
+    ResultCache(directory=str(tmp_path)).put(key, result)
+
+    restarted = ResultCache(directory=str(tmp_path))
+    cached = restarted.get(key)
+    assert (cached.route, cached.total_cost, cached.greedy_cost) == (result.route, result.total_cost,
+                                                                     result.greedy_cost)
+    assert cached.stats["cached"] is True
+    assert cached.stats["starts"] == result.stats["starts"]
+    assert restarted.stats()["disk_hits"] == 1
+    # Повторный запрос берётся уже из памяти
+    restarted.get(key)
+    assert restarted.stats()["disk_hits"] == 1
+
+    (tmp_path / f"{key}.json").write_text("{", encoding="utf-8")
+    assert ResultCache(directory=str(tmp_path)).get(key) is None
+
+
+def test_rejected_result_is_not_cached():
+    graph = GraphData(np.array([1, 2, 3]), np.zeros(3), np.zeros(3), np.array([0, 1]), np.array([1, 2]),
+                      np.array([1.0, 1.0]))
+    result = _solve(graph)
+    assert result.rejected
+    cache = ResultCache()
+    cache.put("key", result)
+    assert cache.get("key") is None
+
+
+@pytest.mark.parametrize("options", [OPTIONS, DECOMPOSE])
+def test_options_are_part_of_key(options):
+    graph = _graph(3)
+    other = solve_options(not options["all_starts"], options["improve"], options.get("decompose"))
+    assert graph_data_key(graph, options) != graph_data_key(graph, other)
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+import tsp_decompose
+from Graphs.generate_graph import GraphData, generate_graph
+from tsp_decompose import CLUSTER_METHODS, solve_decomposed
+from tsp_sparse import SparseGraph, solve_sparse
+
+
+def _knn_graph(n, k, seed, symmetric=True):
+    # Каждый узел связан с k ближайшими по плоскости; вес — расстояние
+    rng = np.random.default_rng(seed)
+    xs, ys = rng.integers(0, 1000, n), rng.integers(0, 1000, n)
+    distance = np.hypot(xs[:, None] - xs[None, :], ys[:, None] - ys[None, :])
+    np.fill_diagonal(distance, np.inf)
+    sources = np.repeat(np.arange(n), k)
+    targets = np.argsort(distance, axis=1, kind="stable")[:, :k].ravel()
+    if symmetric:
+        sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+    keys = np.unique(sources * n + targets)
+    sources, targets = keys // n, keys % n
+    return GraphData(np.arange(1, n + 1), xs, ys, sources, targets, np.round(distance[sources, targets], 1))
+
+
+def _ring(m):
+    # m узлов слева и m справа; единственный тур чередует стороны, поэтому кластеры распадаются на
+    # одиночные узлы и сшиваются только вытеснением
+    xs = np.concatenate([np.zeros(m), np.full(m, 1000)]).astype(np.int64)
+    ys = np.concatenate([np.arange(m), np.arange(m)]) * 10
+    sources = np.array([node for i in range(m) for node in (i, m + i)])
+    return GraphData(np.arange(1, 2 * m + 1), xs, ys, sources, np.roll(sources, -1), np.ones(2 * m))
+
+
+def _assert_tour(graph, result):
+    index = {node_id: i for i, node_id in enumerate(graph.ids.tolist())}
+    route = [index[node_id] for node_id in result.route]
+    assert sorted(route) == list(range(len(graph.ids)))
+    weights = {(s, t): w for s, t, w in zip(graph.sources.tolist(), graph.targets.tolist(), graph.weights.tolist())}
+    legs = list(zip(route, route[1:] + route[:1]))
+    assert all(leg in weights for leg in legs)
+    assert result.total_cost == pytest.approx(sum(weights[leg] for leg in legs))
+
+
+@pytest.mark.parametrize("method", CLUSTER_METHODS)
+def test_route_is_hamiltonian(method):
+    for seed in range(5):
+        graph = _knn_graph(80, 8, seed)
+        result = solve_decomposed(graph, method, 10, use_modification=False, workers=1, compare=False)
+        assert result.stats["clusters"] > 1
+        assert "flat_fallback" not in result.stats
+        _assert_tour(graph, result)
+
+
+def test_unplaced_pieces_fall_back_to_flat_solution(monkeypatch):
+    # Бюджет вытеснений в n / 2 попыток кончается раньше, чем кольцо сшивается
+    monkeypatch.setattr(tsp_decompose, "EJECT_MIN_ATTEMPTS", 1)
+    graph = _ring(8)
+    result = solve_decomposed(graph, "grid", 8, use_modification=False, workers=1, compare=False)
+    assert result.stats["unplaced_pieces"] > 0
+    assert result.stats["eject_attempts"] <= len(graph.ids) // 2
+    assert result.stats["flat_fallback"] == 1
+    _assert_tour(graph, result)
+
+
+def test_ranks_follow_route_after_ejection(monkeypatch):
+    checked = []
+    eject = tsp_decompose._Stitcher.eject
+
+    def checked_eject(stitcher, nodes):
+        moved = eject(stitcher, nodes)
+        if moved is not None:
+            merged = np.flatnonzero(stitcher.merged)
+            ranks = stitcher.rank[merged]
+            assert sorted(ranks.tolist()) == list(range(stitcher.merged_count))
+            assert (stitcher.rank[stitcher.succ[merged]] == (ranks + 1) % stitcher.merged_count).all()
+            assert (stitcher.rank[~stitcher.merged] == -1).all()
+            checked.append(len(moved[1]))
+        return moved
+
+    monkeypatch.setattr(tsp_decompose._Stitcher, "eject", checked_eject)
+    for seed in range(10):
+        solve_decomposed(_knn_graph(60, 4, seed), "grid", 10, use_modification=False, workers=1, compare=False)
+    solve_decomposed(_ring(4), "grid", 4, use_modification=False, workers=1, compare=False)
+    # Среди вытеснений есть и такие, что убирают отрезок маршрута
+    assert checked and max(checked) > 0
+
+
+@pytest.mark.parametrize("use_modification", [False, True])
+@pytest.mark.parametrize("method", CLUSTER_METHODS)
+def test_finds_tour_whenever_flat_solver_does(method, use_modification):
+    graphs = [_knn_graph(40, 8, seed, symmetric=False) for seed in range(5)]
+    graphs += [_ring(m) for m in (4, 8, 30, 50)]
+    graphs += [generate_graph(60, density, seed=seed) for seed in range(3) for density in (0.1, 0.3)]
+    flat_found = 0
+    for graph in graphs:
+        flat = solve_sparse(SparseGraph.from_arrays(graph.ids, graph.sources, graph.targets, graph.weights),
+                            use_modification)
+        result = solve_decomposed(graph, method, 8, use_modification, workers=1, compare=False)
+        if flat.found:
+            flat_found += 1
+            _assert_tour(graph, result)
+    assert flat_found
+
+
+@pytest.mark.parametrize("cluster_size", [1, 0, -5])
+def test_cluster_size_below_two_is_rejected(cluster_size):
+    with pytest.raises(ValueError):
+        solve_decomposed(_ring(4), "grid", cluster_size, workers=1)
@@ -0,0 +1,114 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from tsp_feasibility import check_cost_feasibility, check_feasibility
+
+
+def _random_graph(rng, n, density):
+    return [(i, j) for i in range(n) for j in range(n) if i != j and rng.random() < density]
+
+
+def _hamiltonian(n, edges):
+    # Перебор всех циклов с узлом 0 в начале: годится только для маленьких графов
+    present = set(edges)
+    for order in itertools.permutations(range(1, n)):
+        route = (0,) + order + (0,)
+        if all(pair in present for pair in zip(route, route[1:])):
+            return True
+    return False
+
+
+def _strongly_connected(n, edges):
+    reach = np.eye(n, dtype=bool)
+    for i, j in edges:
+        reach[i, j] = True
+    for k in range(n):
+        reach |= reach[:, k:k + 1] & reach[k]
+    return bool(reach.all())
+
+
+def _check_both(ids, n, edges):
+    sources = np.array([i for i, _ in edges], dtype=np.int64)
+    targets = np.array([j for _, j in edges], dtype=np.int64)
+    cost = np.full((n, n), np.inf)
+    for i, j in edges:
+        cost[i, j] = 1.0
+    return check_feasibility(ids, sources, targets), check_cost_feasibility(ids, cost)
+
+
+def _same(sparse, dense):
+    expected = sparse.as_dict()
+    actual = dense.as_dict()
+    del expected["check_time_ms"], actual["check_time_ms"]
+    assert actual == expected
+
+
+def _graphs():
+    rng = random.Random(0)
+    for _ in range(600):
+        n = rng.randint(2, 7)
+        yield n, _random_graph(rng, n, rng.choice((0.2, 0.35, 0.5, 0.7)))
+
+
+def test_hamiltonian_graphs_pass_and_reasons_are_true():
+    kinds = set()
+    for n, edges in _graphs():
+        ids = np.arange(100, 100 + n)
+        sparse, dense = _check_both(ids, n, edges)
+        _same(sparse, dense)
+        if _hamiltonian(n, edges):
+            # Условия необходимые: граф с циклом не может быть отвергнут
+            assert sparse.feasible
+            kinds.add("cycle")
+            continue
+        out_degree = np.bincount([i for i, _ in edges], minlength=n)
+        in_degree = np.bincount([j for _, j in edges], minlength=n)
+        forced_in = [i for i, j in edges if in_degree[j] == 1]
+        forced_out = [j for i, j in edges if out_degree[i] == 1]
+        expected = {
+            "нет исходящих": (out_degree == 0).any(),
+            "нет входящих": (in_degree == 0).any(),
+            "единственный вход": len(forced_in) != len(set(forced_in)),
+            "единственный выход": len(forced_out) != len(set(forced_out)),
+            "не сильно связен": not _strongly_connected(n, edges),
+        }
+        for marker, holds in expected.items():
+            assert any(marker in reason for reason in sparse.reasons) == holds
+            if holds:
+                kinds.add(marker)
+        if not sparse.feasible:
+            assert set(sparse.blocking) <= set(ids.tolist()) and sparse.blocking
+    # Случайные графы должны задеть каждую причину, иначе проверка выше ничего не доказывает
+    assert kinds == {"cycle", "нет исходящих", "нет входящих", "единственный вход", "единственный выход",
+                     "не сильно связен"}
+
+
+@pytest.mark.parametrize("edges, marker", [
+    # В узел 2 входит только ребро из 0, в узел 3 тоже: 0 должен вести сразу в оба
+    ([(0, 2), (0, 3), (1, 0), (2, 1), (3, 1)], "единственный вход"),
+    # Из 2 и 3 можно выйти только в 0
+    ([(2, 0), (3, 0), (0, 1), (1, 2), (1, 3), (0, 2)], "единственный выход"),
+    # Две сильно связные половины, соединённые в одну сторону
+    ([(0, 1), (1, 0), (2, 3), (3, 2), (1, 2)], "не сильно связен"),
+])
+def test_sparse_and_dense_agree_on_reasons(edges, marker):
+    ids = np.array([7, 3, 11, 5])
+    sparse, dense = _check_both(ids, 4, edges)
+    _same(sparse, dense)
+    assert not sparse.feasible
+    assert any(marker in reason for reason in sparse.reasons)
+
+
+def test_components_and_loops():
+    # Две компоненты: в отчёт попадает меньшая; петля на узле 1 ничего не меняет
+    ids = np.arange(5)
+    edges = [(0, 1), (1, 0), (2, 3), (3, 4), (4, 2), (1, 1)]
+    sparse, dense = _check_both(ids, 5, [edge for edge in edges if edge[0] != edge[1]])
+    _same(sparse, dense)
+    assert sparse.components == 2
+    assert sparse.blocking == [0, 1]
+    looped = check_feasibility(ids, np.array([i for i, _ in edges]), np.array([j for _, j in edges]))
+    assert looped.reasons == sparse.reasons
@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+
+from Graphs.generate_graph import generate_graph
+from graph_store import GraphStore
+from tsp_incremental import IncrementalSolver
+from tsp_solver import CostMatrix, solve
+
+
+def _reference(store, ids):
+    # Полный пересчёт с узлами в том же порядке, что и у IncrementalSolver: от порядка зависят ничьи
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    position = np.array([index[node_id] for node_id in store.ids.tolist()], dtype=np.int64)
+    matrix = CostMatrix.from_arrays(ids, position[store.sources], position[store.targets], store.weights)
+    return {use_modification: solve(matrix, use_modification, check=False) for use_modification in (True, False)}
+
+
+def _assert_matches(solver, store):
+    if solver.dirty:
+        solver.load(store)
+    expected = _reference(store, solver.ids)
+    for use_modification, result in expected.items():
+        actual = solver.solve(use_modification)
+        assert (actual.route, actual.total_cost) == (result.route, result.total_cost)
+
+
+def test_edits_match_full_solve():
+    rng = random.Random(0)
+    for seed in range(4):
+        store = GraphStore()
+        # Веса 1..5 дают много равных рёбер, а с ними и ничьих при выборе соседа
+        graph = generate_graph(14, 0.8, seed=seed)
+        graph.weights = graph.weights % 5 + 1
+        store.load(graph)
+        solver = IncrementalSolver()
+        solver.load(store)
+        next_id = int(store.ids.max()) + 1
+        for _ in range(150):
+            ids = store.ids.tolist()
+            action = rng.random()
+            if action < 0.4:
+                from_id, to_id = rng.sample(ids, 2)
+                weight = rng.randint(1, 5)
+                store.set_edge(from_id, to_id, weight)
+                solver.set_edge(from_id, to_id, weight)
+            elif action < 0.65 and store.edge_count:
+                from_id, to_id, _ = rng.choice(list(store.links()))
+                store.remove_edge(from_id, to_id)
+                solver.set_edge(from_id, to_id, None)
+            elif action < 0.94 and store.edge_count:
+                from_id, to_id, weight = rng.choice(list(store.links()))
+                weight = max(1, weight + rng.choice((-2, -1, 1, 2)))
+                store.set_edge(from_id, to_id, weight)
+                solver.set_edge(from_id, to_id, weight)
+            elif action < 0.97 or len(ids) < 5:
+                store.add_node(next_id, 0, 0)
+                solver.add_node(next_id)
+                _assert_matches(solver, store)
+                # Как в окне: новый узел сразу связывается с остальными
+                for other in rng.sample(ids, 3):
+                    for from_id, to_id in ((next_id, other), (other, next_id)):
+                        weight = rng.randint(1, 5)
+                        store.set_edge(from_id, to_id, weight)
+                        solver.set_edge(from_id, to_id, weight)
+                next_id += 1
+            else:
+                node_id = rng.choice(ids)
+                store.remove_node(node_id)
+                solver.remove_node(node_id)
+            _assert_matches(solver, store)
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from tsp_local_search import improve_route, tour_cost
+from tsp_neighbors import NeighborIndex
+from tsp_solver import CostMatrix, solve
+
+
+def _greedy(n, density, seed):
+    # Жадный тур на случайном графе: несимметричные веса, часть рёбер отсутствует
+    rng = np.random.default_rng(seed)
+    cost = np.where(rng.random((n, n)) < density, rng.integers(1, 100, (n, n)).astype(np.float64), np.inf)
+    np.fill_diagonal(cost, np.inf)
+    result = solve(CostMatrix(np.arange(n), cost), False, check=False)
+    return cost, result.route, result.total_cost
+
+
+def _cases():
+    for seed in range(30):
+        cost, route, total_cost = _greedy(8 + seed * 3, 0.3 + seed % 7 * 0.1, seed)
+        if route is not None:
+            yield cost, route, total_cost
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_improved_route_is_valid_and_not_worse(use_index):
+    checked = 0
+    for cost, route, total_cost in _cases():
+        index = NeighborIndex.from_cost(cost) if use_index else None
+        stats = {}
+        improved, improved_cost = improve_route(cost, route, stats=stats, index=index)
+        assert sorted(improved) == list(range(len(cost)))
+        assert improved[0] == route[0]
+        assert improved_cost <= total_cost
+        assert improved_cost == tour_cost(cost, improved)
+        assert np.isfinite(improved_cost)
+        checked += stats["improving_moves"] > 0
+    assert checked
+
+
+def test_max_moves_is_honored():
+    cost, route, total_cost = next(case for case in _cases() if len(case[0]) > 40)
+    free = {}
+    improve_route(cost, route, stats=free)
+    assert free["improving_moves"] > 3
+    for limit in (0, 1, 3):
+        stats = {}
+        improved, improved_cost = improve_route(cost, route, max_moves=limit, stats=stats)
+        assert stats["improving_moves"] == limit
+        assert improved_cost <= total_cost
+    assert improve_route(cost, route, max_moves=0) == (route, total_cost)
+
+
+def test_time_limit_is_honored():
+    cost, route, _ = _greedy(1500, 1.0, 0)
+    free = {}
+    improve_route(cost, route, stats=free)
+    stats = {}
+    started = time.perf_counter()
+    improve_route(cost, route, time_limit=0.05, stats=stats)
+    # Предел проверяется между ходами: сверху остаются один ход и пересчёт стоимости
+    assert time.perf_counter() - started < 0.5
+    assert stats["improving_moves"] < free["improving_moves"]
+    stats = {}
+    assert improve_route(cost, route, time_limit=0, stats=stats)[0] == route
+    assert stats["improving_moves"] == 0
+
+
+def test_cancel_stops_improvement():
+    cost, route, total_cost = _greedy(1500, 1.0, 0)
+    cancel = threading.Event()
+    cancel.set()
+    stats = {}
+    assert improve_route(cost, route, stats=stats, cancel=cancel) == (route, total_cost)
+    assert stats["improving_moves"] == 0
+
+    # Отмена из другого потока, как кнопкой окна: улучшение останавливается на следующем ходе
+    matrix = CostMatrix(np.arange(len(cost)), cost)
+    free = solve(matrix, False, improve=True, check=False)
+    cancel = threading.Event()
+    timer = threading.Timer(0.05, cancel.set)
+    timer.start()
+    result = solve(matrix, False, improve=True, check=False, cancel=cancel)
+    timer.join()
+    assert result.stats["improving_moves"] < free.stats["improving_moves"]
+    assert result.total_cost <= result.greedy_cost
+    assert sorted(result.route) == list(range(len(cost)))
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from tsp_neighbors import NeighborIndex
+from tsp_solver import CostMatrix, solve
+
+
+def _random_cost(n, density, seed):
+    rng = np.random.default_rng(seed)
+    # Веса из короткого диапазона, чтобы в строках было много равных
+    cost = np.where(rng.random((n, n)) < density, rng.integers(1, 4, (n, n)), np.inf)
+    np.fill_diagonal(cost, np.inf)
+    return cost
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_from_cost_matches_edge_list(seed):
+    cost = _random_cost(40, 0.5, seed)
+    sources, targets = np.nonzero(np.isfinite(cost))
+    expected = NeighborIndex.from_arrays(len(cost), sources, targets, cost[sources, targets])
+    index = NeighborIndex.from_cost(cost)
+    assert index.offsets.tolist() == expected.offsets.tolist()
+    assert index.targets.tolist() == expected.targets.tolist()
+    assert index.weights.tolist() == expected.weights.tolist()
+
+
+def test_index_keeps_no_python_lists():
+    index = NeighborIndex.from_cost(_random_cost(30, 0.8, 0))
+    assert all(not isinstance(value, list) for value in vars(index).values())
+
+
+def test_parallel_sorted_matches_serial():
+    matrix = CostMatrix(np.arange(1, 61), _random_cost(60, 0.7, 1))
+    serial = solve(matrix, engine="sorted")
+    shared = CostMatrix(matrix.ids, matrix.cost)
+    parallel = solve(shared, workers=2, engine="sorted")
+    # Индекс для процессов живёт только на время перебора и в матрице не остаётся
+    assert shared._neighbors is None
+    assert (parallel.route, parallel.total_cost) == (serial.route, serial.total_cost)
+    assert parallel.stats["starts"] == 60
@@ -0,0 +1,51 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import tsp_server
+from tsp_server import RequestError, SolverService, parse_options
+
+GRAPH = {"nodes": [[1, 0, 0], [2, 10, 0], [3, 10, 10]],
+         "edges": [[1, 2, 1], [2, 3, 1], [3, 1, 1], [1, 3, 5]]}
+
+
+@pytest.mark.parametrize("document", [{"engine": ["scalar"]}, {"engine": {"name": "scalar"}}, {"engine": 5},
+                                      {"engine": "fast"}, {"improve": [True]}, {"all_starts": {"x": 1}},
+                                      {"engine": "sparse", "improve": True}])
+def test_bad_options_answer_400(document):
+    with pytest.raises(RequestError) as error:
+        parse_options("", document)
+    assert error.value.status == 400
+
+
+def test_options_from_query_and_document():
+    assert parse_options("engine=sorted&improve=1") == {"all_starts": True, "engine": "sorted", "improve": True}
+    assert parse_options("", {"all_starts": False}) == {"all_starts": False, "engine": "auto", "improve": False}
+
+
+def test_request_is_parsed_off_the_event_loop(monkeypatch):
+    threads = []
+    parse = tsp_server.parse_graph_lines
+
+    def recording_parse(lines):
+        threads.append(threading.current_thread())
+        return parse(lines)
+
+    monkeypatch.setattr(tsp_server, "parse_graph_lines", recording_parse)
+
+    async def run():
+        service = SolverService(workers=1, batch_window=0.001, batch_max=4)
+        await service.start()
+        try:
+            first = await service.handle_solve("", {"content-type": "application/json"}, json.dumps(GRAPH).encode())
+            again = await service.handle_solve("", {"content-type": "application/json"}, json.dumps(GRAPH).encode())
+        finally:
+            service.close()
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert (first["route"], first["total_cost"]) == ([1, 2, 3], 3)
+    assert again["route"] == first["route"] and again["stats"]["cached"]
+    assert threads and threading.main_thread() not in threads
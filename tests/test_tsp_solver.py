@@ -0,0 +1,91 @@
+import random
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from tsp_solver import ENGINES, CostMatrix, batch_best_of_starts, best_of_starts, solve
+from tsp_sparse import SparseGraph, solve_sparse
+
+IDS = [1, 2, 3, 4]
+# Из узла 1 два ребра веса 1: выбирается узел 2, объявленный раньше, хотя ребро 1->3 записано первым
+TIED_EDGES = [(1, 3, 1), (1, 2, 1), (3, 2, 1), (2, 4, 1), (4, 1, 1), (2, 3, 1), (3, 4, 9)]
+
+
+def _arrays(ids, edges):
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    return ([index[source] for source, _, _ in edges], [index[target] for _, target, _ in edges],
+            [weight for _, _, weight in edges])
+
+
+def _solve_all(ids, edges):
+    matrix = CostMatrix.from_arrays(ids, *_arrays(ids, edges))
+    results = {(engine, use_modification): solve(matrix, use_modification, engine=engine)
+               for engine in ENGINES for use_modification in (False, True)}
+    results["sparse", False] = solve_sparse(SparseGraph.from_arrays(np.array(ids), *_arrays(ids, edges)))
+    return {key: (result.route, result.total_cost) for key, result in results.items()}
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_ties_go_to_earlier_node(engine):
+    results = _solve_all(IDS, TIED_EDGES)
+    assert results[engine, False] == ([1, 2, 3, 4], 12)
+    assert results[engine, True] == ([3, 2, 4, 1], 4)
+    assert results["sparse", False] == ([1, 2, 3, 4], 12)
+
+
+def test_edge_order_does_not_change_result():
+    rng = random.Random(0)
+    for _ in range(20):
+        ids = list(range(1, 16))
+        edges = [(source, target, rng.randint(1, 3)) for source in ids for target in ids
+                 if source != target and rng.random() < 0.6]
+        expected = _solve_all(ids, edges)
+        rng.shuffle(edges)
+        assert _solve_all(ids, edges) == expected
+
+
+@pytest.mark.parametrize("budget", [1024 * 1024, 4 * 1024 * 1024])
+def test_batch_stays_within_memory_budget(budget):
+    rng = np.random.default_rng(0)
+    n = 300
+    cost = np.where(rng.random((n, n)) < 0.5, rng.integers(1, 100, (n, n)), np.inf)
+    np.fill_diagonal(cost, np.inf)
+    tracemalloc.start()
+    try:
+        route, total_cost = batch_best_of_starts(cost, range(n), memory_budget=budget)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak <= budget
+    assert (route, total_cost) == best_of_starts(cost, range(n))
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_counters_can_be_switched_off(engine):
+    rng = np.random.default_rng(3)
+    n = 30
+    cost = np.where(rng.random((n, n)) < 0.6, rng.integers(1, 50, (n, n)), np.inf)
+    np.fill_diagonal(cost, np.inf)
+    counted = solve(CostMatrix(np.arange(n), cost), engine=engine)
+    silent = solve(CostMatrix(np.arange(n), cost), engine=engine, collect_stats=False)
+    assert (silent.route, silent.total_cost) == (counted.route, counted.total_cost)
+    assert counted.stats["starts"] == n and counted.stats["scans"] > 0
+    assert silent.stats == {}
+    graph = SparseGraph.from_arrays(np.arange(n), *np.nonzero(np.isfinite(cost)), cost[np.isfinite(cost)])
+    assert solve_sparse(graph, True, collect_stats=False).stats == {}
+
+
+@pytest.mark.parametrize("integer_weights", [True, False])
+def test_pruned_matches_sorted(integer_weights):
+    rng = np.random.default_rng(7)
+    for _ in range(10):
+        n = int(rng.integers(5, 40))
+        weights = rng.integers(1, 10, (n, n)) if integer_weights else rng.random((n, n))
+        cost = np.where(rng.random((n, n)) < 0.6, weights, np.inf)
+        np.fill_diagonal(cost, np.inf)
+        full = solve(CostMatrix(np.arange(n), cost), engine="sorted", check=False)
+        pruned = solve(CostMatrix(np.arange(n), cost), engine="pruned", check=False)
+        assert (pruned.route, pruned.total_cost) == (full.route, full.total_cost)
+        assert pruned.stats["starts"] == n
+        assert pruned.stats["steps"] <= full.stats["steps"]
@@ -0,0 +1,77 @@
+import tracemalloc
+
+import numpy as np
+
+import tsp_cli
+from Graphs.generate_graph import GraphData, generate_graph
+from graph_io import write_graph_binary
+from tsp_solver import CostMatrix, solve
+from tsp_sparse import SparseGraph, pick_engine, solve_sparse
+
+
+def _peak(function, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        result = function(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def test_single_start_memory_stays_below_csr():
+    graph = generate_graph(20000, 0.0005, seed=0)
+    sparse = SparseGraph.from_arrays(graph.ids, graph.sources, graph.targets, graph.weights)
+    edges = len(sparse.targets)
+    # Обход читает CSR без копий: пик — массивы по числу узлов, а не по числу рёбер
+    _, peak = _peak(solve_sparse, sparse, check=False)
+    assert peak < sparse.nbytes / 2
+    _, peak = _peak(solve_sparse, sparse)
+    assert peak / edges < 32
+    assert sparse.neighbors()._targets.obj is sparse.targets
+
+
+def test_all_starts_match_dense_and_release_rows():
+    rng = np.random.default_rng(0)
+    n = 60
+    cost = np.where(rng.random((n, n)) < 0.3, rng.integers(1, 20, (n, n)), np.inf)
+    np.fill_diagonal(cost, np.inf)
+    sources, targets = np.nonzero(np.isfinite(cost))
+    sparse = SparseGraph.from_arrays(np.arange(n), sources, targets, cost[sources, targets])
+    result = solve_sparse(sparse, True)
+    expected = solve(CostMatrix(np.arange(n), cost), engine="sorted")
+    assert (result.route, result.total_cost) == (expected.route, expected.total_cost)
+    assert isinstance(sparse.neighbors()._targets, memoryview)
+
+
+def test_auto_engine_picks_sparse_for_large_or_sparse_graphs():
+    assert pick_engine("auto", 100, 9000) == "scalar"
+    assert pick_engine("auto", 100, 100) == "sparse"
+    assert pick_engine("auto", 100, 100, improve=True) == "scalar"
+    # Матрица 10^5 x 10^5 заняла бы 80 ГБ даже у полного графа
+    assert pick_engine("auto", 100000, 10 ** 10) == "sparse"
+    assert pick_engine("batch", 100000, 100) == "batch"
+
+
+def test_cli_solves_sparse_graph_without_dense_matrix(tmp_path, monkeypatch):
+    # Редкий граф с гамильтоновым циклом дешевле любого другого ребра: тур находится от любого старта
+    graph = generate_graph(300, 0.02, seed=1)
+    cycle = np.random.default_rng(1).permutation(300)
+    graph = GraphData(graph.ids, graph.xs, graph.ys, np.concatenate([graph.sources, cycle]),
+                      np.concatenate([graph.targets, np.roll(cycle, -1)]),
+                      np.concatenate([graph.weights, np.full(300, 0.5)]))
+    path = str(tmp_path / "graph.tspg")
+    write_graph_binary(graph, path)
+    options = {"use_modification": True, "engine": "scalar", "improve": False, "time_limit": None,
+               "output_dir": None, "cache_dir": None, "decompose": None, "cluster_size": 2, "cluster_workers": 1,
+               "instrument": False, "profile": None}
+    dense = tsp_cli.solve_file(path, options)
+    assert dense["found"]
+
+    def no_matrix(*args):
+        raise AssertionError("плотная матрица не должна строиться")
+
+    monkeypatch.setattr(CostMatrix, "from_arrays", no_matrix)
+    for engine in ("auto", "sparse"):
+        record = tsp_cli.solve_file(path, dict(options, engine=engine))
+        assert (record["route"], record["total_cost"]) == (dense["route"], dense["total_cost"])
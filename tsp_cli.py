@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from graph_io import read_graph
+from instrumentation import PROFILE_MODES, Probe, phase
+from result_cache import ResultCache, graph_data_key, solve_options
+from tsp_report import format_result_text, result_record, route_export, write_result
+from tsp_decompose import CLUSTER_METHODS, CLUSTER_SIZE, solve_decomposed
+from tsp_feasibility import check_feasibility
+from tsp_local_search import IMPROVE_TIME_LIMIT
+from tsp_solver import ENGINES, CostMatrix, SolveResult, solve
+from tsp_sparse import SPARSE_ENGINES, SparseGraph, pick_engine, solve_sparse
+
+GRAPH_EXTENSIONS = (".txt", ".tspg")
+
+
+def collect_graph_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith(GRAPH_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+def result_path(output_dir, file_path):
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(output_dir, f"{name}_result.txt")
+
+
+# Кэш результатов свой в каждом процессе пула; общий между процессами и запусками — дисковый
+_caches = {}
+
+
+def file_cache(directory):
+    if directory not in _caches:
+        _caches[directory] = ResultCache(directory=directory)
+    return _caches[directory]
+
+
+def solve_file(file_path, options):
+    probe = Probe(options["profile"]) if options["instrument"] else None
+    if probe is not None:
+        probe.start()
+    try:
+        with phase(probe, "parse"):
+            graph = read_graph(file_path)
+        if graph.node_count < 2:
+            raise ValueError("Слишком мало узлов для расчёта")
+        cache = key = result = None
+        if options["cache_dir"]:
+            with phase(probe, "cache"):
+                cache = file_cache(options["cache_dir"])
+                decompose = (options["decompose"], options["cluster_size"]) if options["decompose"] else None
+                key = graph_data_key(graph, solve_options(options["use_modification"], options["improve"], decompose))
+                result = cache.get(key)
+        if result is None and options["decompose"]:
+            result = solve_decomposed(graph, options["decompose"], options["cluster_size"], options["use_modification"],
+                                      workers=options["cluster_workers"], probe=probe)
+            if cache is not None:
+                cache.put(key, result)
+        elif result is None:
+            # Проверка идёт по списку рёбер до построения матрицы: отвергнутый граф её не строит.
+            # Повторы рёбер в файле только ослабляют проверку, ложного отказа не дают
+            with phase(probe, "check"):
+                report = check_feasibility(graph.ids, graph.sources, graph.targets)
+            if not report.feasible:
+                result = SolveResult(None, None, report.check_time, {"skipped_starts": graph.node_count},
+                                     feasibility=report)
+            else:
+                engine = pick_engine(options["engine"], graph.node_count, len(graph.sources), options["improve"])
+                if engine == "sparse":
+                    # Большой или редкий граф решается по CSR: матрица n x n не строится
+                    with phase(probe, "build"):
+                        sparse = SparseGraph.from_arrays(graph.ids, graph.sources, graph.targets, graph.weights)
+                    with phase(probe, "solve"):
+                        result = solve_sparse(sparse, options["use_modification"], check=False,
+                                              collect_stats=probe is not None)
+                else:
+                    with phase(probe, "build"):
+                        matrix = CostMatrix.from_arrays(graph.ids, graph.sources, graph.targets, graph.weights)
+                    result = solve(matrix, options["use_modification"], engine=engine,
+                                   improve=options["improve"], time_limit=options["time_limit"], probe=probe,
+                                   check=False, collect_stats=probe is not None)
+                result.feasibility = report
+                if cache is not None:
+                    cache.put(key, result)
+    except Exception as e:
+        if probe is not None:
+            probe.stop()
+        return {"file": file_path, "error": str(e)}
+
+    record = result_record(file_path, graph, result)
+    if options["output_dir"]:
+        with phase(probe, "write"):
+            coordinates, weights = route_export(graph, result.route) if result.route else ({}, {})
+            with open(result_path(options["output_dir"], file_path), 'w', encoding="utf-8") as file:
+                write_result(file, result.route, coordinates, weights, format_result_text(result))
+    if probe is not None:
+        probe.stop()
+        probe.add_stats(result.stats)
+        record["instrumentation"] = probe.report()
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетное решение задачи маршрута методом ближайшего соседа")
+    parser.add_argument("paths", nargs="+", help="файлы графов или каталоги с ними")
+    starts = parser.add_mutually_exclusive_group()
+    starts.add_argument("--all-starts", dest="use_modification", action="store_true", default=True,
+                        help="перебирать все стартовые узлы (по умолчанию, как «Использовать модификацию»)")
+    starts.add_argument("--single-start", dest="use_modification", action="store_false",
+                        help="один старт с самым дешёвым исходящим ребром")
+    parser.add_argument("--engine", choices=sorted(ENGINES) + list(SPARSE_ENGINES), default="auto",
+                        help="sparse решает по списку рёбер без матрицы n x n; auto (по умолчанию) берёт его "
+                             "для больших или редких графов, остальные — scalar")
+    parser.add_argument("--improve", action="store_true", help="улучшить маршрут 2-opt / Or-opt")
+    parser.add_argument("--time-limit", type=float, default=IMPROVE_TIME_LIMIT,
+                        help=f"предел времени улучшения одного графа в секундах (по умолчанию {IMPROVE_TIME_LIMIT:g})")
+    parser.add_argument("--format", choices=("text", "jsonl"), default="jsonl",
+                        help="text: файлы результата как «Скачать результат»; jsonl: по строке JSON на граф")
+    parser.add_argument("--output", help="каталог для text или файл для jsonl (по умолчанию stdout)")
+    parser.add_argument("--workers", type=int, default=1, help="число файлов, решаемых одновременно")
+    parser.add_argument("--instrument", action="store_true",
+                        help="добавить в запись время фаз (parse, check, build, cluster, solve, stitch, post, write) "
+                             "и счётчики; без него счётчики перебора (starts, steps, scans) не ведутся")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="снять профиль cProfile (cpu) или tracemalloc (memory); включает --instrument")
+    parser.add_argument("--decompose", choices=CLUSTER_METHODS,
+                        help="делить узлы на кластеры по координатам (сеткой или k-means), решать кластеры "
+                             "параллельно и сшивать их туры; для графов до нескольких тысяч узлов "
+                             "в статистику добавляется отличие от решения без разбиения")
+    parser.add_argument("--cluster-size", type=int, default=CLUSTER_SIZE, help="примерное число узлов в кластере")
+    parser.add_argument("--cache-dir", help="каталог кэша результатов: повторно присланный граф не решается заново")
+    args = parser.parse_args(argv)
+
+    if args.cluster_size < 2:
+        parser.error("--cluster-size должен быть не меньше 2")
+    if args.engine == "sparse" and args.improve:
+        parser.error("--improve работает с плотной матрицей и не сочетается с --engine sparse")
+    if args.decompose and args.improve:
+        parser.error("--improve работает с плотной матрицей и не сочетается с --decompose")
+    if args.format == "text" and not args.output:
+        parser.error("для --format text нужен каталог --output")
+    if args.format == "text":
+        os.makedirs(args.output, exist_ok=True)
+
+    files = collect_graph_files(args.paths)
+    options = {
+        "use_modification": args.use_modification,
+        "engine": args.engine,
+        "improve": args.improve,
+        "time_limit": args.time_limit,
+        "output_dir": args.output if args.format == "text" else None,
+        "cache_dir": args.cache_dir,
+        "decompose": args.decompose,
+        "cluster_size": args.cluster_size,
+        # Ядра делятся между одновременно решаемыми файлами и кластерами одного файла
+        "cluster_workers": max(1, (os.cpu_count() or 1) // max(1, args.workers)),
+        "instrument": args.instrument or args.profile is not None,
+        "profile": args.profile,
+    }
+
+    out = sys.stdout
+    if args.format == "jsonl" and args.output:
+        out = open(args.output, 'w', encoding="utf-8")
+    failed = 0
+    cached = 0
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            for record in executor.map(solve_file, files, [options] * len(files)):
+                failed += "error" in record
+                cached += bool(record.get("stats", {}).get("cached"))
+                if args.format == "jsonl":
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                elif "error" in record:
+                    print(f"{record['file']}: {record['error']}", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.cache_dir:
+        print(f"Кэш: попаданий {cached}, промахов {len(files) - failed - cached}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
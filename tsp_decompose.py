@@ -0,0 +1,624 @@
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import phase
+from tsp_feasibility import check_feasibility
+from tsp_solver import SolveResult, count, plain_cost
+from tsp_sparse import SparseGraph, solve_sparse
+
+CLUSTER_METHODS = ("grid", "kmeans")
+# Узлов в кластере по умолчанию: перебор всех стартов внутри кластера остаётся дешёвым
+CLUSTER_SIZE = 300
+KMEANS_ITERATIONS = 10
+# Строк матрицы расстояний до центров за один шаг k-means
+KMEANS_CHUNK = 4096
+# Для кусков не длиннее этого при вытеснении пробуются и другие порядки обхода
+REORDER_LIMIT = 50
+# Куски не длиннее этого при вытеснении перебираются полностью: гамильтоновы пути от узлов
+# со входом из маршрута к узлам с выходом в него, не больше SEARCH_STEPS шагов перебора на кусок
+SEARCH_LIMIT = 12
+SEARCH_STEPS = 5000
+# Пар (вход, выход) в одной попытке вытеснения не больше этого
+EJECT_PAIRS = 65536
+# Бюджет попыток вытеснения — по одной на два узла графа, но не меньше этого числа.
+# Исчерпав его, сшивание сдаётся с невставшими кусками, а не ищет дальше
+EJECT_MIN_ATTEMPTS = 2000
+# До этого числа узлов результат сравнивается с решением без разбиения
+COMPARE_LIMIT = 5000
+
+
+def grid_clusters(xs, ys, cluster_size=CLUSTER_SIZE):
+    # Квадратные ячейки примерно по cluster_size узлов. Ячейки нумеруются змейкой по строкам,
+    # поэтому кластеры с соседними номерами соседствуют и на плоскости
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    width = max(xs.max() - xs.min(), 1.0)
+    height = max(ys.max() - ys.min(), 1.0)
+    side = math.sqrt(width * height / max(1, round(len(xs) / cluster_size)))
+    columns = max(1, math.ceil(width / side))
+    rows = max(1, math.ceil(height / side))
+    column = np.minimum(((xs - xs.min()) / side).astype(np.int64), columns - 1)
+    row = np.minimum(((ys - ys.min()) / side).astype(np.int64), rows - 1)
+    column = np.where(row % 2 == 1, columns - 1 - column, column)
+    _, labels = np.unique(row * columns + column, return_inverse=True)
+    return labels
+
+
+def _nearest_center(points, centers):
+    # |p - c|^2 без |p|^2, который не влияет на выбор центра: одно матричное умножение на порцию
+    labels = np.empty(len(points), dtype=np.int64)
+    squares = (centers ** 2).sum(axis=1)
+    for begin in range(0, len(points), KMEANS_CHUNK):
+        distances = squares - 2 * points[begin:begin + KMEANS_CHUNK] @ centers.T
+        labels[begin:begin + KMEANS_CHUNK] = np.argmin(distances, axis=1)
+    return labels
+
+
+def _center_order(centers):
+    # Жадный обход центров от самого левого: соседние в порядке кластеры близки на плоскости
+    current = int(np.argmin(centers[:, 0]))
+    left = np.ones(len(centers), dtype=bool)
+    order = []
+    while True:
+        order.append(current)
+        left[current] = False
+        if not left.any():
+            return np.array(order, dtype=np.int64)
+        distances = ((centers - centers[current]) ** 2).sum(axis=1)
+        distances[~left] = np.inf
+        current = int(np.argmin(distances))
+
+
+def kmeans_clusters(xs, ys, cluster_size=CLUSTER_SIZE):
+    # Начальные центры — центры непустых ячеек сетки, поэтому хватает нескольких итераций Ллойда
+    points = np.column_stack((xs, ys)).astype(np.float64)
+    labels = grid_clusters(xs, ys, cluster_size)
+    k = int(labels.max()) + 1
+    sizes = np.bincount(labels, minlength=k)
+    centers = np.column_stack((np.bincount(labels, points[:, 0], k), np.bincount(labels, points[:, 1], k)))
+    centers /= sizes[:, None]
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _nearest_center(points, centers)
+        sizes = np.bincount(labels, minlength=k)
+        filled = sizes > 0
+        moved = centers.copy()
+        moved[filled, 0] = np.bincount(labels, points[:, 0], k)[filled] / sizes[filled]
+        moved[filled, 1] = np.bincount(labels, points[:, 1], k)[filled] / sizes[filled]
+        if np.allclose(moved, centers):
+            break
+        centers = moved
+    labels = _nearest_center(points, centers)
+    # Пустые кластеры выпадают, остальные нумеруются в порядке обхода центров
+    used = np.unique(labels)
+    rank = np.empty(k, dtype=np.int64)
+    rank[used[_center_order(centers[used])]] = np.arange(len(used))
+    return rank[labels]
+
+
+CLUSTERINGS = {"grid": grid_clusters, "kmeans": kmeans_clusters}
+
+
+def _solve_cluster(task):
+    # Выполняется в процессе пула: members — глобальные позиции узлов, рёбра в локальных индексах.
+    # Возвращает куски маршрута (узлы, замкнут ли): тур кластера или, если его нет, покрытие
+    # кластера жадными путями — каждый следующий от первого свободного узла в порядке start_order
+    members, sources, targets, weights, use_modification = task
+    graph = SparseGraph.from_arrays(members, sources, targets, weights)
+    result = solve_sparse(graph, use_modification)
+    if result.found:
+        return [(result.route, True)], result.stats
+    neighbors = graph.neighbors()
+    visited = bytearray(len(graph))
+    pieces = []
+    for start in neighbors.start_order():
+        if not visited[start]:
+            path, _ = neighbors.walk(start, visited, result.stats)
+            pieces.append((graph.route_ids(path), False))
+    return pieces, result.stats
+
+
+class _Stitcher:
+    # Замкнутый маршрут по уже присоединённым узлам: следующий узел и стоимость ребра к нему.
+    # Кусок вливается между a и a' = succ[a]: ребро a -> a' заменяется на a -> вход куска
+    # и выход куска -> a'. Тур кластера при этом разрезается по одному из своих рёбер
+    def __init__(self, n, sources, targets, weights):
+        self.n = n
+        keys = sources * n + targets
+        order = np.argsort(keys)
+        self.keys, self.key_weights = keys[order], weights[order]
+        order = np.argsort(targets, kind="stable")
+        self.in_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n), out=self.in_offsets[1:])
+        self.in_sources, self.in_weights = sources[order], weights[order]
+        order = np.argsort(sources, kind="stable")
+        self.out_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=self.out_offsets[1:])
+        self.out_targets, self.out_weights = targets[order], weights[order]
+        self.succ = np.full(n, -1, dtype=np.int64)
+        self.next_cost = np.zeros(n)
+        self.merged = np.zeros(n, dtype=bool)
+        # Номер узла в пробуемом пути, -1 вне его
+        self.position = np.full(n, -1, dtype=np.int64)
+        # Порядковый номер узла на маршруте (-1 вне маршрута); ведётся только на этапе вытеснений,
+        # где по нему ищется ближайший выход, а не обходом маршрута
+        self.rank = None
+
+    def _weights(self, sources, targets):
+        wanted = sources * self.n + targets
+        found = np.minimum(np.searchsorted(self.keys, wanted), len(self.keys) - 1)
+        return np.where(self.keys[found] == wanted, self.key_weights[found], np.inf)
+
+    @staticmethod
+    def _gather(offsets, nodes):
+        # Позиции рёбер строк nodes в CSR одним вызовом и номер строки для каждой позиции.
+        # Кусок из одного узла — самый частый случай при сшивании, ему хватает среза
+        if len(nodes) == 1:
+            begin, end = offsets[nodes[0]], offsets[nodes[0] + 1]
+            return np.arange(begin, end), np.zeros(end - begin, dtype=np.int64)
+        begins = offsets[nodes]
+        counts = offsets[nodes + 1] - begins
+        positions = np.repeat(begins - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        return positions, np.repeat(np.arange(len(nodes)), counts)
+
+    def _entries(self, entries):
+        # Рёбра в entries из уже присоединённых узлов: номер входа, узел a, вес, следующий за a узел
+        positions, pick = self._gather(self.in_offsets, entries)
+        exits = self.in_sources[positions]
+        inside = self.merged[exits]
+        exits = exits[inside]
+        return pick[inside], exits, self.in_weights[positions][inside], self.succ[exits]
+
+    def _insert(self, a, nodes, into, back):
+        if self.rank is not None:
+            after = self.rank[a]
+            self._shift_ranks(after, len(nodes))
+            self.rank[nodes] = after + 1 + np.arange(len(nodes))
+        self.succ[nodes[:-1]] = nodes[1:]
+        self.next_cost[nodes[:-1]] = self._weights(nodes[:-1], nodes[1:])
+        self.succ[nodes[-1]], self.next_cost[nodes[-1]] = self.succ[a], back
+        self.succ[a], self.next_cost[a] = nodes[0], into
+        self.merged[nodes] = True
+        self.merged_count += len(nodes)
+
+    def start(self, node):
+        self.succ[node], self.next_cost[node], self.merged[node] = node, 0.0, True
+        self.merged_count = 1
+
+    def _number_route(self, start):
+        # int32 и сдвиг умножением на маску: так сдвиг номеров на порядок быстрее записи по маске
+        self.rank = np.full(self.n, -1, dtype=np.int32)
+        self.rank[self.route(start)] = np.arange(self.merged_count)
+        self._later = np.empty(self.n, dtype=bool)
+
+    def _shift_ranks(self, after, shift):
+        np.greater(self.rank, after, out=self._later)
+        self.rank += self._later * np.int32(shift)
+
+    def attach_tour(self, nodes):
+        # Тур вливается целиком, разрезанный по самому выгодному ребру; прирост стоимости или None
+        nodes = np.asarray(nodes, dtype=np.int64)
+        tails = np.roll(nodes, 1)
+        pick, exits, into, resumes = self._entries(nodes)
+        back = self._weights(tails[pick], resumes)
+        delta = into + back - self.next_cost[exits] - self._weights(tails, nodes)[pick]
+        if not len(delta) or not np.isfinite(delta.min()):
+            return None
+        best = int(np.argmin(delta))
+        self._insert(int(exits[best]), np.roll(nodes, -int(pick[best])), into[best], back[best])
+        return float(delta[best])
+
+    def attach_path(self, nodes):
+        # В путь можно войти с любого узла p_i из присоединённого соседа a; вставляется самый длинный
+        # отрезок p_i..p_j, у которого есть ребро p_j -> a'. Возвращает прирост стоимости
+        # и границы отрезка [i, j + 1) или None
+        nodes = np.asarray(nodes, dtype=np.int64)
+        pick, exits, into, resumes = self._entries(nodes)
+        if not len(exits):
+            return None
+        # Для каждого a' важен только самый дальний по пути узел с ребром в него, поэтому строки
+        # входящих рёбер собираются по различным a', а не по каждому входу: объём не больше числа рёбер
+        targets, row = np.unique(resumes, return_inverse=True)
+        self.position[nodes] = np.arange(len(nodes))
+        positions, owner = self._gather(self.in_offsets, targets)
+        ends = self.position[self.in_sources[positions]]
+        self.position[nodes] = -1
+        inside = ends >= 0
+        positions, owner, ends = positions[inside], owner[inside], ends[inside]
+        farthest = np.full(len(targets), -1, dtype=np.int64)
+        back = np.zeros(len(targets))
+        order = np.lexsort((ends, owner))
+        last = order[np.r_[owner[order][1:] != owner[order][:-1], True]] if len(order) else order
+        farthest[owner[last]] = ends[last]
+        back[owner[last]] = self.in_weights[positions[last]]
+        ends, back = farthest[row], back[row]
+        usable = ends >= pick
+        if not usable.any():
+            return None
+        candidate = np.flatnonzero(usable)
+        length = ends[candidate] - pick[candidate] + 1
+        delta = into[candidate] + back[candidate] - self.next_cost[exits[candidate]]
+        # Сначала число вставленных узлов, при равенстве — прирост стоимости
+        best = int(np.lexsort((delta, -length))[0])
+        chosen = int(candidate[best])
+        begin, end = int(pick[chosen]), int(ends[chosen]) + 1
+        self._insert(int(exits[chosen]), nodes[begin:end], into[chosen], back[chosen])
+        return float(delta[best]), begin, end
+
+    def eject(self, nodes):
+        # Отрезку пути p_i..p_j без места между соседями маршрута достаётся место отрезка за a:
+        # маршрут идёт a -> p_i..p_j -> x, где x — сосед p_j, стоящий на маршруте после a.
+        # Расстояние от a до x берётся из rank, без обхода маршрута. Выбирается вариант, где вставленных
+        # узлов больше всего сверх вытесненных, затем с меньшим вытесненным отрезком и меньшим приростом.
+        # Вытесненный отрезок остаётся путём и вставляется заново.
+        # Возвращает прирост стоимости, отрезок и границы вставленной части [i, j + 1) или None
+        nodes = np.asarray(nodes, dtype=np.int64)
+        pick, exits, into, _ = self._entries(nodes)
+        positions, ends = self._gather(self.out_offsets, nodes)
+        resumes = self.out_targets[positions]
+        inside = self.merged[resumes]
+        ends, resumes, back = ends[inside], resumes[inside], self.out_weights[positions][inside]
+        if not len(exits) or not len(resumes):
+            return None
+        # С бюджета списываются только попытки, дошедшие до выбора места
+        self.budget -= 1
+        keep = max(1, EJECT_PAIRS // len(resumes))
+        pick, exits, into = pick[:keep], exits[:keep], into[:keep]
+        placed = ends[None, :] - pick[:, None] + 1
+        # Узлов маршрута между a и x; x == a означало бы вытеснить весь маршрут
+        length = (self.rank[resumes][None, :] - self.rank[exits][:, None]) % self.merged_count - 1
+        valid = (placed > 0) & (length >= 0)
+        if not valid.any():
+            return None
+        entry, exit_ = np.nonzero(valid)
+        placed, length = placed[entry, exit_], length[entry, exit_]
+        gain = into[entry] + back[exit_] - self.next_cost[exits[entry]]
+        best = np.lexsort((gain, length, length - placed))[0]
+        entry, exit_ = entry[best], exit_[best]
+        a, resume = int(exits[entry]), int(resumes[exit_])
+        segment = []
+        current = int(self.succ[a])
+        while current != resume:
+            segment.append(current)
+            current = int(self.succ[current])
+        delta = float(gain[best]) - (self.next_cost[segment[-1]] if segment else 0.0)
+        if segment:
+            first, final = self.rank[segment[0]], self.rank[segment[-1]]
+            self.merged[segment] = False
+            self.rank[segment] = -1
+            # Отрезок может переходить через конец нумерации: тогда сдвигаются только номера до его начала
+            self._shift_ranks(final, -len(segment) if final >= first else -(final + 1))
+            self.merged_count -= len(segment)
+        begin, end = int(pick[entry]), int(ends[exit_]) + 1
+        self.succ[a] = resume
+        self._insert(a, nodes[begin:end], into[entry], back[exit_])
+        return delta, segment, begin, end
+
+    def _orders(self, nodes):
+        # Другие порядки обхода короткого куска: жадный путь по его узлам от каждого из них
+        members = set(nodes)
+        orders = []
+        for start in nodes:
+            order = [start]
+            seen = {start}
+            while len(order) < len(nodes):
+                begin, end = self.out_offsets[order[-1]], self.out_offsets[order[-1] + 1]
+                options = [(weight, target) for target, weight in zip(self.out_targets[begin:end].tolist(),
+                                                                      self.out_weights[begin:end].tolist())
+                           if target in members and target not in seen]
+                if not options:
+                    break
+                order.append(min(options)[1])
+                seen.add(order[-1])
+            if len(order) == len(nodes) and order != list(nodes):
+                orders.append(order)
+        return orders
+
+    def _paths(self, nodes):
+        # Порядки короткого куска полным перебором (см. SEARCH_LIMIT); нужен первый найденный
+        array = np.asarray(nodes, dtype=np.int64)
+        pick, _, _, _ = self._entries(array)
+        positions, rows = self._gather(self.out_offsets, array)
+        targets = self.out_targets[positions]
+        tails = set(array[rows[self.merged[targets]]].tolist())
+        members = set(nodes)
+        links = {node: [] for node in nodes}
+        for row, target in zip(rows.tolist(), targets.tolist()):
+            if target in members:
+                links[nodes[row]].append(target)
+        found = []
+        steps = 0
+
+        def extend(path, seen):
+            nonlocal steps
+            steps += 1
+            if len(path) == len(nodes):
+                if path[-1] in tails and path != list(nodes):
+                    found.append(list(path))
+                return
+            for target in links[path[-1]]:
+                if target not in seen and steps < SEARCH_STEPS:
+                    seen.add(target)
+                    path.append(target)
+                    extend(path, seen)
+                    path.pop()
+                    seen.discard(target)
+                    if found:
+                        return
+
+        for head in dict.fromkeys(array[pick].tolist()):
+            extend([head], {head})
+            if found or steps >= SEARCH_STEPS:
+                break
+        # Сотня шагов перебора стоит примерно как одна попытка вытеснения
+        self.budget -= steps // 100
+        return found
+
+    def _join(self):
+        # Когда вытеснять больше нечего, соседние короткие куски сливаются в один путь: их общий
+        # порядок ищется как у _orders. Новый кусок снова пробует вставку и вытеснение
+        for i in sorted(self.alive):
+            nodes = self.pieces[i][0]
+            array = np.asarray(nodes, dtype=np.int64)
+            positions, _ = self._gather(self.out_offsets, array)
+            others = set(self.owner[self.out_targets[positions]].tolist())
+            positions, _ = self._gather(self.in_offsets, array)
+            others.update(self.owner[self.in_sources[positions]].tolist())
+            for j in sorted(others & self.alive - {i}):
+                union = list(nodes) + list(self.pieces[j][0])
+                if len(union) > REORDER_LIMIT or self.budget <= len(union):
+                    continue
+                self.budget -= len(union)
+                orders = self._orders(union)
+                if np.isfinite(self._weights(np.asarray(union[:-1]), np.asarray(union[1:]))).all():
+                    orders.insert(0, union)
+                if orders:
+                    self._drop(i)
+                    self._drop(j)
+                    self._add_piece(orders[0], False)
+                    return True
+        return False
+
+    def _touch(self, nodes):
+        # Куски, в которые ведут рёбра из только что присоединённых узлов, снова встают в очередь.
+        # Соседи в обе стороны снова могут пробовать вытеснение: рядом с ними изменился маршрут
+        nodes = np.asarray(nodes, dtype=np.int64)
+        positions, _ = self._gather(self.out_offsets, nodes)
+        for i in np.unique(self.owner[self.out_targets[positions]]).tolist():
+            if i >= 0 and self.pieces[i] is not None:
+                self.failed.discard(i)
+                if not self.queued[i]:
+                    self.queued[i] = True
+                    self.ready.append(i)
+        positions, _ = self._gather(self.in_offsets, nodes)
+        self.failed.difference_update(np.unique(self.owner[self.in_sources[positions]]).tolist())
+
+    def _add_piece(self, nodes, closed):
+        self.alive.add(len(self.pieces))
+        self.owner[nodes] = len(self.pieces)
+        self.pieces.append((nodes, closed))
+        self.queued.append(True)
+        self.ready.append(len(self.pieces) - 1)
+
+    def _drop(self, i):
+        self.pieces[i] = None
+        self.alive.discard(i)
+        self.failed.discard(i)
+
+    def run(self, pieces, stats):
+        # Кусок пробуется, когда рядом с ним появляются присоединённые узлы; от пути вставляется
+        # отрезок, остатки становятся новыми кусками. Если пробовать больше нечего, туры размыкаются
+        # в пути, а затем узлы путей вытесняют отрезки маршрута. Попытки вытеснения и перебор порядков
+        # списываются с общего бюджета, так что время сшивания растёт линейно с n, даже если
+        # собрать маршрут не удаётся.
+        # Начало — первый замкнутый тур кластера, иначе первый узел первого пути.
+        # Возвращает начальный узел, прирост стоимости от сшивания и число невставших кусков
+        first = next((piece for piece in pieces if piece[1]), pieces[0])
+        start = first[0][0]
+        self.start(start)
+        self.owner = np.full(self.n, -1, dtype=np.int64)
+        self.pieces, self.queued, self.ready, self.alive = [], [], deque(), set()
+        # Куски, которым вытеснение не удалось; пробуются снова, когда маршрут меняется рядом с ними
+        self.failed = set()
+        for piece in pieces:
+            if piece is not first:
+                self._add_piece(*piece)
+            elif len(first[0]) > 1:
+                self._add_piece(first[0][1:], False)
+        self.budget = budget = max(EJECT_MIN_ATTEMPTS, self.n // 2)
+        stitch_cost = 0.0
+        while self.alive:
+            if not self.ready:
+                tours = [i for i in self.alive if self.pieces[i][1]]
+                for i in tours:
+                    nodes, _ = self.pieces[i]
+                    self._drop(i)
+                    self._add_piece(nodes, False)
+                    count(stats, "opened_tours")
+                if tours:
+                    continue
+                # Вытесняет отрезок пути в исходном порядке, а для короткого пути — и в других порядках
+                if self.rank is None:
+                    self._number_route(start)
+                moved = None
+                for i in sorted(self.alive - self.failed):
+                    nodes = list(self.pieces[i][0])
+                    self.failed.add(i)
+                    # Куски, к которым маршрут ещё не подошёл, пропускаются даром
+                    if not len(self._entries(np.asarray(nodes, dtype=np.int64))[1]):
+                        continue
+                    orders = [nodes]
+                    if len(nodes) <= REORDER_LIMIT and self.budget > len(nodes):
+                        # Перебор порядков стоит примерно как len(nodes) попыток вытеснения
+                        self.budget -= len(nodes)
+                        orders += self._orders(nodes)
+                        if len(nodes) <= SEARCH_LIMIT:
+                            orders += self._paths(nodes)
+                    for nodes in orders:
+                        if self.budget <= 0:
+                            break
+                        moved = self.eject(nodes)
+                        if moved is not None:
+                            break
+                    if moved is not None or self.budget <= 0:
+                        break
+                if moved is None:
+                    if self.budget > 0 and self._join():
+                        count(stats, "joined_pieces")
+                        continue
+                    break
+                delta, segment, begin, end = moved
+                self._drop(i)
+                stitch_cost += delta
+                count(stats, "ejections")
+                for rest in (nodes[:begin], nodes[end:], segment):
+                    if len(rest):
+                        self._add_piece(rest, False)
+                self._touch(nodes[begin:end])
+                continue
+
+            i = self.ready.popleft()
+            self.queued[i] = False
+            nodes, closed = self.pieces[i]
+            if closed:
+                delta = self.attach_tour(nodes)
+                begin, end = 0, len(nodes)
+            else:
+                outcome = self.attach_path(nodes)
+                delta, begin, end = (None, 0, 0) if outcome is None else outcome
+            if delta is None:
+                continue
+            stitch_cost += delta
+            self._drop(i)
+            for rest in (nodes[:begin], nodes[end:]):
+                if len(rest):
+                    self._add_piece(rest, False)
+            self._touch(nodes[begin:end])
+        if self.rank is not None:
+            count(stats, "eject_attempts", budget - max(self.budget, 0))
+        return start, stitch_cost, len(self.alive)
+
+    def route(self, start):
+        route = [start]
+        succ = self.succ.tolist()
+        current = succ[start]
+        while current != start:
+            route.append(current)
+            current = succ[current]
+        return route
+
+
+def _cluster_tasks(labels, clusters, sources, targets, weights, use_modification):
+    order = np.argsort(labels, kind="stable")
+    bounds = np.zeros(clusters + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=clusters), out=bounds[1:])
+    local = np.empty(len(labels), dtype=np.int64)
+    local[order] = np.arange(len(labels)) - bounds[labels[order]]
+
+    inner = np.flatnonzero(labels[sources] == labels[targets])
+    inner = inner[np.argsort(labels[sources[inner]], kind="stable")]
+    edge_bounds = np.zeros(clusters + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels[sources[inner]], minlength=clusters), out=edge_bounds[1:])
+    tasks = []
+    for cluster in range(clusters):
+        edges = inner[edge_bounds[cluster]:edge_bounds[cluster + 1]]
+        tasks.append((order[bounds[cluster]:bounds[cluster + 1]], local[sources[edges]], local[targets[edges]],
+                      weights[edges], use_modification))
+    return tasks
+
+
+def _unique_edges(n, sources, targets, weights):
+    # Повторное ребро заменяет прежнее, как при загрузке; петли в маршрут не входят
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    keys = sources * max(n, 1) + targets
+    _, last = np.unique(keys[::-1], return_index=True)
+    keep = np.sort(len(keys) - 1 - last)
+    keep = keep[sources[keep] != targets[keep]]
+    return sources[keep], targets[keep], weights[keep]
+
+
+def solve_decomposed(graph, method="grid", cluster_size=CLUSTER_SIZE, use_modification=True, workers=None,
+                     compare=None, probe=None):
+    # graph — GraphData или GraphStore. Узлы делятся на кластеры по координатам, в каждом кластере
+    # в пуле процессов строится тур ближайшего соседа (или покрытие жадными путями, если тура нет),
+    # затем куски сшиваются в один замкнутый маршрут через самые дешёвые межкластерные рёбра.
+    # compare: сравнить с решением без разбиения; по умолчанию — для графов до COMPARE_LIMIT узлов.
+    # Если сшить куски не удалось, возвращается решение без разбиения: разбиение не должно терять тур,
+    # который находит обычный решатель
+    if cluster_size < 2:
+        raise ValueError(f"Размер кластера должен быть не меньше 2: {cluster_size}")
+    n = len(graph.ids)
+    sources, targets, weights = _unique_edges(n, graph.sources, graph.targets, graph.weights)
+    with phase(probe, "check"):
+        report = check_feasibility(graph.ids, sources, targets)
+    if not report.feasible:
+        return SolveResult(None, None, report.check_time, {"skipped_starts": n}, feasibility=report)
+
+    start_time = time.perf_counter()
+    stats = {}
+    with phase(probe, "cluster"):
+        labels = CLUSTERINGS[method](graph.xs, graph.ys, cluster_size)
+        clusters = int(labels.max()) + 1
+        tasks = _cluster_tasks(labels, clusters, sources, targets, weights, use_modification)
+    stats["clusters"] = clusters
+
+    with phase(probe, "solve"):
+        workers = max(1, min(workers or os.cpu_count() or 1, clusters))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                outcomes = list(executor.map(_solve_cluster, tasks))
+        else:
+            outcomes = [_solve_cluster(task) for task in tasks]
+    pieces = []
+    for cluster_pieces, cluster_stats in outcomes:
+        for key, value in cluster_stats.items():
+            count(stats, key, value)
+        if not cluster_pieces[0][1]:
+            count(stats, "open_clusters")
+        pieces.extend(cluster_pieces)
+    stats["pieces"] = len(pieces)
+
+    with phase(probe, "stitch"):
+        stitcher = _Stitcher(n, sources, targets, weights)
+        start, stitch_cost, unplaced = stitcher.run(pieces, stats)
+    stats["stitch_cost"] = plain_cost(stitch_cost)
+
+    result = None
+    if unplaced:
+        stats["unplaced_pieces"] = unplaced
+    else:
+        route = stitcher.route(start)
+        result = SolveResult(graph.ids[route].tolist(), plain_cost(float(stitcher.next_cost.sum())), 0.0, stats,
+                             feasibility=report)
+    execution_time = (time.perf_counter() - start_time) * 1000
+
+    if compare is None:
+        compare = n <= COMPARE_LIMIT
+    flat = None
+    if compare:
+        with phase(probe, "compare"):
+            flat = solve_sparse(SparseGraph.from_arrays(graph.ids, sources, targets, weights), use_modification,
+                                check=False)
+        stats["flat_cost"] = flat.total_cost
+        stats["flat_time_ms"] = round(flat.execution_time, 3)
+        if result is not None and flat.found:
+            stats["gap_percent"] = round((result.total_cost - flat.total_cost) / flat.total_cost * 100, 3)
+
+    if result is None:
+        if flat is None:
+            with phase(probe, "fallback"):
+                flat = solve_sparse(SparseGraph.from_arrays(graph.ids, sources, targets, weights), use_modification,
+                                    check=False)
+            execution_time += flat.execution_time
+        if not flat.found:
+            return SolveResult(None, None, execution_time, stats, feasibility=report)
+        stats["flat_fallback"] = 1
+        return SolveResult(flat.route, flat.total_cost, execution_time, stats, feasibility=report)
+    result.execution_time = execution_time
+    return result
@@ -0,0 +1,245 @@
+import time
+
+import numpy as np
+
+# Сколько ID узлов показывать в тексте причины
+REPORT_NODES = 10
+# Уровни обхода не шире этого разбираются циклом Python: на длинных цепочках вызовы NumPy дороже самой работы
+NARROW_FRONTIER = 64
+
+
+class FeasibilityReport:
+    # Итог проверки необходимых условий гамильтонова цикла: пустой reasons — тур возможен
+    def __init__(self, reasons, blocking, components, check_time):
+        self.reasons = reasons
+        self.blocking = blocking
+        self.components = components
+        self.check_time = check_time
+
+    @property
+    def feasible(self):
+        return not self.reasons
+
+    def summary(self):
+        return "; ".join(self.reasons)
+
+    def as_dict(self):
+        return {
+            "feasible": self.feasible,
+            "reasons": self.reasons,
+            "blocking_nodes": self.blocking,
+            "components": self.components,
+            "check_time_ms": round(self.check_time, 3),
+        }
+
+
+def _format_nodes(ids):
+    text = ", ".join(str(node_id) for node_id in ids[:REPORT_NODES])
+    if len(ids) > REPORT_NODES:
+        text += f" и ещё {len(ids) - REPORT_NODES}"
+    return text
+
+
+def _indices(values):
+    # Целый тип сохраняется: int32 из CSR не раздувается копией в int64
+    values = np.asarray(values)
+    return values if values.dtype.kind in "iu" else values.astype(np.int64)
+
+
+def _csr(n, sources, targets):
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+    # Рёбра SparseGraph и разобранного файла обычно уже идут по источникам: тогда без сортировки и копии
+    if not (sources[1:] < sources[:-1]).any():
+        return offsets, targets
+    return offsets, targets[np.argsort(sources, kind="stable")]
+
+
+def _reachable(offsets, targets, root):
+    # Обход в ширину целыми уровнями: соседи широкого фронта собираются одной операцией
+    n = len(offsets) - 1
+    seen = np.zeros(n, dtype=bool)
+    seen[root] = True
+    frontier = [root]
+    lists = None
+    while len(frontier):
+        if len(frontier) <= NARROW_FRONTIER:
+            if lists is None:
+                # memoryview отдаёт числа Python без копии массивов в списки
+                lists = memoryview(offsets), memoryview(targets)
+            offsets_list, targets_list = lists
+            narrow = []
+            for node in frontier:
+                for neighbor in targets_list[offsets_list[node]:offsets_list[node + 1]]:
+                    if not seen[neighbor]:
+                        seen[neighbor] = True
+                        narrow.append(neighbor)
+            frontier = narrow
+            continue
+        frontier = np.asarray(frontier, dtype=np.int64)
+        begins, counts = offsets[frontier], offsets[frontier + 1] - offsets[frontier]
+        total = int(counts.sum())
+        shifts = np.repeat(begins - (np.cumsum(counts) - counts), counts)
+        neighbors = targets[np.arange(total) + shifts]
+        neighbors = neighbors[~seen[neighbors]]
+        if not len(neighbors):
+            break
+        seen[neighbors] = True
+        # Повторы внутри уровня убираются флагами, без сортировки
+        fresh = np.zeros(n, dtype=bool) if len(neighbors) * 8 > n else None
+        if fresh is not None:
+            fresh[neighbors] = True
+            frontier = np.flatnonzero(fresh)
+        else:
+            frontier = np.sort(neighbors)
+            frontier = frontier[np.concatenate(([True], frontier[1:] != frontier[:-1]))]
+    return seen
+
+
+def _components(n, offsets, targets):
+    # Тарьян без рекурсии; нужен только для отчёта, когда граф уже признан несвязным
+    offsets, targets = memoryview(offsets), memoryview(targets)
+    order = [-1] * n
+    low = [0] * n
+    labels = [-1] * n
+    stack = []
+    counter = 0
+    label = 0
+    for root in range(n):
+        if order[root] != -1:
+            continue
+        work = [(root, offsets[root])]
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        while work:
+            node, position = work[-1]
+            if position < offsets[node + 1]:
+                work[-1] = (node, position + 1)
+                child = targets[position]
+                if order[child] == -1:
+                    order[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    work.append((child, offsets[child]))
+                elif labels[child] == -1:
+                    low[node] = min(low[node], order[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == order[node]:
+                while True:
+                    member = stack.pop()
+                    labels[member] = label
+                    if member == node:
+                        break
+                label += 1
+    return np.array(labels, dtype=np.int64), label
+
+
+def _degree_reasons(ids, out_degree, in_degree, forced_from, forced_to):
+    # forced_from — источники единственных входов, forced_to — цели единственных выходов
+    n = len(ids)
+    reasons = []
+    blocking = set()
+    no_exit = np.flatnonzero(out_degree == 0)
+    if len(no_exit):
+        reasons.append(f"нет исходящих рёбер у узлов {_format_nodes(ids[no_exit].tolist())}")
+        blocking.update(no_exit.tolist())
+    no_entry = np.flatnonzero(in_degree == 0)
+    if len(no_entry):
+        reasons.append(f"нет входящих рёбер у узлов {_format_nodes(ids[no_entry].tolist())}")
+        blocking.update(no_entry.tolist())
+
+    # Единственный вход в узел обязателен; если у двух узлов он идёт из одного источника — тура нет
+    shared = np.flatnonzero(np.bincount(forced_from, minlength=n) > 1)
+    if len(shared):
+        reasons.append(f"узлы {_format_nodes(ids[shared].tolist())} — единственный вход сразу для нескольких узлов")
+        blocking.update(shared.tolist())
+    shared = np.flatnonzero(np.bincount(forced_to, minlength=n) > 1)
+    if len(shared):
+        reasons.append(f"узлы {_format_nodes(ids[shared].tolist())} — единственный выход сразу для нескольких узлов")
+        blocking.update(shared.tolist())
+    return reasons, blocking
+
+
+def _connectivity_reason(ids, sources, targets, reasons, blocking):
+    n = len(ids)
+    labels, components = _components(n, *_csr(n, sources, targets))
+    largest = np.argmax(np.bincount(labels))
+    outside = np.flatnonzero(labels != largest)
+    reasons.append(f"граф не сильно связен: компонент {components}, вне крупнейшей из них узлы "
+                   f"{_format_nodes(ids[outside].tolist())}")
+    blocking.update(outside.tolist())
+    return components
+
+
+def check_feasibility(ids, sources, targets):
+    # Линейные необходимые условия: у каждого узла есть вход и выход, вынужденные рёбра не спорят
+    # за один узел, граф сильно связен. Петли в цикл не входят и не учитываются.
+    # Рёбра ожидаются без повторов (так хранят их GraphStore и SparseGraph)
+    start_time = time.perf_counter()
+    ids = np.asarray(ids)
+    n = len(ids)
+    if n < 2:
+        return FeasibilityReport([], [], 1, (time.perf_counter() - start_time) * 1000)
+    sources = _indices(sources)
+    targets = _indices(targets)
+    loops = sources == targets
+    if loops.any():
+        sources, targets = sources[~loops], targets[~loops]
+    del loops
+
+    out_degree = np.bincount(sources, minlength=n)
+    in_degree = np.bincount(targets, minlength=n)
+    reasons, blocking = _degree_reasons(ids, out_degree, in_degree, sources[in_degree[targets] == 1],
+                                        targets[out_degree[sources] == 1])
+
+    root = int(np.argmax(out_degree + in_degree))
+    components = 1
+    if not (_reachable(*_csr(n, sources, targets), root).all()
+            and _reachable(*_csr(n, targets, sources), root).all()):
+        components = _connectivity_reason(ids, sources, targets, reasons, blocking)
+
+    blocking = ids[sorted(blocking)].tolist()
+    return FeasibilityReport(reasons, blocking, components, (time.perf_counter() - start_time) * 1000)
+
+
+def check_cost_feasibility(ids, cost):
+    # Те же условия для плотной матрицы: степени и обход считаются по булевой матрице смежности
+    # без построения списка рёбер; он нужен только для отчёта о компонентах несвязного графа
+    start_time = time.perf_counter()
+    ids = np.asarray(ids)
+    n = len(ids)
+    if n < 2:
+        return FeasibilityReport([], [], 1, (time.perf_counter() - start_time) * 1000)
+    adjacent = np.isfinite(cost)
+    np.fill_diagonal(adjacent, False)
+
+    out_degree = adjacent.sum(axis=1)
+    in_degree = adjacent.sum(axis=0)
+    single_in = np.flatnonzero(in_degree == 1)
+    single_out = np.flatnonzero(out_degree == 1)
+    reasons, blocking = _degree_reasons(ids, out_degree, in_degree,
+                                        np.argmax(adjacent[:, single_in], axis=0),
+                                        np.argmax(adjacent[single_out], axis=1))
+
+    root = int(np.argmax(out_degree + in_degree))
+    components = 1
+    for rows in (adjacent, adjacent.T):
+        seen = np.zeros(n, dtype=bool)
+        seen[root] = True
+        frontier = np.array([root])
+        while len(frontier):
+            fresh = rows[frontier].any(axis=0) & ~seen
+            seen |= fresh
+            frontier = np.flatnonzero(fresh)
+        if not seen.all():
+            sources, targets = np.nonzero(adjacent)
+            components = _connectivity_reason(ids, sources, targets, reasons, blocking)
+            break
+
+    blocking = ids[sorted(blocking)].tolist()
+    return FeasibilityReport(reasons, blocking, components, (time.perf_counter() - start_time) * 1000)
@@ -0,0 +1,177 @@
+import time
+
+import numpy as np
+
+from tsp_local_search import improve_route
+from tsp_solver import SolveResult, batch_tours, choose_start, plain_cost
+
+UNVISITED = np.iinfo(np.int32).max
+# На сколько частей делится перебор стартов, когда нужен прогресс или отмена
+PROGRESS_STEPS = 100
+
+
+class IncrementalSolver:
+    # Хранит матрицу стоимостей и жадный маршрут от каждого старта между решениями;
+    # правка ребра пересчитывает только те старты, чей выбор в узле-источнике мог измениться
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.ids = []
+        self.index = {}
+        self.cost = np.empty((0, 0))
+        self.routes = np.empty((0, 0), dtype=np.int64)
+        self.positions = np.empty((0, 0), dtype=np.int32)
+        self.lengths = np.empty(0, dtype=np.int64)
+        self.totals = np.empty(0)
+        self.rerun_starts = 0
+        # Время пересчётов с прошлого solve(), чтобы отчёт о времени оставался честным
+        self.pending_time = 0.0
+        self.dirty = True
+
+    def load(self, graph, progress=None, cancel=None):
+        # graph — GraphData или GraphStore: рёбра заданы индексами узлов
+        self.reset()
+        self.ids = graph.ids.tolist()
+        self.index = {node_id: i for i, node_id in enumerate(self.ids)}
+        n = len(self.ids)
+        self.cost = np.full((n, n), np.inf)
+        self.cost[graph.sources, graph.targets] = graph.weights
+        self.routes = np.full((n, n), -1, dtype=np.int64)
+        self.positions = np.full((n, n), UNVISITED, dtype=np.int32)
+        self.lengths = np.zeros(n, dtype=np.int64)
+        self.totals = np.full(n, np.inf)
+
+        block = max(1, n // PROGRESS_STEPS) if progress is not None or cancel is not None else max(n, 1)
+        for begin in range(0, n, block):
+            if cancel is not None and cancel.is_set():
+                # Остаются маршруты уже пройденных стартов; следующий load() начнёт заново
+                return
+            self._rerun(np.arange(begin, min(n, begin + block)))
+            if progress is not None:
+                best = self.totals.min()
+                progress(min(n, begin + block), n, plain_cost(best) if best != np.inf else None)
+        self.dirty = False
+
+    def _rerun(self, starts):
+        if not len(starts) or not len(self.ids):
+            return
+        self.rerun_starts += len(starts)
+        start_time = time.perf_counter()
+        for chunk, routes, lengths, closed in batch_tours(self.cost, starts):
+            self.routes[chunk] = routes
+            self.lengths[chunk] = lengths
+            self.totals[chunk] = closed
+            self.positions[chunk] = UNVISITED
+            rows, steps = np.nonzero(routes >= 0)
+            self.positions[chunk[rows], routes[rows, steps]] = steps
+        self.pending_time += (time.perf_counter() - start_time) * 1000
+
+    def set_edge(self, from_id, to_id, weight):
+        if self.dirty:
+            return
+        u, v = self.index[from_id], self.index[to_id]
+        old = self.cost[u, v]
+        new = np.inf if weight is None else float(weight)
+        if old == new:
+            return
+        self.cost[u, v] = new
+
+        n = len(self.ids)
+        pos_u, pos_v = self.positions[:, u], self.positions[:, v]
+        reached = pos_u != UNVISITED
+        starts = np.arange(n)
+        next_pos = np.where(reached, pos_u + 1, 0)
+        has_next = reached & (next_pos < self.lengths)
+        chosen = np.where(has_next, self.routes[starts, np.minimum(next_pos, n - 1)], -1)
+
+        used = has_next & (chosen == v)
+        # Ребро могло быть кандидатом, только если v ещё не посещён в момент ухода из u
+        candidate = reached & (pos_v > pos_u) & ~used
+        chosen_cost = np.where(has_next, self.cost[u, np.maximum(chosen, 0)], np.inf)
+        if new < old:
+            now_preferred = candidate & ((new < chosen_cost) | ((new == chosen_cost) & (v < chosen)) | ~has_next)
+            rerun = now_preferred
+            shift_used = used
+        else:
+            rerun = used
+            shift_used = np.zeros(n, dtype=bool)
+
+        # Замыкающее ребро последнего узла в старт меняет только стоимость
+        complete = self.lengths == n
+        closing = complete & (pos_u == n - 1) & (starts == v)
+        self._shift_totals(closing | shift_used, old, new)
+        self._rerun(np.flatnonzero(rerun & ~closing))
+
+    def _shift_totals(self, mask, old, new):
+        if not mask.any():
+            return
+        if new == np.inf:
+            self.totals[mask] = np.inf
+        elif old == np.inf:
+            # Замыкающего ребра не было: стоимость тура считается заново по маршруту
+            for start in np.flatnonzero(mask):
+                route = self.routes[start]
+                self.totals[start] = self.cost[route, np.roll(route, -1)].sum()
+        else:
+            self.totals[mask] += new - old
+
+    def add_node(self, node_id):
+        if self.dirty:
+            return
+        n = len(self.ids)
+        self.ids.append(node_id)
+        self.index[node_id] = n
+        # Новый узел без рёбер недостижим: прежние маршруты не меняются, но ни один больше не замкнут
+        self.cost = np.pad(self.cost, ((0, 1), (0, 1)), constant_values=np.inf)
+        self.routes = np.pad(self.routes, ((0, 1), (0, 1)), constant_values=-1)
+        self.positions = np.pad(self.positions, ((0, 1), (0, 1)), constant_values=UNVISITED)
+        self.routes[n, 0] = n
+        self.positions[n, n] = 0
+        self.lengths = np.append(self.lengths, 1)
+        self.totals = np.full(n + 1, np.inf)
+
+    def remove_node(self, node_id):
+        if self.dirty:
+            return
+        k = self.index[node_id]
+        if np.isfinite(self.cost[k]).any() or np.isfinite(self.cost[:, k]).any():
+            # Узел с рёбрами убирается полным пересчётом
+            self.dirty = True
+            return
+        del self.ids[k]
+        self.index = {node_id: i for i, node_id in enumerate(self.ids)}
+        keep = np.arange(len(self.ids) + 1) != k
+        self.cost = self.cost[keep][:, keep]
+        # Столбцы маршрутов — шаги; недостижимый узел ни в один чужой маршрут не входил
+        routes = self.routes[keep][:, :-1]
+        self.routes = np.where(routes > k, routes - 1, routes)
+        self.positions = self.positions[keep][:, keep]
+        self.lengths = self.lengths[keep]
+        self.totals = self.totals[keep]
+
+        # Маршруты, упиравшиеся только в удалённый узел, теперь могут замкнуться
+        n = len(self.ids)
+        for start in np.flatnonzero(self.lengths == n):
+            route = self.routes[start]
+            self.totals[start] = self.cost[route, np.roll(route, -1)].sum()
+
+    def solve(self, use_modification=True, improve=False, time_limit=None, cancel=None):
+        start_time = time.perf_counter()
+        pending_time, self.pending_time = self.pending_time, 0.0
+        totals = self.totals
+        if use_modification:
+            best = int(np.argmin(totals)) if len(totals) else None
+        else:
+            best = choose_start(self.cost)
+        if best is None or totals[best] == np.inf:
+            return SolveResult(None, None, pending_time + (time.perf_counter() - start_time) * 1000)
+
+        route = self.routes[best].tolist()
+        total_cost = greedy_cost = float(totals[best])
+        if improve:
+            route, total_cost = improve_route(self.cost, route, time_limit=time_limit, cancel=cancel)
+        execution_time = pending_time + (time.perf_counter() - start_time) * 1000
+        ids = self.ids
+        return SolveResult([ids[i] for i in route], plain_cost(total_cost), execution_time,
+                           {"rerun_starts": self.rerun_starts}, plain_cost(greedy_cost))
@@ -0,0 +1,164 @@
+import time
+from collections import deque
+
+import numpy as np
+
+IMPROVEMENT_EPS = 1e-9
+# Предел улучшения по умолчанию для окна, сервера и CLI, в секундах
+IMPROVE_TIME_LIMIT = 30.0
+
+
+def tour_cost(cost, route):
+    route = np.asarray(route)
+    return float(cost[route, np.roll(route, -1)].sum())
+
+
+def neighbor_lists(cost, size):
+    size = min(size, len(cost) - 1)
+    nearest = np.argsort(cost, axis=1, kind="stable")[:, :size]
+    return [[c for c in row if cost[a, c] != np.inf and c != a]
+            for a, row in enumerate(nearest.tolist())]
+
+
+class _Tour:
+    # Маршрут удваивается, чтобы любой отрезок цикла был непрерывным срезом префиксных сумм
+    def __init__(self, cost, route):
+        self.cost = cost
+        self.reset(route)
+
+    def reset(self, route):
+        self.route = route
+        n = len(route)
+        self.position = np.empty(n, dtype=np.int64)
+        self.position[route] = np.arange(n)
+        doubled = np.array(route + route + route[:1])
+        self.doubled = doubled
+        forward = self.cost[doubled[:-1], doubled[1:]]
+        backward = self.cost[doubled[1:], doubled[:-1]]
+        backward_missing = backward == np.inf
+        self.forward_sum = np.concatenate(([0.0], np.cumsum(forward)))
+        self.backward_sum = np.concatenate(([0.0], np.cumsum(np.where(backward_missing, 0.0, backward))))
+        self.backward_missing = np.concatenate(([0], np.cumsum(backward_missing)))
+
+    def succ(self, node):
+        return self.route[(self.position[node] + 1) % len(self.route)]
+
+    def pred(self, node):
+        return self.route[self.position[node] - 1]
+
+    def two_opt_delta(self, i, j):
+        # Разворот отрезка b..c: рёбра a->b, c->d заменяются на a->c, b->d, внутренние идут в обратную сторону
+        cost, doubled = self.cost, self.doubled
+        a, b, c, d = doubled[i], doubled[i + 1], doubled[j], doubled[j + 1]
+        if cost[a, c] == np.inf or cost[b, d] == np.inf:
+            return None
+        if self.backward_missing[j] - self.backward_missing[i + 1]:
+            return None
+        old = cost[a, b] + cost[c, d] + self.forward_sum[j] - self.forward_sum[i + 1]
+        new = cost[a, c] + cost[b, d] + self.backward_sum[j] - self.backward_sum[i + 1]
+        return new - old
+
+    def apply_two_opt(self, i, j):
+        rotated = self.doubled[i + 1:i + 1 + len(self.route)].tolist()
+        length = j - i
+        self.reset(rotated[:length][::-1] + rotated[length:])
+
+    def or_opt_delta(self, segment, p, q):
+        cost = self.cost
+        prev, nxt = self.pred(segment[0]), self.succ(segment[-1])
+        added = cost[prev, nxt] + cost[p, segment[0]] + cost[segment[-1], q]
+        if added == np.inf:
+            return None
+        removed = cost[prev, segment[0]] + cost[segment[-1], nxt] + cost[p, q]
+        return added - removed
+
+    def apply_or_opt(self, segment, p):
+        i = self.position[segment[0]]
+        rotated = self.route[i:] + self.route[:i]
+        rest = rotated[len(segment):]
+        k = rest.index(p)
+        self.reset(rest[:k + 1] + segment + rest[k + 1:])
+
+
+def improve_route(cost, route, neighbors=8, time_limit=None, max_moves=None, stats=None, index=None,
+                  cancel=None):
+    # index — готовый NeighborIndex графа, если он уже построен. time_limit отсчитывается от начала
+    # вызова, вместе с построением списков соседей. cancel — threading.Event: как и предел времени,
+    # проверяется между ходами, и возвращается лучший найденный к этому моменту маршрут
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    n = len(route)
+    if n < 4:
+        return list(route), tour_cost(cost, route)
+    if index is not None:
+        candidates = index.candidates(neighbors)
+    else:
+        candidates = neighbor_lists(cost, neighbors)
+    tour = _Tour(cost, list(route))
+    moves = 0
+
+    # Биты "не смотреть": узел проверяется снова, только если рядом с ним изменились рёбра
+    queue = deque(route)
+    queued = np.ones(n, dtype=bool)
+
+    def wake(*nodes):
+        for node in nodes:
+            if not queued[node]:
+                queued[node] = True
+                queue.append(node)
+
+    while queue:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        if max_moves is not None and moves >= max_moves:
+            break
+        if cancel is not None and cancel.is_set():
+            break
+        a = queue.popleft()
+        queued[a] = False
+        improved = False
+
+        i = int(tour.position[a])
+        for c in candidates[a]:
+            j = int(tour.position[c])
+            j = j if j > i else j + n
+            if j == i + 1:
+                continue
+            delta = tour.two_opt_delta(i, j)
+            if delta is not None and delta < -IMPROVEMENT_EPS:
+                b, d = tour.doubled[i + 1], tour.doubled[j + 1]
+                tour.apply_two_opt(i, j)
+                wake(a, b, c, d)
+                improved = True
+                break
+
+        if not improved:
+            for length in (1, 2, 3):
+                if length > n - 3:
+                    break
+                start = int(tour.position[a])
+                segment = [tour.route[(start + k) % n] for k in range(length)]
+                prev = tour.pred(segment[0])
+                for q in candidates[segment[-1]]:
+                    p = tour.pred(q)
+                    if p == prev or q in segment or p in segment:
+                        continue
+                    delta = tour.or_opt_delta(segment, p, q)
+                    if delta is not None and delta < -IMPROVEMENT_EPS:
+                        nxt = tour.succ(segment[-1])
+                        tour.apply_or_opt(segment, p)
+                        wake(prev, nxt, p, q, *segment)
+                        improved = True
+                        break
+                if improved:
+                    break
+
+        if improved:
+            moves += 1
+
+    if stats is not None:
+        stats["improving_moves"] = stats.get("improving_moves", 0) + moves
+    improved_route = tour.route
+    # Маршрут начинается с того же узла, что и жадный
+    shift = improved_route.index(route[0])
+    improved_route = improved_route[shift:] + improved_route[:shift]
+    return improved_route, tour_cost(cost, improved_route)
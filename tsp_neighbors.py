@@ -0,0 +1,235 @@
+import random
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def sorted_rows(n, sources, targets, weights):
+    # CSR по узлам-источникам: строка отсортирована по весу, при равном весе — по номеру цели,
+    # то есть в том же порядке, в каком argmin по строке матрицы выбирает соседа (см. nearest_neighbor).
+    # Порядок разных рёбер во входных массивах на результат не влияет (из повторов действует последний)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+
+    # Повторное ребро перезаписывает прежнее, как в словаре graph_data
+    order = np.lexsort((np.arange(len(sources)), targets, sources))
+    sources, targets, weights = sources[order], targets[order], weights[order]
+    last = np.ones(len(sources), dtype=bool)
+    last[:-1] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+    sources, targets, weights = sources[last], targets[last], weights[last]
+
+    order = np.lexsort((targets, weights, sources))
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+    return offsets, targets[order].astype(np.int32), weights[order]
+
+
+class NeighborIndex:
+    # Исходящие рёбра каждого узла, отсортированные по стоимости. Строится один раз на граф
+    # и служит перебору стартов, выбору стартового узла и кандидатам для улучшения маршрута
+    def __init__(self, offsets, targets, weights):
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        # Шаги читают строки через memoryview: массивы не копируются в списки Python (около 70 байт
+        # на ребро), и так же читается индекс в разделяемой памяти. Для перебора многих стартов
+        # строки на время перебора кладутся в списки, см. cached_rows
+        self._offsets = memoryview(offsets)
+        self._targets = memoryview(targets)
+        self._weights = memoryview(weights)
+
+    @classmethod
+    def from_arrays(cls, n, sources, targets, weights):
+        return cls(*sorted_rows(n, sources, targets, weights))
+
+    @classmethod
+    def from_cost(cls, cost):
+        # В матрице нет повторов рёбер, поэтому хватает устойчивой сортировки каждой строки:
+        # при равном весе раньше идёт меньший номер цели, как в sorted_rows; inf уходят в конец строки
+        order = np.argsort(cost, axis=1, kind="stable")
+        weights = np.take_along_axis(cost, order, axis=1)
+        finite = np.isfinite(weights)
+        offsets = np.zeros(len(cost) + 1, dtype=np.int64)
+        np.cumsum(finite.sum(axis=1), out=offsets[1:])
+        return cls(offsets, order[finite].astype(np.int32), weights[finite])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def cache_rows(self):
+        # Чтение из memoryview создаёт новое число на каждый просмотр соседа, и обход выходит примерно
+        # в полтора раза медленнее, чем по списку. Поэтому цели кладутся в список ссылок на общие числа
+        # узлов: 8 байт на ребро, а не 70, как у tolist(); смещения — список по числу узлов.
+        # Возвращает False, если строки уже в списках
+        if isinstance(self._targets, list):
+            return False
+        nodes = list(range(len(self)))
+        self._targets = list(map(nodes.__getitem__, self._targets))
+        self._offsets = self.offsets.tolist()
+        return True
+
+    def drop_rows(self):
+        self._offsets = memoryview(self.offsets)
+        self._targets = memoryview(self.targets)
+
+    @contextmanager
+    def cached_rows(self):
+        # Списки строк живут только на время перебора, если их не держали и до него
+        cached = self.cache_rows()
+        try:
+            yield self
+        finally:
+            if cached:
+                self.drop_rows()
+
+    def cheapest_out(self):
+        # То же, что cost.min(axis=1): inf у узла без исходящих рёбер
+        cheapest = np.full(len(self), np.inf)
+        has_edges = np.flatnonzero(np.diff(self.offsets) > 0)
+        cheapest[has_edges] = self.weights[self.offsets[has_edges]]
+        return cheapest
+
+    def cheapest_in(self):
+        # То же, что cost.min(axis=0): самое дешёвое входящее ребро узла
+        cheapest = np.full(len(self), np.inf)
+        np.minimum.at(cheapest, self.targets, self.weights)
+        return cheapest
+
+    def choose_start(self):
+        cheapest = self.cheapest_out()
+        if np.isfinite(cheapest).any():
+            return int(np.argmin(cheapest))
+        return random.randrange(len(self))
+
+    def start_order(self):
+        return np.argsort(self.cheapest_out(), kind="stable").tolist()
+
+    def candidates(self, size):
+        # Первые size ближайших соседей каждого узла, без петель
+        offsets, targets = self._offsets, self._targets
+        result = []
+        for node in range(len(self)):
+            row = [target for target in targets[offsets[node]:offsets[node + 1]] if target != node]
+            result.append(row[:size])
+        return result
+
+    def edge_cost(self, source, target):
+        for position in range(self._offsets[source], self._offsets[source + 1]):
+            if self._targets[position] == target:
+                return self._weights[position]
+        return None
+
+    def tour(self, start, visited=None, stats=None):
+        n = len(self)
+        if visited is None:
+            visited = bytearray(n)
+        else:
+            visited[:] = bytes(n)
+        route, total_cost = self.walk(start, visited, stats)
+        if len(route) < n:
+            return route, None
+        return_cost = self.edge_cost(route[-1], start)
+        if return_cost is None:
+            return route, None
+        return route, total_cost + return_cost
+
+    def bounded_tour(self, start, visited, limit, keep_ties, leave, enter, stats=None):
+        # tour с отсечением: обход бросается, как только пройденная стоимость вместе с нижней оценкой
+        # остатка достигает limit (при keep_ties — только превышает). Из каждого ещё не покинутого узла
+        # уйдёт хотя бы самое дешёвое его ребро (leave), в каждый ещё не посещённый узел и в старт войдёт
+        # хотя бы самое дешёвое входящее (enter); оценка — большая из двух сумм, обе ведутся вычитанием.
+        # Запас в ceiling не даёт ошибке округления этих сумм отсечь тур, равный рекорду.
+        # Возвращает маршрут, стоимость тура (None для тупика) и признак отсечения
+        n = len(self)
+        ceiling = limit + abs(limit) * 1e-9
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        visited[:] = bytes(n)
+        visited[start] = 1
+        route = [start]
+        total_cost = 0.0
+        left_out, left_in = sum(leave), sum(enter)
+        current = start
+        scanned = 0
+        pruned = False
+
+        while len(route) < n:
+            bound = total_cost + (left_out if left_out > left_in else left_in)
+            if bound > ceiling or (bound >= limit and not keep_ties):
+                pruned = True
+                break
+            cursor, end = offsets[current], offsets[current + 1]
+            while cursor < end and visited[targets[cursor]]:
+                cursor += 1
+            scanned += cursor - offsets[current] + (cursor < end)
+            if cursor == end:
+                break
+            next_node = targets[cursor]
+            total_cost += weights[cursor]
+            left_out -= leave[current]
+            left_in -= enter[next_node]
+            route.append(next_node)
+            visited[next_node] = 1
+            current = next_node
+
+        if stats is not None:
+            stats["scans"] = stats.get("scans", 0) + scanned
+        if len(route) < n:
+            return route, None, pruned
+        return_cost = self.edge_cost(current, start)
+        if return_cost is None:
+            return route, None, False
+        return route, total_cost + return_cost, False
+
+    def walk(self, start, visited, stats=None):
+        # Жадный путь без возврата: из строки текущего узла берётся первая непосещённая цель,
+        # пока такая есть. Узлы, отмеченные в visited заранее, обходятся стороной.
+        # Курсор строки сдвигается только мимо уже посещённых соседей, поэтому шаг в среднем дешёвый
+        # даже в конце маршрута, когда посещено почти всё.
+        # Без stats идёт тот же цикл без счётчика просмотров: выключенные счётчики ничего не стоят
+        if stats is None:
+            return self._walk(start, visited)
+        n = len(self)
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        visited[start] = 1
+        route = [start]
+        total_cost = 0.0
+        current = start
+        scanned = 0
+
+        while len(route) < n:
+            cursor, end = offsets[current], offsets[current + 1]
+            while cursor < end and visited[targets[cursor]]:
+                cursor += 1
+            scanned += cursor - offsets[current] + (cursor < end)
+            if cursor == end:
+                break
+            next_node = targets[cursor]
+            total_cost += weights[cursor]
+            route.append(next_node)
+            visited[next_node] = 1
+            current = next_node
+
+        stats["scans"] = stats.get("scans", 0) + scanned
+        return route, total_cost
+
+    def _walk(self, start, visited):
+        n = len(self)
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        visited[start] = 1
+        route = [start]
+        total_cost = 0.0
+        current = start
+
+        while len(route) < n:
+            cursor, end = offsets[current], offsets[current + 1]
+            while cursor < end and visited[targets[cursor]]:
+                cursor += 1
+            if cursor == end:
+                break
+            next_node = targets[cursor]
+            total_cost += weights[cursor]
+            route.append(next_node)
+            visited[next_node] = 1
+            current = next_node
+        return route, total_cost
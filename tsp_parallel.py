@@ -0,0 +1,93 @@
+import os
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from tsp_neighbors import NeighborIndex
+from tsp_solver import ENGINES, INDEXED_ENGINES
+
+_shared_cost = None
+_shared_neighbors = None
+_shared_blocks = []
+
+
+def _share(values, blocks):
+    # Массив копируется в новый блок разделяемой памяти; процессам передаётся только его описание
+    block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+    return block.name, values.shape, values.dtype.str
+
+
+def _attach(name, shape, dtype):
+    block = shared_memory.SharedMemory(name=name)
+    _shared_blocks.append(block)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _attach_arrays(cost, neighbors):
+    global _shared_cost, _shared_neighbors
+    _shared_cost = _attach(*cost)
+    if neighbors is not None:
+        # Индекс соседей строится один раз в родителе; процесс читает его массивы без копирования
+        # и держит только список ссылок на цели строк на всё время перебора
+        _shared_neighbors = NeighborIndex(*(_attach(*values) for values in neighbors))
+        _shared_neighbors.cache_rows()
+
+
+def _solve_chunk(task):
+    position, starts, engine, collect_stats = task
+    stats = {} if collect_stats else None
+    if engine in INDEXED_ENGINES:
+        route, total_cost = ENGINES[engine](_shared_cost, starts, stats, _shared_neighbors)
+    else:
+        route, total_cost = ENGINES[engine](_shared_cost, starts, stats)
+    return total_cost, position, route, stats or {}
+
+
+def split_starts(starts, chunks):
+    chunks = max(1, min(chunks, len(starts)))
+    size, extra = divmod(len(starts), chunks)
+    parts = []
+    begin = 0
+    for i in range(chunks):
+        end = begin + size + (1 if i < extra else 0)
+        parts.append(list(starts[begin:end]))
+        begin = end
+    return parts
+
+
+def parallel_all_starts(cost, starts, workers=None, engine="scalar", stats=None, neighbors=None):
+    # neighbors — готовый NeighborIndex для движков sorted и pruned; без него индекс строится здесь
+    # и живёт до конца перебора
+    workers = workers or os.cpu_count() or 1
+    if engine in INDEXED_ENGINES and neighbors is None:
+        neighbors = NeighborIndex.from_cost(cost)
+    # Матрица и индекс копируются в разделяемую память один раз, задачи передают только списки стартов
+    blocks = []
+    try:
+        shared_cost = _share(cost, blocks)
+        shared_neighbors = None
+        if engine in INDEXED_ENGINES:
+            shared_neighbors = [_share(values, blocks)
+                                for values in (neighbors.offsets, neighbors.targets, neighbors.weights)]
+        tasks = [(position, part, engine, stats is not None)
+                 for position, part in enumerate(split_starts(starts, workers * 4))]
+        with Pool(workers, initializer=_attach_arrays, initargs=(shared_cost, shared_neighbors)) as pool:
+            results = pool.map(_solve_chunk, tasks)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    if stats is not None:
+        for result in results:
+            for key, value in result[3].items():
+                stats[key] = stats.get(key, 0) + value
+
+    # При равной стоимости побеждает более ранний старт, как в последовательном цикле
+    found = [result for result in results if result[0] is not None]
+    if not found:
+        return None, None
+    total_cost, _, route, _ = min(found, key=lambda result: (result[0], result[1]))
+    return route, total_cost
@@ -0,0 +1,96 @@
+import numpy as np
+
+ROUTE_CHUNK_SIZE = 7
+
+
+def format_route(route):
+    route_str = [str(node) for node in route]
+    route_lines = []
+    for i in range(0, len(route_str), ROUTE_CHUNK_SIZE):
+        chunk = route_str[i:i + ROUTE_CHUNK_SIZE]
+        route_lines.append(" -> ".join(chunk))
+    route_lines[-1] += f" -> {route[0]}"
+
+    route_text = route_lines[0]
+    for line in route_lines[1:]:
+        route_text += f"\n-> {line}"
+    return route_text
+
+
+def format_result_text(result):
+    if result.rejected:
+        return (
+            f"Маршрут не найден\n"
+            f"Причина: {result.feasibility.summary()}\n"
+            f"Проверка заняла: {result.feasibility.check_time:.2f} мс"
+        )
+    if not result.found:
+        return f"Маршрут не найден\nВремя выполнения: {result.execution_time:.2f} мс"
+
+    cost_text = f"Общая стоимость: {result.total_cost}"
+    if result.greedy_cost != result.total_cost:
+        cost_text += f" (до улучшения: {result.greedy_cost})"
+    text = (
+        f"Оптимальный маршрут:\n"
+        f"{format_route(result.route)}\n"
+        f"{cost_text}\n"
+        f"Время выполнения: {result.execution_time:.2f} мс"
+    )
+    if result.stats.get("clusters"):
+        text += f"\nКластеров: {result.stats['clusters']}"
+        if "gap_percent" in result.stats:
+            text += f", отличие от решения без разбиения: {result.stats['gap_percent']:+.2f}%"
+    if result.stats.get("cached"):
+        text += f"\nВзято из кэша (расчёт занимал {result.stats['solve_time_ms']:.2f} мс)"
+    return text
+
+
+def route_export(graph, route):
+    # Координаты и веса только для узлов и рёбер маршрута, прямо из массивов графа (GraphData, GraphStore)
+    positions = np.array([graph.index[node_id] for node_id in route], dtype=np.int64)
+    coordinates = dict(zip(route, zip(graph.xs[positions].tolist(), graph.ys[positions].tolist())))
+    n = max(len(graph.ids), 1)
+    keys = np.asarray(graph.sources, dtype=np.int64) * n + graph.targets
+    order = np.argsort(keys, kind="stable")
+    wanted = positions * n + np.roll(positions, -1)
+    # При повторном ребре берётся последнее, как и при загрузке
+    found = np.searchsorted(keys[order], wanted, side="right") - 1
+    weights = {}
+    for k, (start_id, end_id) in enumerate(zip(route, route[1:] + route[:1])):
+        if found[k] >= 0 and keys[order[found[k]]] == wanted[k]:
+            weights[(start_id, end_id)] = graph.weights[order[found[k]]].item()
+    return coordinates, weights
+
+
+def write_result(file, route, coordinates, weights, result_text):
+    # coordinates: ID -> (x, y); weights: (from, to) -> вес, отсутствующее ребро пишется с весом 0
+    file.write("# Nodes\n")
+    if route:
+        for node_id in route:
+            x, y = coordinates[node_id]
+            file.write(f"{node_id},{x},{y}\n")
+
+    file.write("# Edges\n")
+    if route:
+        for start_id, end_id in zip(route, route[1:] + route[:1]):
+            file.write(f"{start_id},{end_id},{weights.get((start_id, end_id), 0)}\n")
+
+    file.write("# Result Info\n")
+    file.write(result_text)
+
+
+def result_record(file_path, graph, result):
+    record = {
+        "file": file_path,
+        "nodes": graph.node_count,
+        "edges": graph.edge_count,
+        "found": result.found,
+        "route": result.route,
+        "total_cost": result.total_cost,
+        "greedy_cost": result.greedy_cost,
+        "execution_time_ms": round(result.execution_time, 3),
+        "stats": result.stats,
+    }
+    if result.feasibility is not None:
+        record["feasibility"] = result.feasibility.as_dict()
+    return record
@@ -0,0 +1,362 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from graph_io import parse_graph_lines
+from tsp_local_search import IMPROVE_TIME_LIMIT
+from result_cache import ResultCache, graph_data_key, solve_options
+from tsp_solver import ENGINES, CostMatrix, SolveResult, solve, solve_many
+from tsp_sparse import SPARSE_ENGINES, SparseGraph, pick_engine, solve_sparse
+
+# Графы не больше этого размера с одинаковыми настройками решаются одним пакетом
+SMALL_GRAPH_NODES = 64
+LATENCY_WINDOW = 10000
+MAX_BODY_SIZE = 256 * 1024 * 1024
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _warm_up():
+    return True
+
+
+def _result_dict(result):
+    record = {
+        "found": result.found,
+        "route": result.route,
+        "total_cost": result.total_cost,
+        "greedy_cost": result.greedy_cost,
+        "execution_time_ms": round(result.execution_time, 3),
+        "stats": result.stats,
+    }
+    if result.feasibility is not None:
+        record["feasibility"] = result.feasibility.as_dict()
+    return record
+
+
+def solve_payloads(payloads, options):
+    # Выполняется в процессе пула: payloads — кортежи массивов (ids, sources, targets, weights)
+    if len(payloads) > 1:
+        matrices = [CostMatrix.from_arrays(*payload) for payload in payloads]
+        return [_result_dict(result) for result in solve_many(matrices, options["all_starts"])]
+    ids, sources, targets, weights = payloads[0]
+    engine = pick_engine(options["engine"], len(ids), len(sources), options["improve"])
+    if engine == "sparse":
+        return [_result_dict(solve_sparse(SparseGraph.from_arrays(ids, sources, targets, weights),
+                                          options["all_starts"]))]
+    return [_result_dict(solve(CostMatrix.from_arrays(ids, sources, targets, weights), options["all_starts"],
+                               engine=engine, improve=options["improve"], time_limit=IMPROVE_TIME_LIMIT))]
+
+
+def parse_options(query, document=None):
+    document = document or {}
+    params = parse_qs(query)
+
+    def option(name, default):
+        if name in document:
+            return document[name]
+        if name in params:
+            return params[name][-1]
+        return default
+
+    def flag(name, default):
+        # В JSON значение может оказаться списком или объектом: это ошибка запроса, а не сбой сервера
+        value = option(name, default)
+        if isinstance(value, bool):
+            return value
+        if not isinstance(value, (str, int)):
+            raise RequestError(400, f"Ожидается логическое значение {name}: {value!r}")
+        return str(value).lower() in ("1", "true", "yes")
+
+    engine = option("engine", "auto")
+    if not isinstance(engine, str) or (engine not in ENGINES and engine not in SPARSE_ENGINES):
+        raise RequestError(400, f"Неизвестный движок: {engine!r}")
+    improve = flag("improve", False)
+    if engine == "sparse" and improve:
+        raise RequestError(400, "Улучшение маршрута работает с плотной матрицей и не сочетается с движком sparse")
+    return {"all_starts": flag("all_starts", True), "engine": engine, "improve": improve}
+
+
+def parse_json_graph(document):
+    nodes = document.get("nodes")
+    edges = document.get("edges", [])
+    if not isinstance(nodes, list) or not isinstance(edges, list):
+        raise RequestError(400, "Ожидаются списки nodes и edges")
+    lines = [b"# Nodes"]
+    for node in nodes:
+        values = (node.get("id"), node.get("x", 0), node.get("y", 0)) if isinstance(node, dict) else node
+        lines.append(_json_line(values, "узел"))
+    lines.append(b"# Edges")
+    for edge in edges:
+        values = (edge.get("from"), edge.get("to"), edge.get("weight")) if isinstance(edge, dict) else edge
+        lines.append(_json_line(values, "ребро"))
+    return parse_graph_lines(lines)
+
+
+def _json_line(values, kind):
+    # Узел и ребро — объект или список из трёх значений; прочее — ошибка запроса, а не сбой сервера
+    if not isinstance(values, (list, tuple)) or len(values) != 3:
+        raise RequestError(400, f"Ожидается {kind} в виде объекта или списка из трёх значений: {values!r}")
+    return ",".join(str(value) for value in values).encode()
+
+
+def prepare_request(query, content_type, body):
+    # Граф, настройки, ключ кэша и ключ склейки одинаковых запросов из тела запроса
+    if "json" in content_type:
+        try:
+            document = json.loads(body)
+        except ValueError:
+            raise RequestError(400, "Некорректный JSON")
+        if not isinstance(document, dict):
+            raise RequestError(400, "Ожидается JSON-объект")
+        graph = parse_json_graph(document)
+        options = parse_options(query, document)
+    else:
+        graph = parse_graph_lines(body.splitlines())
+        options = parse_options(query)
+    cache_key = graph_data_key(graph, solve_options(options["all_starts"], options["improve"]))
+    return graph, options, cache_key, request_key(graph, options)
+
+
+def request_key(graph, options):
+    digest = hashlib.sha256()
+    for values in (graph.ids, graph.sources, graph.targets, graph.weights):
+        digest.update(np.ascontiguousarray(values, dtype=np.int64).tobytes())
+        digest.update(b"|")
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class SolverService:
+    def __init__(self, workers, batch_window, batch_max, cache=None):
+        self.workers = workers
+        self.cache = cache if cache is not None else ResultCache()
+        self.batch_window = batch_window
+        self.batch_max = batch_max
+        self.executor = None
+        self.queue = None
+        self.inflight = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counters = {"requests": 0, "solved": 0, "coalesced": 0, "batches": 0,
+                         "batched_instances": 0, "errors": 0}
+
+    async def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        loop = asyncio.get_running_loop()
+        # Пул прогревается заранее, чтобы первый запрос не платил за запуск процессов
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _warm_up) for _ in range(self.workers)))
+        self.queue = asyncio.Queue()
+        asyncio.create_task(self._dispatch())
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def submit(self, graph, options, key):
+        if graph.node_count < 2:
+            raise RequestError(400, "Слишком мало узлов для расчёта")
+        future = self.inflight.get(key)
+        if future is not None:
+            # Такой же граф уже в работе: ответ будет общим
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(future), True
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        payload = (np.asarray(graph.ids), np.asarray(graph.sources), np.asarray(graph.targets),
+                   np.asarray(graph.weights))
+        await self.queue.put((key, payload, options, graph.node_count))
+        return await asyncio.shield(future), False
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_max:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = {}
+            for item in batch:
+                _, _, options, node_count = item
+                if node_count <= SMALL_GRAPH_NODES and not options["improve"] and options["engine"] != "pruned":
+                    groups.setdefault(json.dumps(options, sort_keys=True), []).append(item)
+                else:
+                    groups[id(item)] = [item]
+            for items in groups.values():
+                asyncio.create_task(self._run_group(items))
+
+    async def _run_group(self, items):
+        loop = asyncio.get_running_loop()
+        options = items[0][2]
+        if len(items) > 1:
+            self.counters["batches"] += 1
+            self.counters["batched_instances"] += len(items)
+        try:
+            results = await loop.run_in_executor(self.executor, solve_payloads,
+                                                 [item[1] for item in items], options)
+        except Exception as e:
+            results = [e] * len(items)
+        for (key, _, _, _), result in zip(items, results):
+            future = self.inflight.pop(key)
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                self.counters["solved"] += 1
+                future.set_result(result)
+
+    def stats(self):
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        percentiles = np.percentile(latencies, [50, 90, 99])
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "inflight": len(self.inflight),
+            "workers": self.workers,
+            **self.counters,
+            "cache": self.cache.stats(),
+            "latency_ms": {"p50": round(float(percentiles[0]), 3), "p90": round(float(percentiles[1]), 3),
+                           "p99": round(float(percentiles[2]), 3), "max": round(float(latencies.max()), 3),
+                           "samples": len(self.latencies)},
+        }
+
+    async def handle_solve(self, query, headers, body):
+        self.counters["requests"] += 1
+        # Разбор тела и ключи — работа по размеру графа; она идёт в потоке, чтобы цикл событий
+        # тем временем принимал другие запросы
+        loop = asyncio.get_running_loop()
+        graph, options, cache_key, key = await loop.run_in_executor(None, prepare_request, query,
+                                                                    headers.get("content-type", ""), body)
+
+        started = time.perf_counter()
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            result, coalesced = _result_dict(cached), False
+        else:
+            result, coalesced = await self.submit(graph, options, key)
+            # Отказ предварительной проверки не кэшируется, как и в ResultCache.put
+            if not coalesced and result.get("feasibility", {}).get("feasible", True):
+                self.cache.put(cache_key, SolveResult(result["route"], result["total_cost"],
+                                                      result["execution_time_ms"], result["stats"],
+                                                      result["greedy_cost"]))
+        latency = (time.perf_counter() - started) * 1000
+        self.latencies.append(latency)
+        return {**result, "latency_ms": round(latency, 3), "coalesced": coalesced, "skipped": graph.skipped}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Некорректная строка запроса"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "Некорректный Content-Length"}, False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {"error": "Слишком большой запрос"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self._route(method, target, headers, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, headers, body):
+        url = urlsplit(target)
+        try:
+            if url.path == "/solve":
+                if method != "POST":
+                    raise RequestError(405, "Используйте POST")
+                return 200, await self.handle_solve(url.query, headers, body)
+            if url.path == "/stats" and method == "GET":
+                return 200, self.stats()
+            if url.path == "/health" and method == "GET":
+                return 200, {"status": "ok"}
+            raise RequestError(404, "Нет такого адреса")
+        except RequestError as e:
+            self.counters["errors"] += 1
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            self.counters["errors"] += 1
+            return 500, {"error": str(e)}
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host, port, workers, batch_window, batch_max, cache):
+    service = SolverService(workers, batch_window, batch_max, cache)
+    await service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Сервис решателя слушает http://{host}:{port} (процессов: {workers})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/JSON сервис решателя методом ближайшего соседа")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-window-ms", type=float, default=5.0, help="сколько ждать попутные запросы")
+    parser.add_argument("--batch-max", type=int, default=64)
+    parser.add_argument("--cache-mb", type=float, default=64, help="объём кэша результатов в памяти")
+    parser.add_argument("--cache-dir", help="каталог дискового кэша результатов")
+    args = parser.parse_args()
+    cache = ResultCache(int(args.cache_mb * 1024 * 1024), args.cache_dir)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.batch_window_ms / 1000, args.batch_max, cache))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+import random
+import time
+
+import numpy as np
+
+from instrumentation import phase
+from tsp_feasibility import check_cost_feasibility
+from tsp_local_search import improve_route
+from tsp_neighbors import NeighborIndex
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+# Байт на старт и узел в пакете _sweep. Одновременно живут четыре массива k x n по 8 байт: штрафы,
+# маршруты, маршруты прошлого пакета у вызывающего и маска строк (или копия штрафов, когда тупиковые
+# маршруты выбывают из пакета); остальное — запас на массивы длины k
+SWEEP_BYTES = 40
+
+
+class CostMatrix:
+    def __init__(self, ids, cost):
+        self.ids = ids
+        self.cost = cost
+        self.index = {node_id: i for i, node_id in enumerate(ids.tolist())}
+        self._neighbors = None
+        self._feasibility = None
+
+    @classmethod
+    def from_graph(cls, nodes, connections):
+        ids = np.fromiter((node["id"] for node in nodes), dtype=np.int64, count=len(nodes))
+        matrix = cls(ids, np.full((len(nodes), len(nodes)), np.inf))
+        index = matrix.index
+        for link in connections:
+            matrix.cost[index[link[0]], index[link[1]]] = link[2]
+        return matrix
+
+    @classmethod
+    def from_arrays(cls, ids, sources, targets, weights):
+        matrix = cls(np.asarray(ids, dtype=np.int64), np.full((len(ids), len(ids)), np.inf))
+        # При повторном ребре побеждает последнее, как и при поэлементной записи
+        matrix.cost[sources, targets] = weights
+        return matrix
+
+    def __len__(self):
+        return len(self.ids)
+
+    def neighbors(self):
+        # Индекс строится при первом обращении и живёт вместе с матрицей
+        if self._neighbors is None:
+            self._neighbors = NeighborIndex.from_cost(self.cost)
+        return self._neighbors
+
+    def feasibility(self):
+        if self._feasibility is None:
+            self._feasibility = check_cost_feasibility(self.ids, self.cost)
+        return self._feasibility
+
+    def route_ids(self, route):
+        return self.ids[route].tolist()
+
+
+class SolveResult:
+    def __init__(self, route, total_cost, execution_time, stats=None, greedy_cost=None, feasibility=None):
+        self.route = route
+        self.total_cost = total_cost
+        self.execution_time = execution_time
+        self.stats = stats if stats is not None else {}
+        self.greedy_cost = greedy_cost if greedy_cost is not None else total_cost
+        # FeasibilityReport предварительной проверки, если она проводилась
+        self.feasibility = feasibility
+
+    @property
+    def rejected(self):
+        return self.feasibility is not None and not self.feasibility.feasible
+
+    @property
+    def found(self):
+        return self.route is not None
+
+
+def plain_cost(total_cost):
+    # Веса рёбер целые, поэтому стоимость показываем без ".0"
+    if total_cost is not None and float(total_cost).is_integer():
+        return int(total_cost)
+    return total_cost
+
+
+def choose_start(cost):
+    row_min = cost.min(axis=1)
+    if np.isfinite(row_min).any():
+        return int(np.argmin(row_min))
+    return random.randrange(len(cost))
+
+
+def nearest_neighbor(cost, start):
+    # При равных весах argmin берёт узел с меньшим индексом, то есть раньше объявленный в "# Nodes".
+    # Порядок рёбер в файле на выбор не влияет — это же правило соблюдают все движки и кэш результатов.
+    # Прежний цикл в TSPApp брал ребро, добавленное раньше, поэтому на графах с ничьими маршрут может отличаться
+    n = len(cost)
+    penalty = np.zeros(n)
+    masked_row = np.empty(n)
+    route = [start]
+    penalty[start] = np.inf
+    total_cost = 0.0
+    current = start
+
+    while len(route) < n:
+        np.add(cost[current], penalty, out=masked_row)
+        next_node = int(np.argmin(masked_row))
+        smallest_cost = masked_row[next_node]
+        if smallest_cost == np.inf:
+            return route, None
+        route.append(next_node)
+        total_cost += smallest_cost
+        penalty[next_node] = np.inf
+        current = next_node
+
+    return_cost = cost[current, start]
+    if return_cost == np.inf:
+        return route, None
+    return route, float(total_cost + return_cost)
+
+
+def count(stats, key, value=1):
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + value
+
+
+def best_of_starts(cost, starts, stats=None):
+    best_route = None
+    min_total_cost = None
+    for start in starts:
+        route, total_cost = nearest_neighbor(cost, start)
+        count(stats, "starts")
+        count(stats, "steps", len(route) - 1)
+        # Каждый шаг просматривает всю строку; оборвавшийся маршрут тратит ещё один просмотр
+        count(stats, "scans", len(cost) * min(len(route), len(cost) - 1))
+        if total_cost is None:
+            count(stats, "dead_ends")
+        elif min_total_cost is None or total_cost < min_total_cost:
+            min_total_cost = total_cost
+            best_route = route
+    return best_route, min_total_cost
+
+
+def sorted_best_of_starts(cost, starts, stats=None, neighbors=None):
+    # Тот же перебор, что и best_of_starts, но шаг берёт соседа из отсортированной строки индекса
+    if neighbors is None:
+        neighbors = NeighborIndex.from_cost(cost)
+    visited = bytearray(len(cost))
+    best_route = None
+    min_total_cost = None
+    with neighbors.cached_rows():
+        for start in starts:
+            route, total_cost = neighbors.tour(start, visited, stats)
+            count(stats, "starts")
+            count(stats, "steps", len(route) - 1)
+            if total_cost is None:
+                count(stats, "dead_ends")
+            elif min_total_cost is None or total_cost < min_total_cost:
+                min_total_cost = total_cost
+                best_route = route
+    return best_route, min_total_cost
+
+
+def pruned_best_of_starts(cost, starts, stats=None, neighbors=None):
+    # Перебор sorted с отсечением по нижней оценке (см. NeighborIndex.bounded_tour). Старты идут от самого
+    # дешёвого исходящего ребра, чтобы рекорд появился раньше. При равной стоимости побеждает меньший
+    # номер старта, как в остальных движках: равный рекорду старт с меньшим номером не отсекается
+    if neighbors is None:
+        neighbors = NeighborIndex.from_cost(cost)
+    n = len(cost)
+    # У узла без входа или выхода тура нет; его оценка 0 оставляет остальные слагаемые в силе
+    leave, enter = neighbors.cheapest_out(), neighbors.cheapest_in()
+    leave = np.where(np.isfinite(leave), leave, 0.0).tolist()
+    enter = np.where(np.isfinite(enter), enter, 0.0).tolist()
+    visited = bytearray(n)
+    best_route = None
+    best_start = None
+    min_total_cost = np.inf
+    with neighbors.cached_rows():
+        for start in sorted(starts, key=lambda start: (leave[start], start)):
+            route, total_cost, pruned = neighbors.bounded_tour(start, visited, min_total_cost,
+                                                               best_start is None or start < best_start,
+                                                               leave, enter, stats)
+            count(stats, "starts")
+            count(stats, "steps", len(route) - 1)
+            if pruned:
+                count(stats, "pruned_starts")
+                count(stats, "pruned_steps", n - len(route))
+            elif total_cost is None:
+                count(stats, "dead_ends")
+            elif total_cost < min_total_cost or (total_cost == min_total_cost and start < best_start):
+                min_total_cost = total_cost
+                best_route = route
+                best_start = start
+    if best_route is None:
+        return None, None
+    return best_route, min_total_cost
+
+
+def _sweep(rows, closing, starts, n, stats):
+    # rows(slots, current) -> строки стоимостей живых маршрутов; closing(slots, current) -> рёбра возврата в старт
+    k = len(starts)
+    slots = np.arange(k)
+    penalty = np.zeros((k, n))
+    penalty[slots, starts] = np.inf
+    routes = np.full((k, n), -1, dtype=np.int64)
+    routes[:, 0] = starts
+    lengths = np.ones(k, dtype=np.int64)
+    totals = np.zeros(k)
+    current = starts.copy()
+
+    count(stats, "starts", k)
+    for step in range(1, n):
+        # Выбранные строки — уже копия, маска строится в ней же без ещё одного массива k x n
+        masked = rows(slots, current)
+        masked += penalty
+        count(stats, "scans", masked.size)
+        next_nodes = np.argmin(masked, axis=1)
+        smallest = masked[np.arange(len(slots)), next_nodes]
+        del masked
+        alive = smallest != np.inf
+        if not alive.all():
+            # Тупиковые маршруты выбывают из пакета
+            count(stats, "dead_ends", int(len(alive) - alive.sum()))
+            slots, penalty, next_nodes = slots[alive], penalty[alive], next_nodes[alive]
+            smallest, current = smallest[alive], current[alive]
+            if not len(slots):
+                break
+        count(stats, "steps", len(slots))
+        routes[slots, step] = next_nodes
+        lengths[slots] += 1
+        totals[slots] += smallest
+        penalty[np.arange(len(slots)), next_nodes] = np.inf
+        current = next_nodes
+
+    closed = np.full(k, np.inf)
+    if len(slots):
+        closed[slots] = totals[slots] + closing(slots, current)
+        count(stats, "dead_ends", int(np.isinf(closed[slots]).sum()))
+    return routes, lengths, closed
+
+
+def batch_tours(cost, starts, stats=None, memory_budget=DEFAULT_MEMORY_BUDGET):
+    # По пакету стартов: маршруты (хвост заполнен -1), их длины и стоимости замкнутых туров (inf, если тура нет)
+    n = len(cost)
+    starts = np.asarray(list(starts), dtype=np.int64)
+    chunk_size = max(1, memory_budget // (n * SWEEP_BYTES))
+
+    for begin in range(0, len(starts), chunk_size):
+        chunk = starts[begin:begin + chunk_size]
+        routes, lengths, closed = _sweep(lambda slots, current: cost[current],
+                                         lambda slots, current: cost[current, chunk[slots]],
+                                         chunk, n, stats)
+        yield chunk, routes, lengths, closed
+
+
+def batch_best_of_starts(cost, starts, stats=None, memory_budget=DEFAULT_MEMORY_BUDGET):
+    best_route = None
+    min_total_cost = None
+    for _, routes, _, closed in batch_tours(cost, starts, stats, memory_budget):
+        winner = int(np.argmin(closed))
+        if closed[winner] == np.inf:
+            continue
+        if min_total_cost is None or closed[winner] < min_total_cost:
+            min_total_cost = float(closed[winner])
+            best_route = routes[winner].tolist()
+    return best_route, min_total_cost
+
+
+ENGINES = {
+    "scalar": best_of_starts,
+    "batch": batch_best_of_starts,
+    "sorted": sorted_best_of_starts,
+    "pruned": pruned_best_of_starts,
+}
+# Движки, которым нужен NeighborIndex графа
+INDEXED_ENGINES = ("sorted", "pruned")
+
+
+def solve(matrix, use_modification=True, workers=1, engine="scalar",
+          improve=False, time_limit=None, max_moves=None, probe=None, check=True, collect_stats=True, cancel=None):
+    # collect_stats=False: движки получают stats=None и не ведут счётчиков, в результате stats пуст.
+    # cancel прерывает только улучшение: жадный перебор доводится до конца
+    cost = matrix.cost
+    report = None
+    if check:
+        with phase(probe, "check"):
+            report = matrix.feasibility()
+        if not report.feasible:
+            # Замкнутого тура нет ни от одного старта: перебор не запускается
+            return SolveResult(None, None, report.check_time, {"skipped_starts": len(matrix)},
+                               feasibility=report)
+    parallel = use_modification and workers != 1
+    # Движки sorted и pruned берут из индекса соседей и выбор старта, и кандидатов для улучшения.
+    # Параллельному перебору без улучшения индекс в родителе не нужен: он строится на время перебора
+    # в tsp_parallel
+    neighbors = matrix.neighbors() if engine in INDEXED_ENGINES and (not parallel or improve) else None
+    if not use_modification:
+        start_nodes = [neighbors.choose_start() if neighbors is not None else choose_start(cost)]
+    else:
+        start_nodes = range(len(matrix))
+    stats = {} if collect_stats else None
+
+    start_time = time.perf_counter()
+    with phase(probe, "solve"):
+        if parallel:
+            from tsp_parallel import parallel_all_starts
+            best_route, min_total_cost = parallel_all_starts(cost, start_nodes, workers, engine, stats, neighbors)
+        elif neighbors is not None:
+            best_route, min_total_cost = ENGINES[engine](cost, start_nodes, stats, neighbors)
+        else:
+            best_route, min_total_cost = ENGINES[engine](cost, start_nodes, stats)
+    greedy_cost = min_total_cost
+    if improve and best_route is not None:
+        with phase(probe, "post"):
+            best_route, min_total_cost = improve_route(cost, best_route, time_limit=time_limit,
+                                                       max_moves=max_moves, stats=stats, index=neighbors,
+                                                       cancel=cancel)
+    execution_time = (time.perf_counter() - start_time) * 1000
+
+    if best_route is None:
+        return SolveResult(None, None, execution_time, stats, feasibility=report)
+    return SolveResult(matrix.route_ids(best_route), plain_cost(min_total_cost), execution_time, stats,
+                       plain_cost(greedy_cost), report)
+
+
+def solve_many(matrices, use_modification=True):
+    # Несколько небольших графов одного размера решаются одним векторным проходом
+    results = [None] * len(matrices)
+    by_size = {}
+    for i, matrix in enumerate(matrices):
+        report = matrix.feasibility()
+        if not report.feasible:
+            results[i] = SolveResult(None, None, report.check_time, {"skipped_starts": len(matrix)},
+                                     feasibility=report)
+            continue
+        by_size.setdefault(len(matrix), []).append(i)
+
+    for n, members in by_size.items():
+        start_time = time.perf_counter()
+        costs = np.stack([matrices[i].cost for i in members])
+        if use_modification:
+            instance = np.repeat(np.arange(len(members)), n)
+            starts = np.tile(np.arange(n), len(members))
+        else:
+            instance = np.arange(len(members))
+            starts = np.array([choose_start(cost) for cost in costs], dtype=np.int64)
+        routes, _, closed = _sweep(lambda slots, current: costs[instance[slots], current],
+                                   lambda slots, current: costs[instance[slots], current, starts[slots]],
+                                   starts, n, None)
+        execution_time = (time.perf_counter() - start_time) * 1000
+
+        for position, i in enumerate(members):
+            own = np.flatnonzero(instance == position)
+            # argmin берёт первый минимум, то есть более ранний старт, как в последовательном цикле
+            winner = own[int(np.argmin(closed[own]))]
+            stats = {"starts": len(own), "batched_instances": len(members)}
+            report = matrices[i].feasibility()
+            if closed[winner] == np.inf:
+                results[i] = SolveResult(None, None, execution_time, stats, feasibility=report)
+            else:
+                results[i] = SolveResult(matrices[i].route_ids(routes[winner]), plain_cost(float(closed[winner])),
+                                         execution_time, stats, feasibility=report)
+    return results
@@ -0,0 +1,111 @@
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+from tsp_feasibility import check_feasibility
+from tsp_neighbors import NeighborIndex, sorted_rows
+from tsp_solver import SolveResult, count, plain_cost
+
+# Движки сверх плотных из tsp_solver.ENGINES: sparse решает по CSR без матрицы n x n,
+# auto выбирает между sparse и scalar по размеру матрицы и плотности графа
+SPARSE_ENGINES = ("auto", "sparse")
+# Плотная матрица больше этого не строится, если её не требует улучшение маршрута
+DENSE_MATRIX_BYTES = 256 * 1024 * 1024
+# Ниже этой доли заполненных клеток матрицы CSR и меньше, и быстрее
+SPARSE_DENSITY = 0.05
+
+
+def dense_fits(node_count):
+    return node_count * node_count * 8 <= DENSE_MATRIX_BYTES
+
+
+def pick_engine(engine, node_count, edge_count, improve=False):
+    # Улучшение маршрута идёт по плотной матрице, поэтому auto при нём остаётся на scalar
+    if engine != "auto":
+        return engine
+    if improve or (dense_fits(node_count) and edge_count >= SPARSE_DENSITY * node_count * node_count):
+        return "scalar"
+    return "sparse"
+
+
+class SparseGraph:
+    # CSR: рёбра узла i лежат в targets/weights[offsets[i]:offsets[i + 1]], отсортированы по весу
+    def __init__(self, ids, offsets, targets, weights):
+        self.ids = ids
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.index = {node_id: i for i, node_id in enumerate(ids.tolist())}
+        self._neighbors = None
+        self._feasibility = None
+
+    @classmethod
+    def from_arrays(cls, ids, sources, targets, weights):
+        return cls(np.asarray(ids, dtype=np.int64), *sorted_rows(len(ids), sources, targets, weights))
+
+    @classmethod
+    def from_graph(cls, nodes, connections):
+        ids = np.fromiter((node["id"] for node in nodes), dtype=np.int64, count=len(nodes))
+        index = {node_id: i for i, node_id in enumerate(ids.tolist())}
+        sources = [index[link[0]] for link in connections]
+        targets = [index[link[1]] for link in connections]
+        weights = [link[2] for link in connections]
+        return cls.from_arrays(ids, sources, targets, weights)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.targets.nbytes + self.weights.nbytes
+
+    def neighbors(self):
+        if self._neighbors is None:
+            self._neighbors = NeighborIndex(self.offsets, self.targets, self.weights)
+        return self._neighbors
+
+    def feasibility(self):
+        if self._feasibility is None:
+            # Строки CSR уже без повторов рёбер, источники восстанавливаются из offsets
+            sources = np.repeat(np.arange(len(self), dtype=self.targets.dtype), np.diff(self.offsets))
+            self._feasibility = check_feasibility(self.ids, sources, self.targets)
+        return self._feasibility
+
+    def route_ids(self, route):
+        return self.ids[route].tolist()
+
+
+def solve_sparse(graph, use_modification=False, check=True, collect_stats=True):
+    n = len(graph)
+    report = None
+    if check:
+        report = graph.feasibility()
+        if not report.feasible:
+            return SolveResult(None, None, report.check_time, {"skipped_starts": n}, feasibility=report)
+    stats = {} if collect_stats else None
+    best_route = None
+    min_total_cost = None
+
+    start_time = time.perf_counter()
+    neighbors = graph.neighbors()
+    start_nodes = range(n) if use_modification else [neighbors.choose_start()]
+    visited = bytearray(n)
+    # Один обход читает строки прямо из CSR, без копий; перебору всех стартов строки на его время
+    # кладутся в списки ссылок (8 байт на ребро), которые освобождаются сразу после перебора
+    with neighbors.cached_rows() if use_modification else nullcontext():
+        for start in start_nodes:
+            route, total_cost = neighbors.tour(start, visited, stats)
+            count(stats, "starts")
+            count(stats, "steps", len(route) - 1)
+            if total_cost is None:
+                count(stats, "dead_ends")
+            elif min_total_cost is None or total_cost < min_total_cost:
+                min_total_cost = total_cost
+                best_route = route
+    execution_time = (time.perf_counter() - start_time) * 1000
+
+    if best_route is None:
+        return SolveResult(None, None, execution_time, stats, feasibility=report)
+    return SolveResult(graph.route_ids(best_route), plain_cost(min_total_cost), execution_time, stats,
+                       feasibility=report)